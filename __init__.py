@@ -4,7 +4,6 @@
 
 import importlib
 import os
-import sys
 
 # --- 版本信息 ---
 __version__ = "1.0.0-beta.1"
@@ -18,28 +17,51 @@ sub_modules = [
     "PresetPrompt",
     "MergePrompt",
     "RecommendFrameSetter",
+    "WindowSlicer",
     "InfoDisplay",
     "TypeDetector",
     "SaveTagger",
     "SerialNumberMarks",
     "InteractiveAnnotationTool",
+    "InteractiveAnnotationToolV3",
     "MemoryTools",
 ]
 
 # 获取当前插件目录名
 base_path = os.path.basename(os.path.dirname(__file__))
 
+# 延迟注册模式：设置环境变量 SKNODES_LAZY_LOAD=1 开启
+# 开启后，不注册路由的节点模块只在首次使用时才导入（torch/cv2/PIL 等重依赖随之推迟）
+LAZY_LOAD = os.environ.get("SKNODES_LAZY_LOAD", "0").lower() in ("1", "true", "yes")
+
 # --- 循环加载逻辑 ---
-for module_name in sub_modules:
+from .nodes import sk_loader
+
+_class_mappings, _display_mappings = sk_loader.load_modules(sub_modules, __name__, lazy=LAZY_LOAD)
+NODE_CLASS_MAPPINGS.update(_class_mappings)
+NODE_DISPLAY_NAME_MAPPINGS.update(_display_mappings)
+
+print(sk_loader.format_load_report())
+
+# --- 共享 API（掩码存储、缩略图、提示词预设、V3 预览）---
+# 路由必须在服务启动前注册，因此不随节点模块延迟加载；这些模块只依赖 aiohttp / folder_paths，
+# 渲染代码（cv2、torch）在首次请求时才导入，注册路由的节点模块因此也可以延迟加载
+for _api_module in ("sk_mask_store", "sk_thumbnails", "sk_preset_api", "sk_preview_api"):
     try:
-        module = importlib.import_module(f".nodes.{module_name}", package=__name__)
-        if hasattr(module, "NODE_CLASS_MAPPINGS"):
-            NODE_CLASS_MAPPINGS.update(module.NODE_CLASS_MAPPINGS)
-        if hasattr(module, "NODE_DISPLAY_NAME_MAPPINGS"):
-            NODE_DISPLAY_NAME_MAPPINGS.update(module.NODE_DISPLAY_NAME_MAPPINGS)  
-        print(f"✅ [sknodes] {module_name} 加载成功")
+        importlib.import_module(f".nodes.{_api_module}", package=__name__)
     except Exception as e:
-        print(f"❌ [sknodes] {module_name} 加载失败: {type(e).__name__} | {e}")
+        print(f"❌ [sknodes] {_api_module} 加载失败: {type(e).__name__} | {e}")
+
+# --- 加载报告 API ---
+try:
+    from server import PromptServer
+    from aiohttp import web
+
+    @PromptServer.instance.routes.get("/sknodes/load_report")
+    async def _load_report(request):
+        return web.json_response(sk_loader.get_load_report())
+except Exception as e:
+    print(f"⚠️ [sknodes] 加载报告接口注册失败: {type(e).__name__} | {e}")
 
 
 WEB_DIRECTORY = "./web"
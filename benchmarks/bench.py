@@ -0,0 +1,697 @@
+#!/usr/bin/env python
+"""
+SK节点库离线基准测试
+
+不启动 ComfyUI：stubs/ 中的替身模块代替 folder_paths / server.PromptServer / comfy.model_management，
+按参数化负载直接调用各节点的 FUNCTION，输出延迟分位数、峰值 RSS 和内存分配（JSON），便于在提交之间对比。
+
+用法:
+    python benchmarks/bench.py --quick                                   # 小规模冒烟
+    python benchmarks/bench.py --suite annotate --sizes 512,4096 --out base.json
+    python benchmarks/bench.py --out new.json --compare base.json --fail-on-regression
+
+说明:
+- 默认每个用例在独立子进程中运行，互不干扰（--in-process 关闭）；峰值 RSS 在 Linux 上取用例开始前清零的
+  VmHWM，其它平台取 ru_maxrss / peak_wset（包含导入阶段）
+- first_ms 为首次调用（冷缓存）耗时，分位数只统计之后的重复调用
+- markers 套件在数千个点上对比贴图绘制 (sprites) 与逐点直接绘制 (direct)，sprites 的 first_ms 或 p50 超过
+  direct 的阈值倍数时计为退化（--fail-on-regression 返回非零）
+- alloc_peak_mb 来自 tracemalloc，只包含 Python/NumPy 分配，不含 torch 张量
+"""
+
+import argparse
+import base64
+import gc
+import importlib
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+STUBS = os.path.join(BENCH_DIR, "stubs")
+PACKAGE = "sknodes_bench"
+
+# 标注节点: 预设名 -> (模块, 类名, 是否支持涂鸦)
+ANNOTATE_NODES = {
+    "serial": ("SerialNumberMarks", "SerialNumberMarks", False),
+    "v2": ("InteractiveAnnotationTool", "InteractiveAnnotationTool", True),
+    "v3": ("InteractiveAnnotationToolV3", "InteractiveAnnotationToolV3", True),
+}
+
+FULL = {
+    "sizes": [512, 1024, 2048, 4096, 8192, 16384],
+    "points": [0, 50, 500, 5000],
+    "merge_lines": [1000, 10000],
+    "tagger_files": [1000, 10000, 100000],
+    "frame_totals": [1000, 10000],
+    "frame_clips": [10000, 100000],
+    "preset_files": [1000, 10000],
+    "marker_points": [2000, 5000],
+}
+QUICK = {
+    "sizes": [512, 1024, 2048],
+    "points": [0, 500],
+    "merge_lines": [1000, 10000],
+    "tagger_files": [1000, 10000],
+    "frame_totals": [1000],
+    "frame_clips": [10000],
+    "preset_files": [1000],
+    "marker_points": [5000],
+}
+
+
+# =========================================================================
+# 节点导入（不执行包根目录的 __init__.py，避免加载报告和全部路由）
+# =========================================================================
+def import_node(module, cls_name):
+    if STUBS not in sys.path:
+        sys.path.insert(0, STUBS)
+    if PACKAGE not in sys.modules:
+        pkg = types.ModuleType(PACKAGE)
+        pkg.__path__ = [ROOT]
+        sys.modules[PACKAGE] = pkg
+    return getattr(importlib.import_module(f"{PACKAGE}.nodes.{module}"), cls_name)
+
+
+def call_node(node, **kwargs):
+    return getattr(node, node.FUNCTION)(**kwargs)
+
+
+# =========================================================================
+# 负载：每个套件提供 cases(cfg, args) / prepare(cases, workdir) / build(params, workdir)
+# =========================================================================
+def _image_size(size):
+    """按 16:9 横图生成，size 为长边"""
+    return size, max(size * 9 // 16, 1)
+
+
+def _random_points(n, w, h, seed=0):
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    xs, ys = rng.uniform(0, w, n), rng.uniform(0, h, n)
+    return json.dumps([{"x": round(float(x), 2), "y": round(float(y), 2)} for x, y in zip(xs, ys)])
+
+
+def _make_image(path, w, h):
+    import numpy as np
+    from PIL import Image
+    xs = (np.arange(w, dtype=np.uint32) * 255 // max(w - 1, 1)).astype(np.uint8)
+    ys = (np.arange(h, dtype=np.uint32) * 255 // max(h - 1, 1)).astype(np.uint8)
+    arr = np.empty((h, w, 3), dtype=np.uint8)
+    arr[:, :, 0] = xs
+    arr[:, :, 1] = ys[:, None]
+    np.bitwise_xor(xs[None, :], ys[:, None], out=arr[:, :, 2])
+    Image.fromarray(arr).save(path, compress_level=1)
+
+
+def _make_mask(path, w, h, seed=0):
+    """随机涂鸦笔画，保存为前端提交的 data URL 格式"""
+    import numpy as np
+    from PIL import Image, ImageDraw
+    rng = np.random.default_rng(seed)
+    img = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    width = max(w // 200, 2)
+    for _ in range(20):
+        pts = [(float(x), float(y)) for x, y in zip(rng.uniform(0, w, 8), rng.uniform(0, h, 8))]
+        draw.line(pts, fill=(255, 0, 0, 255), width=width, joint="curve")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", compress_level=1)
+    with open(path, "w") as f:
+        f.write("data:image/png;base64," + base64.b64encode(buf.getvalue()).decode())
+
+
+def annotate_cases(cfg, args):
+    cases = []
+    for node in args.nodes:
+        for size in cfg["sizes"]:
+            w, h = _image_size(size)
+            for n in cfg["points"]:
+                for mask in ((False, True) if ANNOTATE_NODES[node][2] else (False,)):
+                    cases.append({
+                        "id": f"annotate/{node}/{w}x{h}/p{n}/{'mask' if mask else 'nomask'}",
+                        "suite": "annotate",
+                        "params": {"node": node, "w": w, "h": h, "points": n, "mask": mask},
+                    })
+    return cases
+
+
+def annotate_prepare(cases, workdir):
+    os.makedirs(os.path.join(workdir, "input"), exist_ok=True)
+    os.makedirs(os.path.join(workdir, "masks"), exist_ok=True)
+    for case in cases:
+        p = case["params"]
+        w, h = p["w"], p["h"]
+        image = os.path.join(workdir, "input", f"bench_{w}x{h}.png")
+        if not os.path.exists(image):
+            _log(f"生成测试图像 {w}x{h}")
+            _make_image(image, w, h)
+        mask = os.path.join(workdir, "masks", f"mask_{w}x{h}.txt")
+        if p["mask"] and not os.path.exists(mask):
+            _log(f"生成测试涂鸦 {w}x{h}")
+            _make_mask(mask, w, h)
+
+
+def annotate_build(params, workdir):
+    module, cls_name, _ = ANNOTATE_NODES[params["node"]]
+    node = import_node(module, cls_name)()
+    w, h = params["w"], params["h"]
+    kwargs = {"image": f"bench_{w}x{h}.png", "points_data": _random_points(params["points"], w, h)}
+    if ANNOTATE_NODES[params["node"]][2]:
+        mask_data = ""
+        if params["mask"]:
+            with open(os.path.join(workdir, "masks", f"mask_{w}x{h}.txt")) as f:
+                mask_data = f.read()
+        kwargs["mask_data"] = mask_data
+    return lambda: call_node(node, **kwargs)
+
+
+def merge_cases(cfg, args):
+    cases = []
+    for lines in cfg["merge_lines"]:
+        for inputs in (2, 20):
+            for mode in ("split", "segment"):
+                cases.append({
+                    "id": f"merge/l{lines}/in{inputs}/{mode}",
+                    "suite": "merge",
+                    "params": {"lines": lines, "inputs": inputs, "mode": mode},
+                })
+        # 列表模式：lines 条描述与 2 种画风 / 质量词逐项对应、做笛卡尔积
+        for mode in ("zip", "product"):
+            cases.append({"id": f"merge/l{lines}/list/{mode}", "suite": "merge", "params": {"lines": lines, "mode": mode}})
+    return cases
+
+
+def merge_build(params, workdir):
+    node = import_node("MergePrompt", "MergePrompt")()
+    if params["mode"] in ("zip", "product"):
+        # 与 ComfyUI 相同：INPUT_IS_LIST 节点的每个输入都以批次列表传入
+        captions = [f"caption {j}, 1girl, solo\n\nsmile" for j in range(params["lines"])]
+        kwargs = {
+            "提示词_1": [captions],
+            "提示词_2": [["watercolor", "oil painting"]],
+            "提示词_3": ["masterpiece, best quality"],
+            "预设分隔符": ["逗号"],
+            "移除空行": [True],
+            "列表模式": ["逐项对应" if params["mode"] == "zip" else "笛卡尔积"],
+        }
+        return lambda: call_node(node, **kwargs)
+    lines, inputs = params["lines"], params["inputs"]
+    per_input = max(lines // inputs, 1)
+    kwargs = {
+        "提示词接入数量": inputs,
+        "预设分隔符": "逗号",
+        "移除空行": True,
+        "分隔符独立成段": params["mode"] == "segment",
+    }
+    for i in range(inputs):
+        body = [f"tag_{i}_{j}, masterpiece, best quality, 1girl, solo" if j % 7 else "" for j in range(per_input)]
+        kwargs[f"提示词_{i + 1}"] = "\n".join(body)
+    return lambda: call_node(node, **kwargs)
+
+
+def tagger_cases(cfg, args):
+    return [
+        {"id": f"tagger/f{files}/{mode}", "suite": "tagger", "params": {"files": files, "mode": mode}}
+        for files in cfg["tagger_files"]
+        for mode in ("loop", "list")
+    ]
+
+
+def _tagger_dir(workdir, files):
+    return os.path.join(workdir, "tagger", f"f{files}")
+
+
+def tagger_prepare(cases, workdir):
+    for files in sorted({c["params"]["files"] for c in cases}):
+        folder = _tagger_dir(workdir, files)
+        if os.path.isdir(folder):
+            continue
+        _log(f"生成打标目录 ({files} 张图片)")
+        os.makedirs(folder)
+        exts = (".png", ".jpg", ".webp", ".JPEG")
+        for i in range(files):
+            # 不补零的文件名，覆盖 "1, 10, 100" 的字符排序；每 10 个混入一个非图片文件
+            open(os.path.join(folder, f"{i}{exts[i % len(exts)]}"), "wb").close()
+            if i % 10 == 0:
+                open(os.path.join(folder, f"{i}.json"), "wb").close()
+
+
+def tagger_build(params, workdir):
+    node = import_node("SaveTagger", "SK_TagFileSaver_Ultimate")()
+    folder = _tagger_dir(workdir, params["files"])
+    text = [f"caption {i}, 1girl, solo" for i in range(min(params["files"], 1000))] if params["mode"] == "list" \
+        else "caption, 1girl, solo"
+    kwargs = {"文本输入": text, "存放路径": folder, "是否添加触发词": "是", "触发词": "sks", "追加标签": "extra"}
+    return lambda: call_node(node, **kwargs)
+
+
+FRAME_WINDOWS = {
+    "default": {},
+    "wide": {"窗口帧数_MIN": 5, "窗口帧数_MAX": 401, "窗口数量_MIN": 1, "窗口数量_MAX": 100},
+}
+
+
+def frames_cases(cfg, args):
+    return [
+        {"id": f"frames/t{total}/{window}/{mode}", "suite": "frames",
+         "params": {"total": total, "window": window, "mode": mode}}
+        for total in cfg["frame_totals"]
+        for window in FRAME_WINDOWS
+        for mode in ("减少", "增加")
+    ] + [
+        {"id": f"frames/clips{clips}/{window}", "suite": "frames",
+         "params": {"clips": clips, "window": window, "mode": "减少"}}
+        for clips in cfg["frame_clips"]
+        for window in FRAME_WINDOWS
+    ]
+
+
+def frames_build(params, workdir):
+    node = import_node("RecommendFrameSetter", "RecommendFrameSetter")()
+    kwargs = dict(FRAME_WINDOWS[params["window"]], 帧处理方式=params["mode"])
+
+    if "clips" in params:
+        # 一次调用 = 批量规划 clips 个片段（总帧数 1~3000 随机，大量重复）
+        import numpy as np
+        totals = np.random.default_rng(0).integers(1, 3001, params["clips"]).tolist()
+        return lambda: call_node(node, 总帧数=1, 总帧数列表=totals, **kwargs)
+
+    def sweep():
+        # 一次调用 = 对 1..total 全部总帧数求解一遍
+        return [call_node(node, 总帧数=t, **kwargs) for t in range(1, params["total"] + 1)]
+    return sweep
+
+
+def presets_cases(cfg, args):
+    return [
+        {"id": f"presets/n{files}/{op}", "suite": "presets", "params": {"files": files, "op": op}}
+        for files in cfg["preset_files"]
+        for op in ("input_types", "bulk", "refresh")
+    ]
+
+
+def _presets_dir(workdir, files):
+    return os.path.join(workdir, "presets", f"n{files}")
+
+
+def presets_prepare(cases, workdir):
+    for files in sorted({c["params"]["files"] for c in cases}):
+        folder = _presets_dir(workdir, files)
+        if os.path.isdir(folder):
+            continue
+        _log(f"生成预设目录 ({files} 个预设)")
+        os.makedirs(folder)
+        for i in range(files):
+            with open(os.path.join(folder, f"预设_{i}.txt"), "w", encoding="utf-8") as f:
+                f.write(f"preset {i}, masterpiece, best quality, 1girl, solo\n" * 8)
+
+
+def presets_build(params, workdir):
+    node = import_node("PresetPrompt", "PresetPrompt")
+    store_mod = sys.modules[f"{PACKAGE}.nodes.sk_preset_store"]
+    # 每个用例使用独立的预设库实例（--in-process 时模块在用例之间共享）
+    store = store_mod._STORE = store_mod.PresetStore(_presets_dir(workdir, params["files"]))
+    if params["op"] == "input_types":
+        # 一次调用 = 一次 INPUT_TYPES（下拉框名称列表）+ 一次预览内容查询
+        return lambda: (node.INPUT_TYPES(), store.get("预设_0"))
+    if params["op"] == "bulk":
+        return store.bulk
+    # 强制校验：重新列目录并比较 mtime（预设没有变化，不重新读取）
+    return lambda: store.refresh(force=True)
+
+
+def markers_cases(cfg, args):
+    w, h = _image_size(2048)
+    return [
+        {"id": f"markers/{preset}/{w}x{h}/p{n}/{impl}", "suite": "markers",
+         "params": {"preset": preset, "w": w, "h": h, "points": n, "impl": impl}}
+        for preset in args.nodes
+        for n in cfg["marker_points"]
+        for impl in ("sprites", "direct")
+    ]
+
+
+def _direct_draw(style, img, points):
+    """贴图缓存之前的逐点绘制（PIL ellipse + text / cv2 circle + putText），作为 sprites 用例的参照"""
+    import cv2
+    from PIL import Image, ImageDraw
+    if hasattr(style, "font"):
+        im = Image.fromarray(img)
+        draw = ImageDraw.Draw(im)
+        r = style.r
+        for i, px, py in points.items():
+            draw.ellipse([px - r, py - r, px + r, py + r], fill=style.fill, outline=style.ink, width=style.outline_width)
+            draw.text((px, py), str(i + 1), fill=style.ink, font=style.font, anchor="mm")
+        return im
+    for i, px, py in points.items():
+        text = str(i + 1)
+        cv2.circle(img, (px, py), style.r, style.fill, -1)
+        cv2.circle(img, (px, py), style.r, style.ink, style.thickness)
+        (fw, fh), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, style.font_scale, style.thickness)
+        cv2.putText(img, text, (int(px - fw / 2), int(py + fh / 2)), cv2.FONT_HERSHEY_SIMPLEX,
+                    style.font_scale, style.ink, style.thickness, cv2.LINE_AA)
+    return img
+
+
+def markers_build(params, workdir):
+    import numpy as np
+    import_node("SerialNumberMarks", "SerialNumberMarks")
+    render = sys.modules[f"{PACKAGE}.nodes.sk_render"]
+    markers = sys.modules[f"{PACKAGE}.nodes.sk_markers"]
+    points_mod = sys.modules[f"{PACKAGE}.nodes.sk_points"]
+    w, h = params["w"], params["h"]
+    style = render.PRESETS[params["preset"]].style(w, h)
+    points = points_mod.parse_points(_random_points(params["points"], w, h)).to_pixels((w, h))
+    image = np.random.default_rng(0).integers(0, 256, (h, w, 3), dtype=np.uint8)
+    if params["impl"] == "direct":
+        return lambda: _direct_draw(style, image.copy(), points)
+    # 清空贴图缓存，first_ms 包含全部贴图的生成
+    markers._sprite_cache = markers._SpriteCache()
+    markers._extent_cache = markers._ExtentCache()
+    markers._digit_glyphs.cache_clear()
+    return lambda: style.draw_points(image.copy(), points)
+
+
+def check_markers(results, threshold):
+    """sprites 用例的首次调用与 p50 都不能比同一负载的 direct（逐点直接绘制）慢 threshold 倍以上，返回退化的用例数"""
+    by_id = {r["id"]: r for r in results if "error" not in r}
+    regressions = 0
+    for r in results:
+        if r["suite"] != "markers" or r["params"]["impl"] != "sprites" or r["id"] not in by_id:
+            continue
+        ref = by_id.get(r["id"][:-len("sprites")] + "direct")
+        if ref is None:
+            continue
+        slow = [k for k in ("first", "p50")
+                if r["latency_ms"][k] > ref["latency_ms"][k] * threshold and r["latency_ms"][k] - ref["latency_ms"][k] > 1.0]
+        regressions += bool(slow)
+        print(f"{r['id']:<48} first {r['latency_ms']['first']:>8.1f} / {ref['latency_ms']['first']:>8.1f} ms"
+              f"  p50 {r['latency_ms']['p50']:>8.1f} / {ref['latency_ms']['p50']:>8.1f} ms{'  ❌' if slow else ''}",
+              file=sys.stderr)
+    return regressions
+
+
+SUITES = {
+    "annotate": (annotate_cases, annotate_prepare, annotate_build),
+    "merge": (merge_cases, None, merge_build),
+    "tagger": (tagger_cases, tagger_prepare, tagger_build),
+    "frames": (frames_cases, None, frames_build),
+    "presets": (presets_cases, presets_prepare, presets_build),
+    "markers": (markers_cases, None, markers_build),
+}
+
+
+# =========================================================================
+# 计量
+# =========================================================================
+def _rss():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _reset_peak_rss():
+    """Linux 上清零进程的 RSS 高水位 (VmHWM)，之后的峰值只反映当前用例；不支持时返回 False"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _percentiles(samples):
+    import numpy as np
+    arr = np.asarray(samples, dtype=np.float64)
+    p50, p90, p99 = np.percentile(arr, [50, 90, 99])
+    return {
+        "min": float(arr.min()), "mean": float(arr.mean()),
+        "p50": float(p50), "p90": float(p90), "p99": float(p99), "max": float(arr.max()),
+    }
+
+
+def _mb(n):
+    return round(n / (1024 * 1024), 1)
+
+
+def run_case(case, args, workdir):
+    build = SUITES[case["suite"]][2]
+    fn = build(case["params"], workdir)
+    gc.collect()
+    _reset_peak_rss()
+    baseline = _rss()
+
+    t0 = time.perf_counter()
+    fn()
+    first = time.perf_counter() - t0
+
+    # 单次调用很慢时按时间预算减少重复次数，至少再测一次热缓存
+    repeats = args.repeats
+    if first * repeats > args.budget:
+        repeats = max(int(args.budget / max(first, 1e-9)), 1)
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    peak = _peak_rss()
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latency = _percentiles(samples)
+    latency["first"] = first * 1000
+    return {
+        "latency_ms": {k: round(v, 3) for k, v in latency.items()},
+        "repeats": repeats,
+        "baseline_rss_mb": _mb(baseline),
+        "peak_rss_mb": _mb(peak),
+        "rss_delta_mb": _mb(max(peak - baseline, 0)),
+        "alloc_peak_mb": _mb(alloc_peak),
+    }
+
+
+def run_isolated(case, args, workdir):
+    with tempfile.NamedTemporaryFile("w+", suffix=".json", delete=False) as f:
+        out_path = f.name
+    cmd = [sys.executable, os.path.abspath(__file__), "--_child", json.dumps(case, ensure_ascii=False),
+           "--_child-out", out_path, "--repeats", str(args.repeats), "--budget", str(args.budget)]
+    try:
+        proc = subprocess.run(cmd, env=dict(os.environ, SKNODES_BENCH_DIR=workdir), timeout=args.timeout,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        with open(out_path) as f:
+            data = f.read()
+        if proc.returncode != 0 or not data:
+            tail = proc.stderr.strip().splitlines()[-1:] or [""]
+            hint = " (可能内存不足)" if proc.returncode in (-9, 137) else ""
+            return {"error": f"exit {proc.returncode}{hint}: {tail[0]}"}
+        return json.loads(data)
+    except subprocess.TimeoutExpired:
+        return {"error": f"timeout ({args.timeout}s)"}
+    finally:
+        os.unlink(out_path)
+
+
+def _child_main(args):
+    case = json.loads(args._child)
+    result = run_case(case, args, os.environ["SKNODES_BENCH_DIR"])
+    with open(args._child_out, "w") as f:
+        json.dump(result, f)
+
+
+# =========================================================================
+# 报告与对比
+# =========================================================================
+def _versions():
+    versions = {"python": platform.python_version()}
+    for name in ("numpy", "torch", "PIL", "cv2", "xxhash"):
+        try:
+            versions[name] = importlib.import_module(name).__version__
+        except Exception:
+            versions[name] = None
+    return versions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(base, new, threshold):
+    """按用例 id 对比 p50 延迟和 RSS 增量，返回判定为退化的用例数"""
+    previous = {r["id"]: r for r in base.get("results", [])}
+    regressions = 0
+    print(f"\n对比基线 {base.get('meta', {}).get('commit')} -> {new['meta'].get('commit')} (阈值 x{threshold})", file=sys.stderr)
+    for r in new["results"]:
+        old = previous.get(r["id"])
+        if old is None or "error" in r or "error" in old:
+            continue
+        p_old, p_new = old["latency_ms"]["p50"], r["latency_ms"]["p50"]
+        m_old, m_new = old["rss_delta_mb"], r["rss_delta_mb"]
+        t_ratio = p_new / p_old if p_old > 0 else 1.0
+        # 忽略 1ms / 16MB 以内的抖动
+        slow = t_ratio > threshold and p_new - p_old > 1.0
+        fat = m_new > m_old * threshold and m_new - m_old > 16
+        flag = "  ❌" if slow or fat else ""
+        regressions += bool(flag)
+        print(f"{r['id']:<48} p50 {p_old:>10.2f} -> {p_new:>10.2f} ms (x{t_ratio:.2f})"
+              f"  rss +{m_old:.0f} -> +{m_new:.0f} MB{flag}", file=sys.stderr)
+    return regressions
+
+
+def _log(msg):
+    print(f"[bench] {msg}", file=sys.stderr, flush=True)
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="SK节点库离线基准测试")
+    parser.add_argument("--suite", default=",".join(SUITES), help="逗号分隔: " + ",".join(SUITES))
+    parser.add_argument("--nodes", default=",".join(ANNOTATE_NODES), help="标注节点: " + ",".join(ANNOTATE_NODES))
+    parser.add_argument("--quick", action="store_true", help="小规模负载（冒烟测试）")
+    parser.add_argument("--sizes", type=_int_list, help="图像长边，如 512,4096")
+    parser.add_argument("--points", type=_int_list, help="标注点数量，如 0,500")
+    parser.add_argument("--filter", help="只运行 id 匹配该正则的用例")
+    parser.add_argument("--repeats", type=int, default=10, help="每个用例的重复次数（不含首次调用）")
+    parser.add_argument("--budget", type=float, default=30.0, help="单个用例的计时预算（秒），超出时减少重复次数")
+    parser.add_argument("--timeout", type=float, default=1800.0, help="单个子进程的超时（秒）")
+    parser.add_argument("--in-process", action="store_true", help="在当前进程中运行所有用例（RSS 不再隔离）")
+    parser.add_argument("--workdir", help="测试数据目录（默认临时目录，结束后删除；指定后保留以便复用）")
+    parser.add_argument("--out", help="结果 JSON 路径（默认输出到 stdout）")
+    parser.add_argument("--compare", help="与之前的结果 JSON 对比")
+    parser.add_argument("--threshold", type=float, default=1.10, help="判定退化的倍数")
+    parser.add_argument("--fail-on-regression", action="store_true", help="存在退化时返回非零退出码")
+    parser.add_argument("--list", action="store_true", help="只列出用例")
+    parser.add_argument("--_child", help=argparse.SUPPRESS)
+    parser.add_argument("--_child-out", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    args.nodes = [n for n in args.nodes.split(",") if n]
+    unknown = [n for n in args.nodes if n not in ANNOTATE_NODES]
+    if unknown:
+        parser.error(f"未知的标注节点: {unknown}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args._child:
+        return _child_main(args)
+
+    cfg = dict(QUICK if args.quick else FULL)
+    if args.sizes:
+        cfg["sizes"] = args.sizes
+    if args.points:
+        cfg["points"] = args.points
+    suites = [s for s in args.suite.split(",") if s]
+    for s in suites:
+        if s not in SUITES:
+            sys.exit(f"未知的套件: {s}")
+    cases = [c for s in suites for c in SUITES[s][0](cfg, args)]
+    if args.filter:
+        cases = [c for c in cases if re.search(args.filter, c["id"])]
+    if args.list:
+        print("\n".join(c["id"] for c in cases))
+        return 0
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="sknodes-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    os.environ["SKNODES_BENCH_DIR"] = workdir
+    try:
+        for s in suites:
+            prepare = SUITES[s][1]
+            if prepare:
+                prepare([c for c in cases if c["suite"] == s], workdir)
+
+        results = []
+        for i, case in enumerate(cases, 1):
+            if args.in_process:
+                try:
+                    result = run_case(case, args, workdir)
+                except Exception as e:
+                    result = {"error": f"{type(e).__name__}: {e}"}
+            else:
+                result = run_isolated(case, args, workdir)
+            results.append(dict(case, **result))
+            summary = result.get("error") or (f"p50 {result['latency_ms']['p50']:.2f} ms"
+                                              f" | peak {result['peak_rss_mb']:.0f} MB (+{result['rss_delta_mb']:.0f})")
+            _log(f"[{i}/{len(cases)}] {case['id']}: {summary}")
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "versions": _versions(),
+            "isolated": not args.in_process,
+            "repeats": args.repeats,
+            "env": {k: v for k, v in os.environ.items() if k.startswith("SKNODES_") and k != "SKNODES_BENCH_DIR"},
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+        _log(f"结果已写入 {args.out}")
+    else:
+        print(text)
+
+    regressions = 0
+    if any(r["suite"] == "markers" for r in results):
+        print(f"\n标记绘制 sprites / direct (阈值 x{args.threshold})", file=sys.stderr)
+        regressions += check_markers(results, args.threshold)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions += compare(json.load(f), report, args.threshold)
+    if regressions and args.fail_on_regression:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
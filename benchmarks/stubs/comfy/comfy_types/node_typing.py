@@ -0,0 +1,9 @@
+# comfy.comfy_types.node_typing 替身
+class IO:
+    ANY = "*"
+    STRING = "STRING"
+    INT = "INT"
+    FLOAT = "FLOAT"
+    BOOLEAN = "BOOLEAN"
+    IMAGE = "IMAGE"
+    MASK = "MASK"
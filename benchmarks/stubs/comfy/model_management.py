@@ -0,0 +1,10 @@
+# comfy.model_management 替身：没有加载任何模型
+current_loaded_models = []
+
+
+def soft_empty_cache(force=False):
+    pass
+
+
+def unload_all_models():
+    current_loaded_models.clear()
@@ -0,0 +1,34 @@
+# folder_paths 替身：所有目录都指向基准测试的临时工作目录（由 bench.py 通过 SKNODES_BENCH_DIR 传入）
+import os
+
+BASE = os.environ.get("SKNODES_BENCH_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "_work")
+
+
+def _sub(name):
+    path = os.path.join(BASE, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_input_directory():
+    return _sub("input")
+
+
+def get_output_directory():
+    return _sub("output")
+
+
+def get_temp_directory():
+    return _sub("temp")
+
+
+def get_user_directory():
+    return _sub("user")
+
+
+def get_annotated_filepath(name, default_dir=None):
+    # 与 ComfyUI 一致：支持 "xxx.png [input]" 形式的注解后缀
+    for suffix, getter in ((" [output]", get_output_directory), (" [temp]", get_temp_directory), (" [input]", get_input_directory)):
+        if name.endswith(suffix):
+            return os.path.join(getter(), name[:-len(suffix)])
+    return os.path.join(default_dir or get_input_directory(), name)
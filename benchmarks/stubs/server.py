@@ -0,0 +1,25 @@
+# server 替身：只提供节点模块导入时用到的 PromptServer.instance.routes / prompt_queue
+from aiohttp import web
+
+
+class _PromptQueue:
+    currently_running = {}
+
+    def __init__(self):
+        self.flags = {}
+
+    def set_flag(self, name, data):
+        self.flags[name] = data
+
+
+class _PromptServer:
+    def __init__(self):
+        self.routes = web.RouteTableDef()
+        self.prompt_queue = _PromptQueue()
+
+    def send_sync(self, event, data, sid=None):
+        pass
+
+
+class PromptServer:
+    instance = _PromptServer()
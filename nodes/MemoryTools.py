@@ -1,10 +1,10 @@
-import torch
 import gc
 import psutil
 import logging
 from server import PromptServer
 from aiohttp import web
-import comfy.model_management as mm
+
+# 本模块只注册路由，启动时导入；torch / comfy.model_management 在请求释放时才导入
 
 logger = logging.getLogger("MemoryTools")
 
@@ -12,6 +12,9 @@ prompt_server = PromptServer.instance
 
 def release_model_vram():
     """只释放模型显存（对应 Manager 的 Unload Models）"""
+    import torch
+    import comfy.model_management as mm
+
     pre_models = len(mm.current_loaded_models)
 
     # 直接设置 flag，让 ComfyUI 安全卸载（避开直接调用 unload_all_models 的 bug）
@@ -32,6 +35,9 @@ def release_model_vram():
 
 def release_all_memory():
     """彻底释放（对应 Manager 的 Free model and node cache）"""
+    import torch
+    import comfy.model_management as mm
+
     pre_models = len(mm.current_loaded_models)
     vm = psutil.virtual_memory()
     pre_cpu = vm.used / (1024**3)
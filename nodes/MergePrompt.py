@@ -1,3 +1,5 @@
+from .sk_prompt_merge import combine, make_options, merge_values
+
 class MergePrompt:
     @classmethod
     def INPUT_TYPES(s):
@@ -25,11 +27,19 @@ class MergePrompt:
                 
                 # 选项名称：分隔符独立成段
                 "分隔符独立成段": ("BOOLEAN", {"default": False, "label_on": "是", "label_off": "否", "tooltip": "如果勾选，合并后的每个【提示词输入框】片段将由换行符 + 分隔符 + 换行符连接。此时，输入框内部的分隔符将不会被用于拆分。如果分隔符本身是换行，则使用双换行符连接（\\n\\n）。"}),
+
+                "列表模式": (
+                    ["展开合并", "逐项对应", "笛卡尔积"],
+                    {"default": "展开合并", "tooltip": "输入为列表时：【展开合并】列表中的各项展开后合并为一条提示词（与以往相同）；【逐项对应】按位置逐项合并，输出提示词列表（较短的列表重复最后一项）；【笛卡尔积】输出所有组合的提示词列表"},
+                ),
             },
         }
 
     RETURN_TYPES = ("STRING",)
     RETURN_NAMES = ("合并提示词",)
+    # 列表输入（上游为列表输出）在一次执行中处理完，输出为提示词列表（单个提示词时为长度 1 的列表，下游行为不变）
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True,)
     FUNCTION = "merge"
     CATEGORY = "🌟SK节点库/提示词"
 
@@ -43,93 +53,56 @@ class MergePrompt:
         移除换行符=False,
         移除空行=False,
         分隔符独立成段=False,
+        列表模式="展开合并",
         **kwargs,
     ):
-        # 1. 确定最终使用的分隔符 (sep)
-        separator_map = {
-            "逗号": ",",
-            "句号": ".",
-            "竖线": "|",
-            "换行": "\n",
-        }
-        
-        if 自定义分隔符:
-            selected_sep = 自定义分隔符
-        else:
-            selected_sep = separator_map.get(预设分隔符, "|") 
-
-        sep = selected_sep or "" 
-        
-        # 2. 预处理前两个提示词 (此处的预处理已过时，但保留以防万一)
-        t1 = 提示词_1 or ""
-        t2 = 提示词_2 or ""
-        if 移除换行符:
-            t1 = t1.replace("\r", "").replace("\n", " ")
-            t2 = t2.replace("\r", "").replace("\n", " ")
-        
-        # 将 分隔符独立成段 标志传入 split_by，以控制是否进行内部拆分
-        def split_by(value, is_independent_segment):
-            items = value if isinstance(value, (list, tuple)) else [value]
-            out = []
-            for item in items:
-                s = "" if item is None else str(item)
-                
-                # 统一换行符 (跨平台兼容性)
-                s = s.replace("\r\n", "\n").replace("\r", "\n") 
-                
-                # 先移除空行（仅删除纯空白行，保留非空行）
-                if 移除空行:
-                    s = "\n".join([ln for ln in s.split("\n") if ln.strip()])
-                
-                # 再根据需求移除换行符 (转换为 ' ')
-                if 移除换行符:
-                    s = s.replace("\n", " ")
-
-                # 核心修改逻辑：
-                if is_independent_segment:
-                    # 将整个输入视为一个 Token，但要对整个字符串进行首尾清理
-                    s_stripped = s.strip() # <--- 关键修改：清理首尾空白
-                    if s_stripped or not 移除空行:
-                        out.append(s_stripped) # 追加清理后的字符串
-                else:
-                    # 默认逻辑：按分隔符进行拆分
-                    parts = s.split(sep) if sep else s.split()
-                    for p in parts:
-                        p = p.strip() # 此处已进行每段的首尾清理
-                        if p or not 移除空行:
-                            out.append(p)
-            return out
+        # 1. 确定最终使用的分隔符等选项（INPUT_IS_LIST：控件值以列表形式传入，取第一个）
+        opts = make_options(_first(预设分隔符), _first(自定义分隔符), _first(移除换行符), _first(移除空行), _first(分隔符独立成段))
+        mode = _first(列表模式)
 
-        # 3. 收集所有提示词片段，将 分隔符独立成段 标志传入
-        tokens = []
-        tokens.extend(split_by(t1, 分隔符独立成段))
-        tokens.extend(split_by(t2, 分隔符独立成段))
-        
+        # 2. 收集已接入的提示词（提示词_1/2 必有，3~20 仅在接入时出现），每个输入为一组批次值
+        inputs = [(_batch(提示词_1), True), (_batch(提示词_2), True)]
         for i in range(3, 21):
             key = f"提示词_{i}"
             if key in kwargs:
-                val = kwargs.get(key, "") or ""
-                tokens.extend(split_by(val, 分隔符独立成段))
+                inputs.append((_batch(kwargs[key]), False))
 
-        if 移除空行:
-            # 最终清理，移除任何空字符串
-            tokens = [x for x in tokens if x.strip()]
-
-        # 4. 执行合并 (根据 分隔符独立成段 调整连接符)
-        if 分隔符独立成段: 
-            if sep == "\n":
-                 # 特殊情况：分隔符是换行，使用双换行符 (\n\n) 隔离段落
-                 joiner = "\n\n"
-            else:
-                 # 否则，使用 换行 + 分隔符 + 换行 (\nsep\n)
-                 joiner = "\n" + sep + "\n"
+        # 3. 合并
+        if mode == "展开合并":
+            # 与逐个执行时相同：批次按位置对应（较短的重复最后一项），批次中的列表值展开为片段
+            length = max(len(values) for values, _ in inputs)
+            results = [
+                merge_values([(values[i] if i < len(values) else values[-1], leading) for values, leading in inputs], opts)
+                for i in range(length)
+            ]
         else:
-             # 默认行为：只使用分隔符本身
-             joiner = sep or " " 
-             
-        result = joiner.join(tokens)
+            # 批次与列表值一起展开为逐项的值，按位置对应或做笛卡尔积
+            columns = [[(item, leading) for item in _items(values)] for values, leading in inputs]
+            results = combine(columns, opts, "product" if mode == "笛卡尔积" else "zip")
         
-        return (result,)
+        return (results,)
+
+
+def _first(value):
+    return value[0] if isinstance(value, list) and value else value
+
+
+def _batch(value):
+    """INPUT_IS_LIST 传入的批次列表；直接调用时的单个值视为长度 1 的批次"""
+    if isinstance(value, list):
+        return value or [""]
+    return [value]
+
+
+def _items(values):
+    """批次值展开为逐项的值：列表值中的每一项各算一项"""
+    out = []
+    for v in values:
+        if isinstance(v, (list, tuple)):
+            out.extend(v)
+        else:
+            out.append(v)
+    return out
 
 NODE_CLASS_MAPPINGS = {"MergePrompt": MergePrompt}
 NODE_DISPLAY_NAME_MAPPINGS = {"MergePrompt": "🖇️提示词合并"}
\ No newline at end of file
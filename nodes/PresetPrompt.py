@@ -1,32 +1,17 @@
-import os
-import json
-from aiohttp import web 
-from server import PromptServer
+from .sk_preset_store import get_preset_store
 
 # =========================================================================
-# 路径配置：适配从 nodes/ 目录回退到根目录
+# 路径配置：默认为根目录下的 config/prompts，可通过 SKNODES_PRESET_DIR 指定（见 sk_preset_store）
 # =========================================================================
-CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
-# 向上跳一级找到 config
-PRESET_DIR = os.path.normpath(os.path.join(CURRENT_DIR, "..", "config", "prompts")) 
+PRESET_DIR = get_preset_store().folder
 
 def get_names_handler():
-    """保留原有的目录加载逻辑"""
-    if not os.path.exists(PRESET_DIR):
-        os.makedirs(PRESET_DIR, exist_ok=True)
-    files = [f[:-4] for f in os.listdir(PRESET_DIR) if f.lower().endswith(".txt")]
-    files.sort()
-    return files if files else ["无可用预设"]
+    """预设名称列表（内存中的预设库，只在文件变化时重新读取）"""
+    return get_preset_store().names()
 
 def get_prompt_content(name):
-    """保留原有的读取文件逻辑"""
-    file_path = os.path.join(PRESET_DIR, f"{name}.txt")
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except: return "读取预设失败"
-    return ""
+    """预设内容；不存在时为空字符串"""
+    return get_preset_store().get(name)[0]
 
 class PresetPrompt:
     @classmethod
@@ -57,19 +42,3 @@ class PresetPrompt:
 
 NODE_CLASS_MAPPINGS = {"PresetPrompt": PresetPrompt}
 NODE_DISPLAY_NAME_MAPPINGS = {"PresetPrompt": "🏷️提示词预设"}
-
-# =========================================================================
-# 路由注册：保留原有 API 名称，确保 JS 访问不中断
-# =========================================================================
-@PromptServer.instance.routes.get("/sklibs/prompts")
-async def _get_names(request):
-    return web.json_response(get_names_handler())
-
-@PromptServer.instance.routes.get("/sklibs/get_prompt_content")
-async def _get_content(request):
-    name = request.query.get("name")
-    return web.json_response({"prompt": get_prompt_content(name)})
-
-@PromptServer.instance.routes.post("/sklibs/reload_prompts")
-async def _reload(request):
-    return web.json_response({"status": "success", "names": get_names_handler()})
\ No newline at end of file
@@ -1,3 +1,11 @@
+import numpy as np
+from comfy.comfy_types.node_typing import IO
+
+from .sk_frame_planner import (
+    PLAN_FALLBACK, PLAN_FORCED, PLAN_INVALID, CostModel, estimate_cost, normalize_config, plan_frame, plan_frames,
+    WindowSchedule,
+)
+
 class RecommendFrameSetter:
     @classmethod
     def INPUT_TYPES(s):
@@ -16,11 +24,22 @@ class RecommendFrameSetter:
                     ["减少", "增加"], 
                     {"default": "减少", "tooltip": "当总帧数无法被窗口配置完美整除时，选择是倾向于减少最终帧数还是允许增加一个窗口循环。"}
                 ),
+                "总帧数列表": (IO.ANY, {"forceInput": True, "tooltip": "可选：多个片段的总帧数（整数列表、张量或逗号分隔的字符串），接入后忽略【总帧数】，一次规划全部片段，输出逐片段列表"}),
+                "规划目标": (["帧数误差最小", "渲染耗时最低"], {"default": "帧数误差最小", "tooltip": "【渲染耗时最低】在帧数误差不超过 最小误差+误差容忍帧数 的窗口组合中，按下方成本系数选择预估耗时最低的组合"}),
+                "误差容忍帧数": ("INT", {"default": 4, "min": 0, "max": 1000, "tooltip": "仅【渲染耗时最低】生效：允许比最小帧数误差多出的帧数"}),
+                "单窗口耗时": ("FLOAT", {"default": 10.0, "min": 0.0, "max": 100000.0, "step": 0.1, "tooltip": "成本模型：每个窗口的固定开销（秒），可按实际运行时间校准"}),
+                "单帧耗时": ("FLOAT", {"default": 1.0, "min": 0.0, "max": 100000.0, "step": 0.01, "tooltip": "成本模型：每个窗口中每帧的耗时（秒），重叠帧随窗口数重复计算"}),
+                "注意力系数": ("FLOAT", {"default": 0.01, "min": 0.0, "max": 1000.0, "step": 0.001, "tooltip": "成本模型：每个窗口随 窗口帧数² 增长的注意力耗时系数"}),
+                "每帧显存GB": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 100.0, "step": 0.01, "tooltip": "单窗口显存峰值约为 窗口帧数 × 该值；与【显存上限GB】同时大于 0 时限制窗口帧数"}),
+                "显存上限GB": ("FLOAT", {"default": 0.0, "min": 0.0, "max": 1024.0, "step": 0.5, "tooltip": "0 为不限制"}),
             },
         }
 
-    RETURN_TYPES = ("INT", "INT", "INT", "INT", "STRING")
-    RETURN_NAMES = ("窗口帧数", "窗口数", "重叠帧数", "修订总帧数", "调整信息")
+    RETURN_TYPES = ("INT", "INT", "INT", "INT", "STRING", "SK_WINDOW_SCHEDULE")
+    RETURN_NAMES = ("窗口帧数", "窗口数", "重叠帧数", "修订总帧数", "调整信息", "窗口计划")
+    # 接入总帧数列表时一次规划全部片段，前四个输出为逐片段列表（单个总帧数时为长度 1 的列表，下游行为不变）
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True, True, True, True, False, True)
     FUNCTION = "recommend"
     CATEGORY = "🌟SK节点库/视频"
 
@@ -33,130 +52,145 @@ class RecommendFrameSetter:
         窗口数量_MAX=5,
         重叠帧数=9,
         帧处理方式="减少", 
+        总帧数列表=None,
+        规划目标="帧数误差最小",
+        误差容忍帧数=4,
+        单窗口耗时=10.0,
+        单帧耗时=1.0,
+        注意力系数=0.01,
+        每帧显存GB=0.0,
+        显存上限GB=0.0,
     ):
-        T = int(总帧数 or 0)
-        min_w_input = int(窗口帧数_MIN)
-        max_w_input = int(窗口帧数_MAX)
-        min_n = int(窗口数量_MIN)
-        max_n = int(窗口数量_MAX)
-        o = int(重叠帧数)
-        
+        # INPUT_IS_LIST：控件值以列表形式传入，取第一个
+        min_w_input = int(_first(窗口帧数_MIN))
+        max_w_input = int(_first(窗口帧数_MAX))
+        min_n = int(_first(窗口数量_MIN))
+        max_n = int(_first(窗口数量_MAX))
+        o_input = int(_first(重叠帧数))
+        mode = _first(帧处理方式)
+        mem_frame = float(_first(每帧显存GB))
+        cost = None
+        if _first(规划目标) == "渲染耗时最低":
+            cost = CostModel(float(_first(单帧耗时)), float(_first(注意力系数)), float(_first(单窗口耗时)), int(_first(误差容忍帧数)))
+
+        if 总帧数列表 is not None:
+            totals = _parse_totals(总帧数列表)
+        else:
+            totals = _parse_totals(总帧数 or 0)
+
         log_info = "⚠️【窗口帧数】对应【WanVideo Long I2V Multi/InfiniteTalk】节点的frame_window_size\n⚠️【重叠帧数】对应【WanVideo Long I2V Multi/InfiniteTalk】节点的motion_frame\n⚠️【修订总帧数】可用于【ImageFromBatch】节点截取有效图片\n⚠️建议先查看【调整信息】输出的信息以便调整\n\n"
 
-        # =========================================================
-        # 1. 强制 4N+1 校验逻辑
-        # =========================================================
-        def to_4n_plus_1(val, direction="round"):
-            # 如果已经是 4n+1 则不处理
-            if (val - 1) % 4 == 0:
-                return val
-            if direction == "up":
-                return ((val - 1) // 4 + 1) * 4 + 1
-            elif direction == "down":
-                return ((val - 1) // 4) * 4 + 1
-            else:
-                return round((val - 1) / 4) * 4 + 1
-
-        min_w = to_4n_plus_1(min_w_input, "up")
-        max_w = to_4n_plus_1(max_w_input, "down")
-
-        if min_w != min_w_input:
-            log_info += f"⚙️ 窗口帧数_MIN 已从 {min_w_input} 自动修正为 {min_w} (需符合4N+1)。\n"
-        if max_w != max_w_input:
-            log_info += f"⚙️ 窗口帧数_MAX 已从 {max_w_input} 自动修正为 {max_w} (需符合4N+1)。\n"
-
-        # 规范化范围
-        if min_w > max_w:
-            max_w = min_w
-            log_info += f"⚠️ 警告: 修正后的 MIN 超过了 MAX，已强制设置 MAX={max_w}。\n"
-        
-        if min_n > max_n:
-            min_n, max_n = max_n, min_n
-            log_info += f"⚠️ 警告: 窗口数量_MIN > 窗口数量_MAX, 已互换。\n"
-        
-        if T <= 0:
-            return (0, 0, o, 0, "❌ 错误: 总帧数必须大于 0。")
-
-        if o >= max_w:
-            o = max_w // 2 
-            if o < 1: o = 1
-            log_info += f"⚠️ 警告: 重叠帧数({重叠帧数})过大, 已调整为 {o}。\n"
-        
-        # =========================================================
-        # 2. 迭代搜索最优解 (确保 W 始终为 4N+1)
-        # =========================================================
-        best_decrease = None  
-        best_increase = None  
-        
-        best_diff_decrease = float('inf') 
-        best_diff_increase = float('inf') 
-
-        for n in range(min_n, max_n + 1):
-            
-            # --- R <= T 的计算 ---
-            # 计算理论允许的最大窗口帧数
-            w_allow_decrease = (T + o * (n - 1)) // n
-            # 找到小于等于 w_allow_decrease 的最大 4n+1
-            w_dec_candidate = to_4n_plus_1(w_allow_decrease, "down")
-            
-            if w_dec_candidate >= min_w:
-                w_dec = min(w_dec_candidate, max_w)
-                R_dec = w_dec * n - o * (n - 1)
-                diff = T - R_dec
-                if diff >= 0 and diff < best_diff_decrease:
-                    best_diff_decrease = diff
-                    best_decrease = (w_dec, n, o, R_dec)
-
-            # --- R > T 的计算 ---
-            # 找到大于 w_allow_decrease 的最小 4n+1
-            w_inc_candidate = to_4n_plus_1(w_allow_decrease + 1, "up")
-            w_inc = max(w_inc_candidate, min_w)
-            
-            if w_inc <= max_w:
-                R_inc = w_inc * n - o * (n - 1)
-                if R_inc > T:
-                    diff = R_inc - T
-                    if diff < best_diff_increase:
-                        best_diff_increase = diff
-                        best_increase = (w_inc, n, o, R_inc)
-
-        # =========================================================
-        # 3. 根据 "帧处理方式" 选择最终结果
-        # =========================================================
-        best = None
-        
-        if 帧处理方式 == "减少":
-            best = best_decrease
-            if best is None:
-                # 强制使用 min_w (符合4n+1)
-                best = (min_w, min_n, o, min_w * min_n - o * (min_n - 1))
-                info = log_info + f"❌ 无法满足 R<=T。强制推荐: N={best[1]}, W={best[0]} (R={best[3]} > T={T})。"
-            else:
-                info = log_info + f"✅ 推荐参数(4N+1): 窗口数={best[1]}, 窗口帧数={best[0]}。\n✨ 修订总帧数={best[3]}，较目标减少 {T - best[3]} 帧。"
-        
-        else: # 增加
-            best = best_increase
-            if best is None:
-                best = best_decrease
-                if best is not None:
-                    info = log_info + f"⚠️ 找不到 R>T 的解。已回退到 R<=T 的最优解 (相差 {T - best[3]} 帧)。"
-                else:
-                    best = (min_w, min_n, o, min_w * min_n - o * (min_n - 1))
-                    info = log_info + f"❌ 无法找到任何有效解。强制推荐: N={best[1]}, W={best[0]}。"
-            else:
-                info = log_info + f"✅ 推荐参数(4N+1): 窗口数={best[1]}, 窗口帧数={best[0]}。\n✨ 原始计算 R={best[3]}，较目标增加 {best[3] - T} 帧。"
-        
-        # =========================================================
-        # 4. 修订和返回
-        # =========================================================
-        W, N, O, R_calc = best
-        final_R = R_calc
-        
-        if 帧处理方式 == "增加" and R_calc > T:
-             final_R = T
-             info += f"\n\n❗ **提示：** 模式为'增加'且计算值 {R_calc} > {T}，**修订总帧数**已锁定为输入值 {T}。"
-
-        return (W, N, O, final_R, info)
+        # 4N+1 校验、范围规范化与重叠帧数修正
+        cfg, notes, overlap_note = normalize_config(min_w_input, max_w_input, min_n, max_n, o_input, mode,
+                                                    cost, mem_frame, float(_first(显存上限GB)))
+        log_info += notes
+
+        # (T, N) 网格向量化求解，相同窗口配置下的总帧数查表
+        if len(totals) == 1:
+            plan = plan_frame(totals[0], cfg, overlap_input=o_input)
+            info = _single_info(log_info, overlap_note, int(totals[0]), cfg, plan, mem_frame)
+            schedule = WindowSchedule(plan.window, plan.count, plan.overlap, plan.revised)
+            return ([plan.window], [plan.count], [plan.overlap], [plan.revised], info, [schedule])
+
+        totals = np.asarray(totals, dtype=np.int64)
+        plan = plan_frames(totals, cfg, overlap_input=o_input)
+        info = _batch_info(log_info, overlap_note, totals, cfg, plan, mem_frame)
+        columns = (plan.window.tolist(), plan.count.tolist(), plan.overlap.tolist(), plan.revised.tolist())
+        schedules = list(map(WindowSchedule._make, zip(*columns)))
+        return columns + (info, schedules)
+
+
+def _first(value):
+    return value[0] if isinstance(value, list) and value else value
+
+
+def _parse_totals(value):
+    """总帧数列表：整数、列表（可嵌套）、NumPy 数组、张量，或以逗号/空白分隔的字符串，展开为一维序列"""
+    if value is None:
+        value = 0
+    if isinstance(value, int):
+        return [value]
+    if isinstance(value, list) and len(value) == 1 and isinstance(value[0], int):
+        return value   # 最常见的单个总帧数，不经过 NumPy
+    if hasattr(value, "detach"):
+        value = value.detach().cpu().numpy()
+    if isinstance(value, str):
+        value = value.replace("，", ",").replace(",", " ").split()
+    elif isinstance(value, (list, tuple)):
+        try:
+            return np.asarray(value, dtype=np.float64).round().astype(np.int64).ravel()
+        except (TypeError, ValueError):
+            pass
+        # 混合类型（字符串、张量、不等长的嵌套列表）逐项解析
+        flat = []
+        for v in value:
+            flat.extend(_parse_totals(v))
+        return np.asarray(flat, dtype=np.int64)
+    return np.asarray(value, dtype=np.float64).round().astype(np.int64).ravel()
+
+
+def _cost_line(cfg, W, N, mem_frame):
+    line = f"💰 预估渲染耗时 {estimate_cost(cfg.cost, W, N):.1f} 秒" if cfg.cost else ""
+    if mem_frame > 0:
+        line += f"{'，' if line else '💾 '}单窗口显存峰值约 {W * mem_frame:.2f} GB"
+    return line
+
+
+def _single_info(log_info, overlap_note, T, cfg, plan, mem_frame=0.0):
+    """单个总帧数的调整信息（与逐个计算时的文字一致）"""
+    status = plan.status
+    if status == PLAN_INVALID:
+        return "❌ 错误: 总帧数必须大于 0。"
+    log_info += overlap_note
+    W, N, R = plan.window, plan.count, plan.raw
+
+    if not cfg.increase:
+        if status == PLAN_FORCED:
+            info = log_info + f"❌ 无法满足 R<=T。强制推荐: N={N}, W={W} (R={R} > T={T})。"
+        else:
+            info = log_info + f"✅ 推荐参数(4N+1): 窗口数={N}, 窗口帧数={W}。\n✨ 修订总帧数={R}，较目标减少 {T - R} 帧。"
+    else:
+        if status == PLAN_FALLBACK:
+            info = log_info + f"⚠️ 找不到 R>T 的解。已回退到 R<=T 的最优解 (相差 {T - R} 帧)。"
+        elif status == PLAN_FORCED:
+            info = log_info + f"❌ 无法找到任何有效解。强制推荐: N={N}, W={W}。"
+        else:
+            info = log_info + f"✅ 推荐参数(4N+1): 窗口数={N}, 窗口帧数={W}。\n✨ 原始计算 R={R}，较目标增加 {R - T} 帧。"
+
+    cost_line = _cost_line(cfg, W, N, mem_frame)
+    if cost_line:
+        info += f"\n{cost_line}。"
+    if cfg.increase and R > T:
+        info += f"\n\n❗ **提示：** 模式为'增加'且计算值 {R} > {T}，**修订总帧数**已锁定为输入值 {T}。"
+    return info
+
+
+def _batch_info(log_info, overlap_note, totals, cfg, plan, mem_frame=0.0):
+    """多个总帧数的汇总信息"""
+    valid = plan.status != PLAN_INVALID
+    if valid.any():
+        log_info += overlap_note
+    info = log_info + f"✅ 已规划 {len(totals)} 个片段（{len(np.unique(totals))} 种总帧数）。"
+    counts = [
+        (PLAN_FORCED, "❌ 无解、强制使用最小窗口配置"),
+        (PLAN_FALLBACK, "⚠️ 找不到 R>T、回退到 R<=T"),
+        (PLAN_INVALID, "❌ 总帧数 <= 0"),
+    ]
+    for status, label in counts:
+        hit = np.flatnonzero(plan.status == status)
+        if len(hit):
+            shown = ", ".join(str(i) for i in hit[:10].tolist()) + (" ..." if len(hit) > 10 else "")
+            info += f"\n{label}: {len(hit)} 个片段（序号 {shown}）"
+    if valid.any():
+        diff = plan.raw[valid] - totals[valid]
+        info += f"\n✨ 计算帧数较目标：减少 {int(-diff[diff < 0].sum())} 帧 / 增加 {int(diff[diff > 0].sum())} 帧"
+        if cfg.increase and (diff > 0).any():
+            info += "（“增加”方式下修订总帧数已锁定为各片段的输入值）"
+        if cfg.cost:
+            info += f"\n💰 预估渲染耗时合计 {estimate_cost(cfg.cost, plan.window[valid], plan.count[valid]).sum():.1f} 秒"
+        if mem_frame > 0:
+            info += f"\n💾 单窗口显存峰值最高约 {plan.window[valid].max() * mem_frame:.2f} GB"
+    return info
 
 NODE_CLASS_MAPPINGS = {"RecommendFrameSetter": RecommendFrameSetter}
 NODE_DISPLAY_NAME_MAPPINGS = {"RecommendFrameSetter": "🧮Multi/InfiniteTalk帧数计算器"}
\ No newline at end of file
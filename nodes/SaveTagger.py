@@ -1,4 +1,11 @@
 import os
+from .sk_file_index import get_folder_listing
+from .sk_caption_writer import WRITE_WAIT, format_caption, get_caption_writer
+from .sk_dataset_export import get_shard_exporter
+from .sk_tag_manifest import caption_name, get_tag_manifest, settings_hash
+
+# 输出方式 -> 分片格式（None 为在图片旁写入同名 .txt）
+OUTPUT_FORMATS = {"txt 文件": None, "tar 分片": "tar", "jsonl 分片": "jsonl"}
 
 class SK_TagFileSaver_Ultimate:
     def __init__(self):
@@ -8,33 +15,73 @@ class SK_TagFileSaver_Ultimate:
     def INPUT_TYPES(s):
         return {
             "required": {
-                "文本输入": ("STRING", {"forceInput": True}),
+                # 惰性输入：“仅输出待处理序号”模式下不请求上游打标结果，上游反推不会执行
+                "文本输入": ("STRING", {"forceInput": True, "lazy": True}),
                 "存放路径": ("STRING", {"default": "请输入图片所在的文件夹绝对路径", "tooltip": "文本文件需要保存在图片所在目录"}),
                 "是否添加触发词": (["是", "否"], {"default": "否", "tooltip": "如果选择【是】，请在下方输入触发词，触发词将添加在文本之前"}),
                 "触发词": ("STRING", {"multiline": False, "default": "", "tooltip": "【是否添加触发词】选择【是】，此处才生效"}),
                 "追加标签": ("STRING", {"multiline": True, "default": "", "placeholder": "此处可输入额外追加的后缀标签"}),
+            },
+            "optional": {
+                "续打模式": (["关闭", "续打", "仅输出待处理序号"], {"default": "关闭", "tooltip": "【续打】循环模式从上次保存的进度继续（重启后不会从第 1 张重新开始）；【仅输出待处理序号】不写入文件，只输出尚未按当前触发词/追加标签完成打标的图片序号。任何模式下内容未变化、且打标文件未被手动修改的条目都会跳过写入"}),
+                "图片序号": ("INT", {"forceInput": True, "tooltip": "可选：显式指定文本对应的图片序号（从 0 开始），可接入“待处理序号”让上游只处理剩余图片；列表模式下可接入序号列表，接入单个整数时作为起始序号"}),
+                "输出方式": (list(OUTPUT_FORMATS), {"default": "txt 文件", "tooltip": "【tar 分片】webdataset 风格，每个样本为 图片 + .txt；【jsonl 分片】每行一个样本（图片为 base64）。分片按样本追加，附带可随机读取的索引"}),
+                "分片大小MB": ("INT", {"default": 1024, "min": 1, "max": 65536, "tooltip": "仅分片输出时生效：单个分片超过该大小后换新分片"}),
+                "导出路径": ("STRING", {"default": "", "tooltip": "仅分片输出时生效：留空时导出到图片目录下的 sk_dataset 子目录"}),
             }
         }
 
-    RETURN_TYPES = ("STRING",)
-    RETURN_NAMES = ("日志",)
+    RETURN_TYPES = ("STRING", "INT", "INT")
+    RETURN_NAMES = ("日志", "待处理序号", "待处理数量")
+    OUTPUT_IS_LIST = (False, True, False)
+    OUTPUT_TOOLTIPS = ("写入结果", "仅在【仅输出待处理序号】模式下输出，其它模式为空列表", "仅在【仅输出待处理序号】模式下输出，其它模式为 -1")
     FUNCTION = "save_tags_adaptive"
     CATEGORY = "🌟SK节点库/工具"
     OUTPUT_NODE = True
 
-    def save_tags_adaptive(self, 文本输入, 存放路径, 是否添加触发词, 触发词, 追加标签):
+    @classmethod
+    def IS_CHANGED(s, 续打模式="关闭", **kwargs):
+        # 这两种模式的结果取决于进度清单 / 分片索引（待处理列表、续打进度），而不是节点输入，每次都重新执行
+        if 续打模式 in ("续打", "仅输出待处理序号"):
+            return float("nan")
+        return ""
+
+    def check_lazy_status(self, 续打模式="关闭", **kwargs):
+        return [] if 续打模式 == "仅输出待处理序号" else ["文本输入"]
+
+    def save_tags_adaptive(self, 文本输入, 存放路径, 是否添加触发词, 触发词, 追加标签, 续打模式="关闭", 图片序号=None,
+                           输出方式="txt 文件", 分片大小MB=1024, 导出路径=""):
         full_path = os.path.abspath(存放路径)
         if not os.path.isdir(full_path):
-            return (f"❌ 路径不存在: {full_path}",)
+            return (f"❌ 路径不存在: {full_path}", [], -1)
 
         # 重点：必须使用与 1 号节点完全一致的过滤和排序逻辑
         # 1. 只读取图片扩展名
         exts = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
         # 2. 强制使用字符排序 (sorted 默认即是)，确保 1 后面是 10
-        img_files = sorted([f for f in os.listdir(full_path) if f.lower().endswith(exts)])
+        # 列表按目录 mtime 缓存并增量更新，循环模式下不必每张图都重新 listdir + 排序
+        listing = get_folder_listing(full_path, exts)
+        img_files = listing.get()
         
         if not img_files:
-            return ("⚠️ 文件夹内无图片",)
+            return ("⚠️ 文件夹内无图片", [], -1)
+
+        trigger = 触发词.strip() if 是否添加触发词 == "是" else ""
+        suffix = 追加标签.strip()
+        settings = settings_hash(trigger, suffix)
+        manifest = get_tag_manifest(full_path)
+        # 完成情况：txt 输出以进度清单为准，分片输出以分片索引为准
+        shard_format = OUTPUT_FORMATS.get(输出方式)
+        if shard_format:
+            export_dir = 导出路径.strip() or os.path.join(full_path, "sk_dataset")
+            store = get_shard_exporter(export_dir, shard_format, 分片大小MB * 1024 * 1024)
+        else:
+            store = manifest
+
+        if 续打模式 == "仅输出待处理序号":
+            pending = store.pending(img_files, settings)
+            log = f"📋 待处理 {len(pending)}/{len(img_files)} 张图片 ({full_path})"
+            return (log, pending, len(pending))
 
         # 识别模式 (Llama 列表模式 或 循环字符串模式)
         if isinstance(文本输入, list):
@@ -44,42 +91,74 @@ class SK_TagFileSaver_Ultimate:
             text_items = [文本输入]
             is_loop_mode = True
 
-        results = []
+        # 续打：循环进度以清单中保存的为准（节点实例重建、ComfyUI 重启后不会归零）
+        explicit = 图片序号 is not None
+        if 续打模式 == "续打" and is_loop_mode and not explicit:
+            self.counter = manifest.cursor if manifest.cursor < len(img_files) else 0
+
+        samples, notes = [], []   # [(图片文件名, 打标内容)]
 
         for i, raw_content in enumerate(text_items):
-            actual_idx = self.counter if is_loop_mode else i
-            
+            if not explicit:
+                actual_idx = self.counter if is_loop_mode else i
+            elif isinstance(图片序号, list):
+                if i >= len(图片序号):
+                    break
+                actual_idx = int(图片序号[i])
+            else:
+                actual_idx = int(图片序号) + i
+
             # 索引保护：防止图片数量少于文本条数
             if actual_idx >= len(img_files):
-                break
+                if not explicit:
+                    break
+                notes.append(f"⚠️ 序号 {actual_idx} 超出图片数量 {len(img_files)}，已忽略")
+                continue
 
-            content = str(raw_content).strip()
-            if 是否添加触发词 == "是" and 触发词.strip():
-                content = f"{触发词.strip()}, {content}"
-            if 追加标签.strip():
-                content = f"{content}, {追加标签.strip()}"
+            content = format_caption(raw_content, trigger, suffix)
 
             # 关键：按排序后的索引取出对应的图片文件名，确保 1-1 对应
             target_img = img_files[actual_idx]
-            file_name = os.path.splitext(target_img)[0] + ".txt"
-            file_path = os.path.join(full_path, file_name)
+            if store.is_current(target_img, settings, content):
+                notes.append(f"⏭️ {target_img if shard_format else caption_name(target_img)}: 内容未变化，跳过")
+            else:
+                samples.append((target_img, content))
 
-            try:
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(content)
-                results.append(f"✅ {file_name}")
-            except Exception as e:
-                results.append(f"❌ {file_name}: {str(e)}")
-
-            if is_loop_mode:
+            if is_loop_mode and not explicit:
                 self.counter += 1
                 if self.counter >= len(img_files):
                     self.counter = 0
 
         if not is_loop_mode:
             self.counter = 0
+        elif not explicit:
+            manifest.set_cursor(self.counter)
+
+        if shard_format:
+            # 分片追加是顺序写入，直接在本次执行中完成（每批结束时 fsync 分片和索引）
+            try:
+                results = store.append(full_path, samples, settings)
+            except Exception as e:
+                results = [f"❌ 导出失败: {e}"]
+            return ("\n".join(results + notes), [], -1)
+
+        # 交给后台写入线程（临时文件 + 重命名，批量提交），最多等待 WRITE_WAIT 秒；写入成功的条目记入清单
+        def on_written(k):
+            manifest.record(samples[k][0], samples[k][1], settings)
+
+        items = [(caption_name(name), content) for name, content in samples]
+        writer = get_caption_writer()
+        job = writer.submit(full_path, items, guard=listing.own_writes, on_written=on_written)
+        finished = job.wait(WRITE_WAIT)
+        results = writer.take_reports(full_path, exclude=job)
+        if finished:
+            writer.mark_reported(job)
+            results.extend(job.lines())
+        else:
+            results.append(f"⏳ 已写入 {job.done}/{job.total} 个文件，其余在后台继续写入，结果将在下次执行时报告")
+        results.extend(notes)
 
-        return ("\n".join(results),)
+        return ("\n".join(results), [], -1)
 
 NODE_CLASS_MAPPINGS = { "SK_TagFileSaver_Ultimate": SK_TagFileSaver_Ultimate }
 NODE_DISPLAY_NAME_MAPPINGS = { "SK_TagFileSaver_Ultimate": "🗃️打标文件保存(兼容小助手&llama)" }
\ No newline at end of file
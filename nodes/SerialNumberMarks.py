@@ -1,22 +1,20 @@
-import torch
-import numpy as np
-import json
-import os
-from PIL import Image, ImageDraw, ImageFont
-import folder_paths
-
-import hashlib
+from .sk_file_index import get_input_files
+from .sk_render import render
+from .sk_fingerprint import node_fingerprint
 
 class SerialNumberMarks:
     @classmethod
     def INPUT_TYPES(s):
-        input_dir = folder_paths.get_input_directory()
-        files = [f for f in os.listdir(input_dir) if os.path.isfile(os.path.join(input_dir, f))] if os.path.exists(input_dir) else []
+        files = get_input_files(recursive=False)
         return {
             "required": {
-                "image": (sorted(files), {"image_upload": True}),
+                "image": (files, {"image_upload": True}),
                 "points_data": ("STRING", {"default": "[]"}),
             },
+            "optional": {
+                # 接入后对整个批次标注，不再读取 image 文件（image 仅作为点位坐标参考）
+                "images": ("IMAGE",),
+            },
         }
 
     RETURN_TYPES = ("IMAGE", "STRING")
@@ -26,42 +24,14 @@ class SerialNumberMarks:
 
     # Nodes2.0，确保前端感知到状态变化
     @classmethod
-    def IS_CHANGED(s, image, points_data):
-        # 使用 SHA256 确保跨会话的一致性，避免不必要的重新执行
-        m = hashlib.sha256()
-        m.update(image.encode())
-        m.update(points_data.encode())
-        return m.hexdigest()
-
-    def annotate(self, image, points_data):
-        try:
-            pts = json.loads(points_data)
-        except:
-            pts = []
-        if not image:
-            return (torch.zeros((1, 512, 512, 3)), "[]")
-        
-        img_path = folder_paths.get_annotated_filepath(image)
-        img = Image.open(img_path).convert("RGB")
-        draw = ImageDraw.Draw(img)
-        w, h = img.size
-        
-        r = max(int(min(w, h) * 0.025), 15)
-        font = None
-        for f in ["arialbd.ttf", "arial.ttf", "DejaVuSans-Bold.ttf"]:
-            try:
-                font = ImageFont.truetype(f, int(r * 1.3))
-                break
-            except: continue
-        if not font: font = ImageFont.load_default()
-
-        for i, p in enumerate(pts):
-            px, py = p['x'], p['y']
-            draw.ellipse([px-r, py-r, px+r, py+r], fill=(255, 0, 0), outline=(255, 255, 255), width=int(r*0.1))
-            draw.text((px, py), str(i+1), fill=(255, 255, 255), font=font, anchor="mm")
-
-        out = torch.from_numpy(np.array(img).astype(np.float32) / 255.0)[None,]
-        return (out, json.dumps(pts))
+    def IS_CHANGED(s, image, points_data, images=None):
+        # 原图按文件身份判断（同名替换也能感知），点位使用快速摘要；结果跨会话稳定
+        return node_fingerprint(image, points_data)
+
+    def annotate(self, image, points_data, images=None):
+        # 共用渲染引擎，只需要 "原图 + 标注点" 一个输出
+        result = render("serial", image, points_data, images=images, outputs={3})
+        return (result[3], result[4])
 
 NODE_CLASS_MAPPINGS = {"SerialNumberMarks": SerialNumberMarks}
 NODE_DISPLAY_NAME_MAPPINGS = {"SerialNumberMarks": "🌟交互式序号标注工具"}
\ No newline at end of file
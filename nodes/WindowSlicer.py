@@ -0,0 +1,75 @@
+# WindowSlicer.py - 按帧数计算器的窗口计划切分 IMAGE / 音频嵌入批次
+# 沿帧维度的切片都是原批次的视图（torch.narrow / NumPy 切片），不复制数据；
+# 下游节点如果原地修改输出，会同时修改上游的原批次。
+
+import numpy as np
+import torch
+from comfy.comfy_types.node_typing import IO
+
+
+def _frames(value, dim):
+    if isinstance(value, (torch.Tensor, np.ndarray)):
+        return value.shape[dim] if value.ndim > dim else None
+    if isinstance(value, (list, tuple)):
+        return len(value)
+    return None
+
+
+def take_frames(value, start, end, dim=0, min_frames=0):
+    """
+    取 [start, end) 帧的视图（超出长度的部分截断）。
+    dict 中沿 dim 至少有 min_frames 帧的张量/数组/列表按帧切分，其余值原样保留。
+    """
+    if isinstance(value, dict):
+        return {k: take_frames(v, start, end, dim, min_frames) if (_frames(v, dim) or 0) >= max(min_frames, 1) else v
+                for k, v in value.items()}
+    length = _frames(value, dim)
+    if length is None:
+        return value
+    start = min(start, length)
+    end = max(min(end, length), start)
+    if isinstance(value, torch.Tensor):
+        return value.narrow(dim, start, end - start)
+    if isinstance(value, np.ndarray):
+        return value[(slice(None),) * dim + (slice(start, end),)]
+    return value[start:end]   # 列表只复制元素引用
+
+
+class SK_WindowSlicer:
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "窗口计划": ("SK_WINDOW_SCHEDULE", {"forceInput": True, "tooltip": "🧮Multi/InfiniteTalk帧数计算器 -> 窗口计划"}),
+                "窗口序号": ("INT", {"default": -1, "min": -1, "max": 999, "tooltip": "-1 输出全部窗口（列表，下游按窗口逐个执行）；其它值只输出该窗口（从 0 开始）"}),
+            },
+            "optional": {
+                "图像": ("IMAGE",),
+                "音频嵌入": (IO.ANY, {"forceInput": True, "tooltip": "张量 / 数组 / 列表，或包含它们的字典（字典中帧数不少于修订总帧数的项按帧切分，其余原样保留）"}),
+                "帧维度": ("INT", {"default": 0, "min": 0, "max": 8, "tooltip": "音频嵌入的帧所在维度（图像固定为第 0 维）"}),
+            },
+        }
+
+    RETURN_TYPES = ("IMAGE", IO.ANY, "INT", "INT", "IMAGE")
+    RETURN_NAMES = ("窗口图像", "窗口嵌入", "起始帧", "结束帧", "有效帧图像")
+    OUTPUT_IS_LIST = (True, True, True, True, False)
+    FUNCTION = "slice_windows"
+    CATEGORY = "🌟SK节点库/视频"
+
+    def slice_windows(self, 窗口计划, 窗口序号=-1, 图像=None, 音频嵌入=None, 帧维度=0):
+        windows = 窗口计划.windows
+        if 窗口序号 >= 0:
+            if 窗口序号 >= len(windows):
+                raise ValueError(f"窗口序号 {窗口序号} 超出范围（共 {len(windows)} 个窗口）")
+            windows = [windows[窗口序号]]
+
+        frames = 窗口计划.frames
+        images = [take_frames(图像, s, e) if 图像 is not None else None for s, e in windows]
+        embeds = [take_frames(音频嵌入, s, e, 帧维度, frames) if 音频嵌入 is not None else None for s, e in windows]
+        # 代替 ImageFromBatch 截取修订总帧数
+        valid = take_frames(图像, 0, frames) if 图像 is not None else None
+        return (images, embeds, [s for s, _ in windows], [e for _, e in windows], valid)
+
+
+NODE_CLASS_MAPPINGS = {"SK_WindowSlicer": SK_WindowSlicer}
+NODE_DISPLAY_NAME_MAPPINGS = {"SK_WindowSlicer": "✂️Multi/InfiniteTalk窗口切片"}
@@ -0,0 +1,97 @@
+# sk_batch.py - IMAGE 张量批量标注：标记/涂鸦先渲染为一张预乘图层，再分块叠加到整个批次
+
+import os
+
+import numpy as np
+import torch
+from PIL import Image
+
+from .sk_outputs import to_image_tensor
+
+# 每次同时处理的帧数，可通过环境变量 SKNODES_BATCH_CHUNK 调整
+BATCH_CHUNK = max(int(os.environ.get("SKNODES_BATCH_CHUNK", "16")), 1)
+
+
+def reference_size(image_path):
+    """标注点所在坐标系（输入目录中原图）的尺寸 (宽, 高)，只读取文件头"""
+    try:
+        with Image.open(image_path) as im:
+            return im.size
+    except Exception:
+        return None
+
+
+def rgba_layer(rgba):
+    """非预乘 RGBA (uint8) 转为预乘图层 (color, alpha)"""
+    alpha = rgba[:, :, 3:4]
+    acc = rgba[:, :, :3].astype(np.uint16) * alpha
+    color = ((acc + 127) // 255).astype(np.uint8)
+    return color, np.ascontiguousarray(alpha)
+
+
+def layer_over(top, bottom):
+    """预乘图层叠加：top 覆盖在 bottom 之上"""
+    tc, ta = top
+    bc, ba = bottom
+    inv = (255 - ta).astype(np.uint16)
+    color = tc + ((bc * inv + 127) // 255).astype(np.uint8)
+    alpha = ta + ((ba * inv + 127) // 255).astype(np.uint8)
+    return color, alpha
+
+
+def apply_layer(images, layer, chunk=BATCH_CHUNK):
+    """
+    将预乘图层叠加到 [B,H,W,C] 浮点图像批次上，返回新张量（不修改输入）。
+    仅在图层 alpha 包围盒内计算，按 chunk 帧分块，临时内存与批次大小无关。
+    """
+    out = torch.empty_like(images)
+    color, alpha = layer
+    rows = np.flatnonzero(alpha.any(axis=(1, 2)))
+    box = None
+    if rows.size:
+        cols = np.flatnonzero(alpha[rows[0]:rows[-1] + 1].any(axis=(0, 2)))
+        box = (int(rows[0]), int(rows[-1]) + 1, int(cols[0]), int(cols[-1]) + 1)
+        y0, y1, x0, x1 = box
+        c = torch.from_numpy(color[y0:y1, x0:x1]).to(images.device, images.dtype).div_(255.0)
+        inv = torch.from_numpy(alpha[y0:y1, x0:x1]).to(images.device, images.dtype).div_(-255.0).add_(1.0)
+
+    for s in range(0, images.shape[0], chunk):
+        dst = out[s:s + chunk]
+        dst.copy_(images[s:s + chunk])
+        if box is not None:
+            region = dst[:, y0:y1, x0:x1, :3]
+            region.mul_(inv).add_(c)
+    return out
+
+
+def annotate_batch(images, style, points, doodle_rgba, out):
+    """
+    标注工具的批量输出 (images, mask, image_doodle, image_points)：
+    点位/涂鸦图层各渲染一次，相同的输出共享张量（无涂鸦且无点位时直接返回输入），out 未要求的输出返回 None。
+    points 为帧坐标系中的像素 PointSet，out 为 OutputAssembler。
+    """
+    _, h, w = images.shape[:3]
+    has_doodle = bool(doodle_rgba[:, :, 3].any())
+    has_points = points.any()
+    layers = {}
+
+    def layer(name):
+        if name not in layers:
+            layers[name] = style.render_layer(points, h, w) if name == "points" else rgba_layer(doodle_rgba)
+        return layers[name]
+
+    def apply(key):
+        if key == (False, False):
+            return images
+        if key == (True, True):
+            return apply_layer(images, layer_over(layer("points"), layer("doodle")))
+        return apply_layer(images, layer("doodle") if key[0] else layer("points"))
+
+    key_all, key_doodle, key_points = (has_doodle, has_points), (has_doodle, False), (False, has_points)
+    return (
+        out.get(0, key_all, lambda: apply(key_all)),
+        # 各帧共享同一张掩码：expand 视图不复制数据（本模块没有需要连续内存的使用方，需要时再 .contiguous()）
+        out.get(1, "mask", lambda: to_image_tensor(doodle_rgba[:, :, 3]).expand(images.shape[0], -1, -1)),
+        out.get(2, key_doodle, lambda: apply(key_doodle)),
+        out.get(3, key_points, lambda: apply(key_points)),
+    )
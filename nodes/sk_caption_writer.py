@@ -0,0 +1,226 @@
+# sk_caption_writer.py - 打标文本的后台批量写入（临时文件 + 重命名，目录 fsync 按批合并）
+# 同一目标文件总是由同一个写入线程处理，按提交顺序落盘，重复提交时新内容不会被旧内容覆盖。
+
+import atexit
+import contextlib
+import os
+import queue
+import threading
+import zlib
+
+WRITE_WORKERS = max(int(os.environ.get("SKNODES_TAG_WRITERS", "4")), 1)
+# 每批最多写入的文件数；目录 fsync 在队列空闲或累计 8 批后对涉及的目录各做一次
+WRITE_BATCH = 256
+# 节点等待本次写入完成的最长时间（秒），超时后在后台继续写入，结果在下次执行时报告
+WRITE_WAIT = float(os.environ.get("SKNODES_TAG_WRITE_WAIT", "10"))
+# SKNODES_TAG_FSYNC=1 时每个文件在重命名前 fsync（更安全，网络盘上明显更慢）
+FSYNC_FILES = os.environ.get("SKNODES_TAG_FSYNC", "0").lower() in ("1", "true", "yes")
+
+
+def format_caption(text, trigger="", suffix=""):
+    """最终打标内容：触发词（已去除首尾空白，空字符串表示不添加）在前，追加标签在后"""
+    content = str(text).strip()
+    if trigger:
+        content = f"{trigger}, {content}"
+    if suffix:
+        content = f"{content}, {suffix}"
+    return content
+
+
+class WriteJob:
+    """一次提交的写入任务：按提交顺序记录每个文件的结果"""
+
+    def __init__(self, folder, names, on_written=None):
+        self.folder = folder
+        self.names = names
+        self.on_written = on_written   # 可选回调 (序号)，在写入线程中于该文件写入成功后调用
+        self.errors = [None] * len(names)
+        self.done = 0
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        if not names:
+            self._finished.set()
+
+    @property
+    def total(self):
+        return len(self.names)
+
+    def _record(self, index, error=None):
+        # 回调在计入完成之前调用，wait() 返回时所有回调都已执行
+        if error is None and self.on_written is not None:
+            try:
+                self.on_written(index)
+            except Exception as e:
+                print(f"SK-Nodes Error: 打标写入回调失败: {e}")
+        with self._lock:
+            self.errors[index] = error
+            self.done += 1
+            if self.done == len(self.names):
+                self._finished.set()
+
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+    def finished(self):
+        return self._finished.is_set()
+
+    def lines(self):
+        """逐文件的日志行（仅在任务完成后调用）"""
+        return [f"❌ {name}: {err}" if err else f"✅ {name}" for name, err in zip(self.names, self.errors)]
+
+    def summary(self):
+        failed = [(n, e) for n, e in zip(self.names, self.errors) if e]
+        text = f"📝 后台写入完成: {self.total - len(failed)}/{self.total} 个文件 ({self.folder})"
+        return "\n".join([text] + [f"❌ {n}: {e}" for n, e in failed])
+
+
+def _fsync_dir(path):
+    if os.name == "nt":
+        return  # Windows 不支持对目录 fsync
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_text(path, content):
+    """写入同目录下的临时文件后重命名，读取方不会看到写了一半的文件"""
+    # 同一目标文件只由一个写入线程处理，临时文件名按 目标 + 进程号 即可保证唯一
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+            if FSYNC_FILES:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _unchanged(path, content):
+    """目标文件内容已相同（例如重复执行同一批打标）时跳过写入，避免无谓的重命名和回写"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read(len(content) + 1) == content
+    except (OSError, UnicodeDecodeError):
+        return False
+
+
+class CaptionWriter:
+    """固定数量的写入线程，每个线程一条队列；目标路径按哈希分配到线程"""
+
+    def __init__(self, workers=WRITE_WORKERS):
+        self._queues = [queue.Queue() for _ in range(workers)]
+        self._unreported = {}   # { folder: [WriteJob] } 等待时间内未完成、尚未报告的任务
+        self._lock = threading.Lock()
+        for i, q in enumerate(self._queues):
+            threading.Thread(target=self._run, args=(q,), name=f"sk-caption-writer-{i}", daemon=True).start()
+
+    def submit(self, folder, items, guard=None, on_written=None):
+        """
+        items: [(文件名, 内容)]，写入 folder；guard 为可选的上下文管理器工厂，包裹每一批写入
+        （例如 FolderListing.own_writes）；on_written(序号) 在每个文件写入成功后调用。返回 WriteJob。
+        """
+        job = WriteJob(folder, [name for name, _ in items], on_written)
+        with self._lock:
+            self._unreported.setdefault(folder, []).append(job)
+        for index, (name, content) in enumerate(items):
+            path = os.path.join(folder, name)
+            shard = zlib.crc32(path.encode("utf-8")) % len(self._queues)
+            self._queues[shard].put((job, index, path, content, guard))
+        return job
+
+    def take_reports(self, folder, exclude=None):
+        """folder 中已完成、尚未报告的后台任务的摘要（exclude 为当前调用自己的任务）"""
+        with self._lock:
+            jobs = self._unreported.get(folder, [])
+            done = [j for j in jobs if j.finished() and j is not exclude]
+            pending = [j for j in jobs if j not in done]
+            if pending:
+                self._unreported[folder] = pending
+            else:
+                self._unreported.pop(folder, None)
+        return [j.summary() for j in done]
+
+    def mark_reported(self, job):
+        """调用方已自行报告该任务的结果"""
+        with self._lock:
+            jobs = self._unreported.get(job.folder, [])
+            if job in jobs:
+                jobs.remove(job)
+            if not jobs:
+                self._unreported.pop(job.folder, None)
+
+    def flush(self):
+        """等待所有已提交的写入完成（退出时调用）"""
+        for q in self._queues:
+            q.join()
+
+    def _run(self, q):
+        dirty = set()   # 已写入、尚未 fsync 的目录
+        pending = 0
+        while True:
+            batch = [q.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                dirty |= self._write_batch(batch)
+                pending += len(batch)
+                # 队列空闲或累计足够多文件时才 fsync 目录；结果在重命名后即已记录，不等待 fsync
+                if dirty and (q.empty() or pending >= WRITE_BATCH * 8):
+                    for folder in dirty:
+                        _fsync_dir(folder)
+                    dirty.clear()
+                    pending = 0
+            finally:
+                for _ in batch:
+                    q.task_done()
+
+    def _write_batch(self, batch):
+        """写入一批文件，返回涉及的目录"""
+        folders = set()
+        # 同一批中同一文件只写最后一次提交的内容
+        last = {path: i for i, (_, _, path, _, _) in enumerate(batch)}
+        with contextlib.ExitStack() as stack:
+            for guard in {item[4] for item in batch if item[4] is not None}:
+                stack.enter_context(guard())
+            for i, (job, index, path, content, _) in enumerate(batch):
+                if last[path] != i:
+                    job._record(index)
+                    continue
+                try:
+                    if not _unchanged(path, content):
+                        atomic_write_text(path, content)
+                        folders.add(os.path.dirname(path))
+                    job._record(index)
+                except Exception as e:
+                    job._record(index, str(e))
+        return folders
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_caption_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = CaptionWriter()
+                atexit.register(_writer.flush)
+    return _writer
@@ -0,0 +1,75 @@
+# sk_composite.py - uint8 整数定点 Alpha 合成（标注节点共用）
+
+import numpy as np
+
+
+def alpha_bbox(alpha):
+    """返回 alpha 非零区域的包围盒 (y0, y1, x0, x1)，全透明时返回 None"""
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if rows.size == 0:
+        return None
+    y0, y1 = int(rows[0]), int(rows[-1]) + 1
+    cols = np.flatnonzero(alpha[y0:y1].any(axis=0))
+    return y0, y1, int(cols[0]), int(cols[-1]) + 1
+
+
+def composite_over(bg, fg, out=None):
+    """
+    将 4 通道 fg（第 4 通道为 alpha）叠加到 3 通道 bg 上，均为 uint8，通道顺序由调用方保证一致。
+    结果等于 floor((fg*a + bg*(255-a)) / 255)，即原浮点实现 (fg*a/255 + bg*(1-a/255)).astype(uint8)
+    的精确值；原实现因浮点舍入偶尔会小 1，因此两者最多相差 1 (LSB)。
+    - 只在 alpha 包围盒内计算，透明区域直接沿用 bg
+    - 中间量使用 uint16，不再产生整帧 float64 临时数组
+    out 为 None 时返回 bg 的副本；out 可以是 bg 本身（原地合成）。
+    """
+    if out is None:
+        out = bg.copy()
+    elif out is not bg:
+        np.copyto(out, bg)
+
+    box = alpha_bbox(fg[:, :, 3])
+    if box is None:
+        return out
+    y0, y1, x0, x1 = box
+
+    a = fg[y0:y1, x0:x1, 3:4].astype(np.uint16)
+    dst = out[y0:y1, x0:x1]
+    acc = fg[y0:y1, x0:x1, :3].astype(np.uint16)
+    acc *= a
+    np.subtract(255, a, out=a)
+    a = a * dst                       # bg * (255 - a)，结果仍为 uint16
+    acc += a
+    # 对 x ∈ [0, 65025] 有 floor(x / 255) == (x + 1 + (x >> 8)) >> 8
+    np.right_shift(acc, 8, out=a)
+    acc += a
+    acc += 1
+    acc >>= 8
+    dst[...] = acc
+    return out
+
+
+def composite_over_float(bg, fg):
+    """原浮点实现，仅作为基准对照"""
+    alpha = (fg[:, :, 3] / 255.0)[:, :, np.newaxis]
+    return (fg[:, :, :3] * alpha + bg * (1 - alpha)).astype(np.uint8)
+
+
+def _benchmark(sizes=((1024, 1024), (2160, 3840)), repeat=5):
+    import time
+    rng = np.random.default_rng(0)
+    for h, w in sizes:
+        bg = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+        fg = np.zeros((h, w, 4), dtype=np.uint8)
+        # 模拟涂鸦：覆盖约 1/4 画面的笔画区域
+        fg[h // 4: h // 2, w // 4: w * 3 // 4] = rng.integers(0, 256, (h // 2 - h // 4, w * 3 // 4 - w // 4, 4), dtype=np.uint8)
+        for name, fn in (("float64", composite_over_float), ("uint16", composite_over)):
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                res = fn(bg, fg)
+            print(f"{w}x{h} {name:<8} {(time.perf_counter() - t0) / repeat * 1000:8.1f} ms")
+        diff = np.abs(composite_over(bg, fg).astype(np.int16) - composite_over_float(bg, fg)).max()
+        print(f"{w}x{h} max diff = {diff}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,401 @@
+# sk_dataset_export.py - 打标结果导出为分片数据集（webdataset 风格的 tar 分片，或 JSONL 分片）
+# 目录结构：
+#   shard-00000.tar / shard-00000.jsonl ...   每个样本 = 图片 + 打标文本，按样本追加，超过分片大小后换新分片
+#   index_tar.jsonl / index_jsonl.jsonl       每个样本一行：所在分片、字节偏移与长度，同一 key 以最后一行为准
+# 每次追加后先 fsync 分片再写入并 fsync 索引，索引只会指向已落盘的数据；重新打开时最后一个分片
+# 截断到索引记录的末尾，中断时写了一半的样本会被丢弃。tar 分片每次追加后补上结束块，随时都是完整的 tar 文件。
+# 重新导出的样本追加在分片末尾，旧副本留在原位置（被取代）：按索引随机读取只会读到最新副本，
+# 顺序读取分片时同一 __key__ 以最后出现的为准。被取代的字节超过有效数据的 COMPACT_RATIO 时在后台线程中压缩：
+# 有效样本复制到预留序号的新分片 → 原子替换索引（并入压缩期间追加的样本）→ 删除旧分片。
+# 压缩期间追加照常进行，写入预留序号之后的分片，节点执行不等待压缩完成。
+# 样本 key 由文件名得到（见 sample_key），不同图片得到相同 key 时（a.png / a.jpg、a.b.png / a_b.png）
+# 后导出的图片改用 key + 文件名哈希，不会互相覆盖。
+
+import base64
+import hashlib
+import json
+import os
+import re
+import tarfile
+import threading
+import time
+
+from .sk_caption_writer import _fsync_dir
+from .sk_fingerprint import file_fingerprint
+from .sk_tag_manifest import text_hash
+
+SHARD_FORMATS = ("tar", "jsonl")
+_TAR_BLOCK = 512
+_TAR_TRAILER = b"\0" * (_TAR_BLOCK * 2)
+# 被取代样本的字节数超过有效样本字节数的该比例时压缩分片；0 为每批有样本被取代就压缩
+COMPACT_RATIO = float(os.environ.get("SKNODES_SHARD_COMPACT_RATIO", "0.25"))
+
+
+def sample_key(image_name):
+    """webdataset 按第一个 "." 拆分 key 与扩展名，文件名主干中的 "." 替换为 "_" """
+    return os.path.splitext(image_name)[0].replace(".", "_")
+
+
+def _unique_key(image_name):
+    """与其它图片的 key 冲突时使用：key + 完整文件名的短哈希"""
+    return f"{sample_key(image_name)}_{hashlib.blake2b(image_name.encode('utf-8'), digest_size=4).hexdigest()}"
+
+
+def _tar_member(name, data, mtime):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = mtime
+    info.mode = 0o644
+    # PAX 格式支持中文等非 ASCII 文件名和超长文件名
+    header = info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+    padding = b"\0" * (-len(data) % _TAR_BLOCK)
+    return header, padding
+
+
+class ShardExporter:
+    """单个导出目录、单种格式的分片写入器（同一实例的追加串行执行）"""
+
+    def __init__(self, out_dir, fmt, shard_bytes):
+        if fmt not in SHARD_FORMATS:
+            raise ValueError(f"未知的分片格式: {fmt}")
+        self.out_dir = os.path.abspath(out_dir)
+        self.fmt = fmt
+        self.shard_bytes = shard_bytes
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(self.out_dir, f"index_{fmt}.jsonl")
+        self._entries = {}     # { key: 索引记录 }
+        self._keys = {}        # { 图片文件名: key }
+        self._stale = 0        # 被取代样本的字节数
+        self._shard = 0        # 当前（最后一个）分片序号
+        self._end = 0          # 当前分片中最后一个样本的结束位置（不含 tar 结束块）
+        self._compactor = None  # 进行中的后台压缩线程
+        self._appended = None   # 压缩期间追加的索引记录（按顺序），压缩完成时并入新索引
+        self._reports = []      # 后台压缩的结果，下次追加时出现在日志中
+        self._load()
+
+    def _shard_path(self, n):
+        return os.path.join(self.out_dir, f"shard-{n:05d}.{self.fmt}")
+
+    def _load(self):
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        for line in lines:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            self._add_entry(row)
+            n, end = row["shard"], row["offset"] + row["size"]
+            if n > self._shard or (n == self._shard and end > self._end):
+                self._shard, self._end = n, end
+        if self._entries:
+            # 压缩在替换索引后、删除旧分片前中断时留下的旧分片
+            self._remove_shards_below(min(row["shard"] for row in self._entries.values()))
+            self._remove_orphan_shards()
+
+    def _add_entry(self, row):
+        old = self._entries.get(row["key"])
+        if old is not None:
+            self._stale += old["size"]
+        self._entries[row["key"]] = row
+        self._keys[row["image"]] = row["key"]
+
+    def _key_for(self, image_name, taken):
+        """图片的样本 key：已导出过的沿用原 key；默认 key 已属于其它图片（或本批其它样本）时改用带哈希的 key"""
+        key = self._keys.get(image_name)
+        if key is not None and self._entries[key]["image"] == image_name:
+            return key
+        for key in (sample_key(image_name), _unique_key(image_name)):
+            entry = self._entries.get(key)
+            if (entry is None or entry["image"] == image_name) and taken.get(key, image_name) == image_name:
+                return key
+        return None
+
+    def _remove_orphan_shards(self):
+        """删除索引中没有任何样本的分片（压缩在替换索引前中断时写了一部分的新分片）"""
+        used = {row["shard"] for row in self._entries.values()}
+        pattern = re.compile(rf"^shard-(\d+)\.{self.fmt}$")
+        try:
+            names = os.listdir(self.out_dir)
+        except OSError:
+            return
+        for name in names:
+            m = pattern.match(name)
+            if m and int(m.group(1)) not in used:
+                try:
+                    os.remove(os.path.join(self.out_dir, name))
+                except OSError as e:
+                    print(f"[SK-Tagger] 删除未使用的分片失败 {name}: {e}")
+
+    def _remove_shards_below(self, first):
+        self._remove_shards(range(first))
+
+    # ---------------------------------------------------------------------
+    def is_current(self, image_name, settings, content=None):
+        """该图片已按当前设置导出且图片未变化；给出 content 时还要求打标内容相同"""
+        entry = self._entries.get(self._keys.get(image_name))
+        if entry is None or entry["image"] != image_name or entry["cfg"] != settings:
+            return False
+        if content is not None and entry["cap"] != text_hash(content):
+            return False
+        return entry["src"] == file_fingerprint(os.path.join(entry["folder"], image_name))
+
+    def pending(self, img_files, settings):
+        return [i for i, name in enumerate(img_files) if not self.is_current(name, settings)]
+
+    def append(self, folder, samples, settings):
+        """
+        samples: [(图片文件名, 打标内容)]，图片从 folder 读取。
+        返回逐样本的日志行；一批样本追加完成后 fsync 涉及的分片和索引。
+        """
+        with self._lock:
+            lines, rows, f = self._reports, [], None
+            self._reports = []
+            taken = {}   # 本批已分配的 { key: 图片文件名 }
+            try:
+                os.makedirs(self.out_dir, exist_ok=True)
+                f = self._open_shard()
+                for image_name, content in samples:
+                    key = self._key_for(image_name, taken)
+                    if key is None:
+                        lines.append(f"❌ {image_name}: 样本 key 与其它图片冲突")
+                        continue
+                    src = os.path.join(folder, image_name)
+                    try:
+                        fingerprint = file_fingerprint(src)
+                        with open(src, "rb") as img:
+                            data = img.read()
+                    except OSError as e:
+                        lines.append(f"❌ {image_name}: {e}")
+                        continue
+                    if self._end and self._end + self._estimate(data, content) > self.shard_bytes:
+                        self._close_shard(f)
+                        f = None
+                        self._shard, self._end = self._shard + 1, 0
+                        f = self._open_shard()
+                    taken[key] = image_name
+                    row = self._write_sample(f, key, image_name, data, content)
+                    row.update(folder=folder, image=image_name, src=fingerprint, cap=text_hash(content), cfg=settings)
+                    rows.append(row)
+                    lines.append(f"✅ {image_name} → {os.path.basename(self._shard_path(self._shard))}")
+            except OSError as e:
+                lines.append(f"❌ 导出中断（已完成的样本不受影响）: {e}")
+            finally:
+                if f is not None:
+                    self._close_shard(f)
+            self._write_index(rows)
+            live = sum(row["size"] for row in self._entries.values())
+            if self._compactor is None and self._stale and self._stale > live * COMPACT_RATIO:
+                self._start_compaction(live)
+                lines.append("🧹 被取代的旧样本较多，已在后台压缩分片")
+            return lines
+
+    # ---------------------------------------------------------------------
+    # 后台压缩
+    # ---------------------------------------------------------------------
+    def _start_compaction(self, live):
+        """
+        （调用方持有锁）为压缩预留分片序号并启动后台线程：现有分片不再写入，
+        之后的追加写入预留序号之后的新分片，与压缩互不干扰
+        """
+        rows = sorted(self._entries.values(), key=lambda r: (r["shard"], r["offset"]))
+        first = self._shard + 1
+        # 顺序装箱时相邻两个分片之和一定超过分片大小，分片数不超过 2 * ceil(有效字节 / 分片大小) + 1
+        limit = first + 2 * (live // max(self.shard_bytes, 1) + 1) + 1
+        self._shard, self._end = limit, 0
+        self._appended = []
+        self._compactor = threading.Thread(target=self._compact, args=(rows, first, limit, self._stale),
+                                           name="sk-shard-compact", daemon=True)
+        self._compactor.start()
+
+    def wait_compaction(self, timeout=None):
+        """等待进行中的后台压缩完成（测试与退出前使用）；返回是否已完成"""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join(timeout)
+            return not compactor.is_alive()
+        return True
+
+    def _compact(self, rows, first, limit, stale):
+        """把有效样本按原顺序复制到 [first, limit) 序号的新分片，原子替换索引后删除旧分片；失败时保持原状"""
+        new_rows, f, src, src_shard = [], None, None, None
+        shard, end = first, 0
+        try:
+            f = self._open_shard(shard, 0)
+            for row in rows:
+                if row["shard"] != src_shard:
+                    if src is not None:
+                        src.close()
+                    src, src_shard = open(self._shard_path(row["shard"]), "rb"), row["shard"]
+                if end and end + row["size"] > self.shard_bytes:
+                    self._close_shard(f, end)
+                    f = None
+                    shard, end = shard + 1, 0
+                    if shard >= limit:
+                        raise OSError("预留的分片序号不足")
+                    f = self._open_shard(shard, 0)
+                src.seek(row["offset"])
+                offset = f.tell()
+                f.write(src.read(row["size"]))
+                end = f.tell()
+                new = dict(row, shard=shard, offset=offset)
+                for field in ("img", "txt"):
+                    if field in row:
+                        new[field] = [row[field][0] - row["offset"] + offset, row[field][1]]
+                new_rows.append(new)
+            self._close_shard(f, end)
+            f = None
+        except OSError as e:
+            if f is not None:
+                f.close()
+            with self._lock:
+                self._remove_shards(range(first, limit))
+                self._finish_compaction(f"⚠️ 分片压缩失败（数据不受影响）: {e}")
+            return
+        finally:
+            if src is not None:
+                src.close()
+
+        with self._lock:
+            # 压缩期间重新导出的样本以新追加的为准，其余样本使用压缩后的位置
+            appended = self._appended
+            updated = {row["key"] for row in appended}
+            final = [row for row in new_rows if row["key"] not in updated] + appended
+            try:
+                tmp = self._index_path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as out:
+                    for row in final:
+                        out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                    out.flush()
+                    os.fsync(out.fileno())
+                os.replace(tmp, self._index_path)
+                _fsync_dir(self.out_dir)
+            except OSError as e:
+                self._remove_shards(range(first, limit))
+                self._finish_compaction(f"⚠️ 分片压缩失败（数据不受影响）: {e}")
+                return
+            self._entries, self._keys, self._stale = {}, {}, 0
+            for row in final:
+                self._add_entry(row)
+            self._remove_shards_below(first)
+            # 移除的字节：开始压缩时已被取代的 + 压缩期间被重新导出的样本
+            stale += sum(row["size"] for row in new_rows if row["key"] in updated)
+            size = f"{stale / 1024 / 1024:.1f} MB" if stale >= 1024 * 1024 else f"{stale / 1024:.0f} KB"
+            self._finish_compaction(f"🧹 已压缩分片：移除 {size} 被取代的旧样本")
+
+    def _finish_compaction(self, report):
+        """（调用方持有锁）"""
+        self._compactor, self._appended = None, None
+        self._reports.append(report)
+
+    def _remove_shards(self, numbers):
+        for n in numbers:
+            path = self._shard_path(n)
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"[SK-Tagger] 删除分片失败 {path}: {e}")
+
+    def _estimate(self, data, content):
+        size = len(data) + len(content.encode("utf-8"))
+        return size * 4 // 3 if self.fmt == "jsonl" else size + _TAR_BLOCK * 4
+
+    def _open_shard(self, shard=None, end=None):
+        """打开分片并定位到 end（默认为当前分片与结束位置）"""
+        shard = self._shard if shard is None else shard
+        end = self._end if end is None else end
+        path = self._shard_path(shard)
+        created = not os.path.exists(path)
+        f = open(path, "r+b" if not created else "wb")
+        # 丢弃上次追加后的 tar 结束块，以及中断时写了一半、未进入索引的数据
+        f.truncate(end)
+        f.seek(end)
+        if created:
+            _fsync_dir(self.out_dir)
+        return f
+
+    def _close_shard(self, f, end=None):
+        try:
+            # 写入失败时丢弃最后一个不完整的样本
+            f.seek(self._end if end is None else end)
+            f.truncate()
+            if self.fmt == "tar":
+                f.write(_TAR_TRAILER)
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+
+    def _write_sample(self, f, key, image_name, data, content):
+        text = content.encode("utf-8")
+        offset = f.tell()
+        if self.fmt == "jsonl":
+            ext = os.path.splitext(image_name)[1].lstrip(".").lower()
+            line = json.dumps({"__key__": key, ext: base64.b64encode(data).decode("ascii"), "txt": content},
+                              ensure_ascii=False).encode("utf-8") + b"\n"
+            f.write(line)
+            self._end = f.tell()
+            return {"key": key, "shard": self._shard, "offset": offset, "size": len(line)}
+
+        row = {"key": key, "shard": self._shard, "offset": offset}
+        mtime = int(time.time())
+        for name, payload, field in ((key + os.path.splitext(image_name)[1].lower(), data, "img"), (f"{key}.txt", text, "txt")):
+            header, padding = _tar_member(name, payload, mtime)
+            f.write(header)
+            row[field] = [f.tell(), len(payload)]   # 成员数据的偏移与长度，可直接随机读取
+            f.write(payload)
+            f.write(padding)
+        self._end = f.tell()
+        row["size"] = self._end - offset
+        return row
+
+    def _write_index(self, rows):
+        if not rows:
+            return
+        with open(self._index_path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        for row in rows:
+            self._add_entry(row)
+        if self._appended is not None:
+            self._appended.extend(rows)
+
+    # ---------------------------------------------------------------------
+    def read(self, key):
+        """按索引随机读取一个样本，返回 (图片字节, 打标文本)"""
+        with self._lock:
+            # 持有锁：后台压缩替换索引后会删除旧分片
+            return self._read(self._entries[key])
+
+    def _read(self, row):
+        with open(self._shard_path(row["shard"]), "rb") as f:
+            if self.fmt == "tar":
+                f.seek(row["img"][0])
+                data = f.read(row["img"][1])
+                f.seek(row["txt"][0])
+                return data, f.read(row["txt"][1]).decode("utf-8")
+            f.seek(row["offset"])
+            sample = json.loads(f.read(row["size"]))
+        ext = os.path.splitext(row["image"])[1].lstrip(".").lower()
+        return base64.b64decode(sample[ext]), sample["txt"]
+
+
+_EXPORTERS = {}
+_EXPORTERS_LOCK = threading.Lock()
+
+
+def get_shard_exporter(out_dir, fmt, shard_bytes):
+    """按 (导出目录, 格式) 获取共享的分片写入器；分片大小以最近一次调用为准"""
+    key = (os.path.abspath(out_dir), fmt)
+    with _EXPORTERS_LOCK:
+        exporter = _EXPORTERS.get(key)
+        if exporter is None:
+            exporter = _EXPORTERS[key] = ShardExporter(*key, shard_bytes)
+    exporter.shard_bytes = shard_bytes
+    return exporter
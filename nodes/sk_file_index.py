@@ -0,0 +1,386 @@
+# sk_file_index.py - 输入目录文件索引（多个节点共享，按目录 mtime 增量更新）
+
+import bisect
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+# 两次目录校验之间的最小间隔（秒），间隔内直接返回缓存
+CHECK_INTERVAL = 1.0
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+
+
+class FileIndex:
+    """
+    维护某个根目录下所有文件的有序相对路径列表（"/" 分隔）。
+    - 记录每个子目录的 mtime，只重新扫描 mtime 变化的目录
+    - 安装了 watchdog 时由文件系统事件驱动，无事件时不做任何 stat；监听在首次扫描之前启动，扫描期间的变化不会漏掉
+    - 只需要顶层文件的调用方（get_top_level_files）只列根目录、只监听根目录，不触发整棵目录树的扫描
+    - 无变化时返回同一个列表对象（调用方不要修改它）
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._lock = threading.Lock()
+        self._dir_mtimes = {}     # { rel_dir: mtime_ns }
+        self._dir_files = {}      # { rel_dir: set(rel_path) }
+        self._files = []          # 排序后的全部相对路径
+        self._top_level = None    # (根目录 mtime_ns, 顶层文件列表)，独立于递归索引
+        self._last_check = 0.0
+        self._top_checked = 0.0
+        self._dirty = True
+        self._top_dirty = True
+        self._observer = None     # None: 未启动，False: 不可用
+        self._watched = set()     # 已注册的监听：{ recursive }
+        self.version = 0
+
+    # ---------------------------------------------------------------
+    def _rel(self, path):
+        rel = os.path.relpath(path, self.root)
+        return "" if rel == "." else rel.replace("\\", "/")
+
+    def _scan_dir(self, rel_dir, added, removed):
+        """扫描单个目录，与旧记录比较得出增删文件；新出现的子目录递归扫描"""
+        abs_dir = os.path.join(self.root, rel_dir) if rel_dir else self.root
+        try:
+            mtime = os.stat(abs_dir).st_mtime_ns
+            entries = list(os.scandir(abs_dir))
+        except OSError:
+            self._drop_dir(rel_dir, removed)
+            return
+
+        prefix = f"{rel_dir}/" if rel_dir else ""
+        files, subdirs = set(), set()
+        for entry in entries:
+            try:
+                # 与 os.walk 一致：不跟随目录符号链接；文件判断与 os.path.isfile 一致
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.add(prefix + entry.name)
+                elif entry.is_file():
+                    files.add(prefix + entry.name)
+            except OSError:
+                continue
+
+        old = self._dir_files.get(rel_dir, set())
+        added.update(files - old)
+        removed.update(old - files)
+        self._dir_files[rel_dir] = files
+        self._dir_mtimes[rel_dir] = mtime
+
+        # 已消失的子目录
+        for d in [d for d in self._dir_files if d != rel_dir and os.path.dirname(d) == rel_dir and d not in subdirs]:
+            self._drop_dir(d, removed)
+        # 新出现的子目录
+        for d in subdirs:
+            if d not in self._dir_mtimes:
+                self._scan_dir(d, added, removed)
+
+    def _drop_dir(self, rel_dir, removed):
+        prefix = f"{rel_dir}/"
+        for d in [d for d in self._dir_files if d == rel_dir or d.startswith(prefix) or rel_dir == ""]:
+            removed.update(self._dir_files.pop(d))
+            self._dir_mtimes.pop(d, None)
+
+    def _refresh(self):
+        added, removed = set(), set()
+        if not os.path.isdir(self.root):
+            if self._dir_files:
+                self._drop_dir("", removed)
+        else:
+            for rel_dir, mtime in list(self._dir_mtimes.items()):
+                if rel_dir not in self._dir_mtimes:
+                    continue  # 已随父目录一起移除
+                try:
+                    changed = os.stat(os.path.join(self.root, rel_dir) if rel_dir else self.root).st_mtime_ns != mtime
+                except OSError:
+                    changed = True
+                if changed:
+                    self._scan_dir(rel_dir, added, removed)
+            if "" not in self._dir_mtimes:
+                self._scan_dir("", added, removed)
+
+        if not added and not removed:
+            return
+
+        # 生成新列表（不修改已返回给调用方的旧列表）
+        files = [f for f in self._files if f not in removed] if removed else list(self._files)
+        if len(added) > len(files) // 8:
+            files = sorted(set(files) | added)
+        else:
+            for f in added:
+                bisect.insort(files, f)
+        self._files = files
+        self.version += 1
+
+    def _ensure_watcher(self, recursive):
+        """启动（或扩展为递归）文件系统监听；在扫描之前调用，扫描期间发生的事件会让下次查询重新校验"""
+        if Observer is None or self._observer is False or not os.path.isdir(self.root):
+            return
+        if recursive in self._watched or (not recursive and True in self._watched):
+            return
+        index = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                index._dirty = True
+                index._top_dirty = True
+
+        try:
+            if self._observer is None:
+                observer = Observer()
+                observer.daemon = True
+                observer.start()
+                self._observer = observer
+            self._observer.schedule(_Handler(), self.root, recursive=recursive)
+            self._watched.add(recursive)
+        except Exception as e:
+            print(f"[SK-FileIndex] 文件监听启动失败，改用 mtime 轮询: {e}")
+            if self._observer:
+                self._observer.stop()
+            self._observer = False
+            self._watched.clear()
+
+    # ---------------------------------------------------------------
+    def get_files(self):
+        """返回根目录下全部文件（递归）的有序相对路径列表"""
+        now = time.monotonic()
+        if True in self._watched:
+            if not self._dirty:
+                return self._files
+        elif now - self._last_check < CHECK_INTERVAL:
+            return self._files
+
+        with self._lock:
+            self._ensure_watcher(True)
+            self._dirty = False
+            self._refresh()
+            self._last_check = time.monotonic()
+            return self._files
+
+    def get_top_level_files(self):
+        """仅根目录下的文件（不含子目录），与 os.listdir + isfile 结果一致；只列根目录，不做递归扫描"""
+        top = self._top_level
+        now = time.monotonic()
+        if top is not None:
+            if self._watched:
+                if not self._top_dirty:
+                    return top[1]
+            elif now - self._top_checked < CHECK_INTERVAL:
+                return top[1]
+
+        with self._lock:
+            self._ensure_watcher(False)
+            self._top_dirty = False
+            self._top_checked = time.monotonic()
+            try:
+                mtime = os.stat(self.root).st_mtime_ns
+            except OSError:
+                self._top_level = (None, [])
+                return self._top_level[1]
+            top = self._top_level
+            if top is None or top[0] != mtime:
+                files = []
+                try:
+                    with os.scandir(self.root) as it:
+                        for entry in it:
+                            try:
+                                if entry.is_file():
+                                    files.append(entry.name)
+                            except OSError:
+                                continue
+                except OSError:
+                    pass
+                files.sort()
+                if top is not None and top[1] == files:
+                    files = top[1]
+                self._top_level = (mtime, files)
+            return self._top_level[1]
+
+    def invalidate(self):
+        """强制下次查询时重新校验（例如上传文件后）"""
+        self._dirty = True
+        self._top_dirty = True
+        self._last_check = 0.0
+        self._top_checked = 0.0
+        self._top_level = None
+
+
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_file_index(root):
+    """按目录获取共享索引实例"""
+    root = os.path.abspath(root)
+    index = _INDEXES.get(root)
+    if index is None:
+        with _INDEXES_LOCK:
+            index = _INDEXES.setdefault(root, FileIndex(root))
+    return index
+
+
+def get_input_files(recursive=True):
+    """ComfyUI 输入目录的文件列表，供各节点的 INPUT_TYPES 使用"""
+    import folder_paths
+    index = get_file_index(folder_paths.get_input_directory())
+    return index.get_files() if recursive else index.get_top_level_files()
+
+
+# =========================================================================
+# 单目录有序文件列表（打标节点使用）
+# =========================================================================
+# 即使目录 mtime 没有变化，超过该时间（秒）也重新列一次目录，防止漏掉与自身写入同一时刻发生的外部变化
+LISTING_MAX_AGE = 300.0
+# 仅因自身写入认领了新 mtime 时，持久化文件的最小保存间隔（秒）
+LISTING_SAVE_INTERVAL = 30.0
+
+
+def get_listing_dir():
+    """目录列表持久化位置：环境变量 SKNODES_TAG_INDEX_DIR > ComfyUI user 目录 > 插件 config 目录"""
+    index_dir = os.environ.get("SKNODES_TAG_INDEX_DIR")
+    if not index_dir:
+        try:
+            import folder_paths
+            index_dir = os.path.join(folder_paths.get_user_directory(), "sk_tag_index")
+        except (ImportError, AttributeError):
+            index_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config", "tag_index"))
+    return index_dir
+
+
+class FolderListing:
+    """
+    单个目录（不递归）中扩展名匹配的文件名列表，排序与 sorted(os.listdir) 完全一致：
+    - 目录 mtime 未变化时直接返回缓存列表，不做 listdir
+    - mtime 变化时重新列目录，只对增删的文件名做有序插入/删除，不整体重排
+    - 调用方自己写入的非匹配文件（例如打标 .txt）用 own_writes() 包裹，认领由此产生的 mtime 变化
+    - 列表持久化到磁盘，重启后目录未变化时无需重新列目录
+    无变化时返回同一个列表对象（调用方不要修改它）
+    """
+
+    def __init__(self, path, exts):
+        self.path = os.path.abspath(path)
+        self.exts = tuple(e.lower() for e in exts)
+        self._lock = threading.Lock()
+        self._files = None
+        self._names = set()
+        self._mtime = None
+        self._checked = 0.0     # 上次列目录的时间 (monotonic)
+        self._saved = 0.0
+        self._own_active = 0    # 正在进行的自身写入数
+        self._own_valid = False
+        key = hashlib.sha1(f"{self.path}|{'|'.join(self.exts)}".encode("utf-8")).hexdigest()[:20]
+        self._store = os.path.join(get_listing_dir(), f"{key}.json")
+        self.version = 0
+
+    def _mtime_now(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self, mtime):
+        try:
+            with open(self._store, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("path") != self.path or data.get("exts") != list(self.exts) or data.get("mtime_ns") != mtime:
+            return False
+        self._files = data["files"]
+        self._names = set(self._files)
+        self._mtime = mtime
+        self._checked = time.monotonic()
+        return True
+
+    def _save(self):
+        data = {"path": self.path, "exts": list(self.exts), "mtime_ns": self._mtime, "files": self._files}
+        try:
+            os.makedirs(os.path.dirname(self._store), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self._store), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self._store)
+            self._saved = time.monotonic()
+        except OSError as e:
+            print(f"[SK-FileIndex] 目录列表保存失败: {e}")
+
+    def _rescan(self, mtime):
+        names = {n for n in os.listdir(self.path) if n.lower().endswith(self.exts)}
+        if self._files is None:
+            files = sorted(names)
+        else:
+            added, removed = names - self._names, self._names - names
+            if not added and not removed:
+                files = self._files
+            else:
+                files = [f for f in self._files if f not in removed] if removed else list(self._files)
+                if len(added) > len(files) // 8:
+                    files = sorted(names)
+                else:
+                    for f in added:
+                        bisect.insort(files, f)
+        if files is not self._files:
+            self.version += 1
+        self._files, self._names, self._mtime = files, names, mtime
+        self._checked = time.monotonic()
+        self._save()
+
+    def get(self):
+        """返回有序文件名列表；目录不存在时抛出 OSError"""
+        with self._lock:
+            mtime = self._mtime_now()
+            if mtime is None:
+                raise FileNotFoundError(self.path)
+            if self._files is None and self._load(mtime):
+                return self._files
+            # 自身写入进行中引起的 mtime 变化在写入结束时认领
+            stale = mtime != self._mtime and not (self._own_active and self._own_valid)
+            if self._files is None or stale or time.monotonic() - self._checked > LISTING_MAX_AGE:
+                self._rescan(mtime)
+            return self._files
+
+    @contextlib.contextmanager
+    def own_writes(self):
+        """
+        包裹调用方自己在该目录中的写入（可多个线程同时进行）：从第一个写入开始到最后一个写入结束，
+        若开始时缓存仍然有效，结束时直接认领新的目录 mtime，下次 get() 不必重新列目录。
+        写入的文件扩展名不能与 exts 匹配。
+        """
+        with self._lock:
+            if self._own_active == 0:
+                self._own_valid = self._files is not None and self._mtime_now() == self._mtime
+            self._own_active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._own_active -= 1
+                if self._own_active == 0 and self._own_valid:
+                    after = self._mtime_now()
+                    if after is not None and after != self._mtime:
+                        self._mtime = after
+                        if time.monotonic() - self._saved > LISTING_SAVE_INTERVAL:
+                            self._save()
+
+
+_LISTINGS = {}
+_LISTINGS_LOCK = threading.Lock()
+
+
+def get_folder_listing(path, exts):
+    """按 (目录, 扩展名) 获取共享的目录列表实例"""
+    key = (os.path.abspath(path), tuple(e.lower() for e in exts))
+    listing = _LISTINGS.get(key)
+    if listing is None:
+        with _LISTINGS_LOCK:
+            listing = _LISTINGS.setdefault(key, FolderListing(*key))
+    return listing
@@ -0,0 +1,119 @@
+# sk_fingerprint.py - IS_CHANGED 指纹服务（标注/序号节点共用）
+# 文件身份 (inode, size, mtime) 或可选的内容哈希（小型 LRU 缓存），控件内容使用快速摘要，
+# 同名文件被替换后能正确触发重新执行，而大段 mask_data 也不必每次做 SHA-256。
+
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+# 设置 SKNODES_FINGERPRINT_CONTENT=1 时文件指纹改为 大小 + 内容哈希，
+# 用于 mtime 不可靠的场景（例如复制时保留了时间戳的网络盘）：身份不变但内容被替换时能发现，只 touch 不会重新执行
+CONTENT_HASH = os.environ.get("SKNODES_FINGERPRINT_CONTENT", "0").lower() in ("1", "true", "yes")
+# 内容哈希缓存条数：按 (路径, inode, 大小, mtime) 缓存，ctime 变化（保留 mtime 的改写也会更新 ctime）时重新读取
+CONTENT_CACHE_SIZE = 256
+
+try:
+    import xxhash
+
+    def _new_digest():
+        return xxhash.xxh3_128()
+except ImportError:
+    xxhash = None
+
+    class _ZlibDigest:
+        """未安装 xxhash 时的退路：crc32 + adler32 + 长度，速度接近内存带宽"""
+
+        def __init__(self):
+            self.crc, self.adler, self.length = 0, 1, 0
+
+        def update(self, data):
+            self.crc = zlib.crc32(data, self.crc)
+            self.adler = zlib.adler32(data, self.adler)
+            self.length += len(data)
+
+        def hexdigest(self):
+            return f"{self.crc:08x}{self.adler:08x}{self.length:x}"
+
+    _new_digest = _ZlibDigest
+
+_LOCK = threading.Lock()
+_CONTENT_HASHES = OrderedDict()   # { (path, inode, size, mtime_ns): (ctime_ns, digest) }，LRU
+
+
+def file_identity(path):
+    """(inode, size, mtime_ns)，文件不存在时返回 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _hash_file(path):
+    h = _new_digest()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def content_hash(path, st=None):
+    """
+    文件内容摘要。按 (路径, inode, 大小, mtime) 缓存，ctime 也未变化时不重复读取；
+    大小与 mtime 都相同的改写（复制时保留时间戳）会更新 ctime，因此仍会重新计算。
+    """
+    st = st or os.stat(path)
+    key = (path, st.st_ino, st.st_size, st.st_mtime_ns)
+    with _LOCK:
+        cached = _CONTENT_HASHES.get(key)
+        if cached is not None and cached[0] == st.st_ctime_ns:
+            _CONTENT_HASHES.move_to_end(key)
+            return cached[1]
+    digest = _hash_file(path)
+    with _LOCK:
+        _CONTENT_HASHES[key] = (st.st_ctime_ns, digest)
+        _CONTENT_HASHES.move_to_end(key)
+        while len(_CONTENT_HASHES) > CONTENT_CACHE_SIZE:
+            _CONTENT_HASHES.popitem(last=False)
+    return digest
+
+
+def file_fingerprint(path, with_content=None):
+    """
+    文件指纹字符串；with_content 为 None 时按 SKNODES_FINGERPRINT_CONTENT 决定：
+    关闭时为文件身份，开启时为 大小 + 内容哈希（与 inode / mtime 无关）
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "missing"
+    if with_content is None:
+        with_content = CONTENT_HASH
+    if with_content:
+        try:
+            return f"{st.st_size}:{content_hash(path, st)}"
+        except OSError:
+            return "missing"
+    return repr((st.st_ino, st.st_size, st.st_mtime_ns))
+
+
+def _update(h, data):
+    h.update(len(data).to_bytes(8, "little"))
+    h.update(data)
+
+
+def node_fingerprint(image, *payloads):
+    """
+    节点输入指纹：输入目录中 image 文件的身份 + 各控件字符串的快速摘要。
+    payloads 中的 None 会被跳过，其它值按 str() 参与摘要（带长度前缀，避免拼接歧义）。
+    """
+    h = _new_digest()
+    if image:
+        import folder_paths
+        _update(h, image.encode())
+        _update(h, file_fingerprint(folder_paths.get_annotated_filepath(image)).encode())
+    for payload in payloads:
+        if payload is not None:
+            _update(h, payload if isinstance(payload, bytes) else str(payload).encode())
+    return h.hexdigest()
@@ -0,0 +1,308 @@
+# sk_frame_planner.py - Multi/InfiniteTalk 窗口规划（帧数计算器使用）
+# 对给定的窗口数 N，满足 R = W*N - O*(N-1) <= T 的最大 4N+1 窗口帧数 W 可以直接算出，
+# 因此只需在 (T, N) 网格上向量化求解：每个 T 一行、每个窗口数一列，按行取最小误差（误差相同取较小的 N，
+# 与逐个窗口数循环、只在误差严格更小时替换的结果一致）。
+# 单个总帧数和小批量直接在 (T, N) 网格上求解（只有去重后的行），结果按 (配置, T) 缓存；
+# 同一组窗口配置下直接求解的行数累计达到建表所需行数后，才在锁外把 T = 1..size 建成查找表，之后直接查表。
+# 成本模式下在全部 (W, N) 组合上求解：先找出误差最小值，在容忍范围内选预估渲染耗时最低的组合。
+
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+# 规划状态
+PLAN_OK = 0          # 按所选方式找到解
+PLAN_FORCED = 1      # 无解，强制使用最小窗口配置
+PLAN_FALLBACK = 2    # “增加”找不到 R>T 的解，回退到 R<=T 的最优解
+PLAN_INVALID = 3     # 总帧数 <= 0
+
+# 查找表覆盖的最大总帧数（更大的值直接求解，不进表）；求解时每块处理的行数，限制 (T, N) 网格的内存
+TABLE_MAX_FRAMES = 1 << 16
+SOLVE_CHUNK = 4096
+# 最多缓存的窗口配置数；单个总帧数结果的缓存条数
+TABLE_CACHE_SIZE = 16
+RESULT_CACHE_SIZE = 4096
+# 成本模式下每块 (T, W×N) 网格的最大元素数
+COST_GRID_CELLS = 1 << 21
+
+FrameConfig = namedtuple("FrameConfig", "min_w max_w min_n max_n overlap increase cost", defaults=(None,))
+FramePlan = namedtuple("FramePlan", "window count overlap revised raw status")
+# 成本模型：单窗口耗时 = window + frame * W + attention * W²，总耗时 = N * 单窗口耗时（重叠帧随窗口数重复计算）；
+# tolerance 为允许比最小误差多出的帧数
+CostModel = namedtuple("CostModel", "frame attention window tolerance")
+
+
+def estimate_cost(cost, W, N):
+    """预估渲染耗时（与成本系数同单位），W/N 可以是数组"""
+    return N * (cost.window + cost.frame * W + cost.attention * W * W)
+
+
+def to_4n_plus_1(val, direction="round"):
+    # 如果已经是 4n+1 则不处理
+    if (val - 1) % 4 == 0:
+        return val
+    if direction == "up":
+        return ((val - 1) // 4 + 1) * 4 + 1
+    elif direction == "down":
+        return ((val - 1) // 4) * 4 + 1
+    else:
+        return round((val - 1) / 4) * 4 + 1
+
+
+def normalize_config(min_w_input, max_w_input, min_n, max_n, overlap, mode, cost=None, mem_frame=0.0, mem_limit=0.0):
+    """
+    修正窗口配置（4N+1、范围、显存上限、重叠帧数），返回 (FrameConfig, 提示文本, 重叠帧数提示)。
+    重叠帧数的修正只对总帧数有效的片段生效，因此其提示单独返回。
+    mem_frame（每帧显存 GB）和 mem_limit（显存上限 GB）都大于 0 时，窗口帧数_MAX 收紧到显存允许的范围。
+    """
+    notes, overlap_note = "", ""
+    min_w = to_4n_plus_1(min_w_input, "up")
+    max_w = to_4n_plus_1(max_w_input, "down")
+
+    if min_w != min_w_input:
+        notes += f"⚙️ 窗口帧数_MIN 已从 {min_w_input} 自动修正为 {min_w} (需符合4N+1)。\n"
+    if max_w != max_w_input:
+        notes += f"⚙️ 窗口帧数_MAX 已从 {max_w_input} 自动修正为 {max_w} (需符合4N+1)。\n"
+
+    if mem_frame > 0 and mem_limit > 0:
+        mem_w = to_4n_plus_1(int(mem_limit / mem_frame), "down")
+        if mem_w < min_w:
+            notes += f"⚠️ 警告: 显存上限 {mem_limit:g} GB 容纳不下 {min_w} 帧的最小窗口，已忽略显存上限。\n"
+        elif mem_w < max_w:
+            max_w = mem_w
+            notes += f"💾 显存上限 {mem_limit:g} GB 下窗口帧数最多为 {max_w}，已收紧 窗口帧数_MAX。\n"
+
+    # 规范化范围
+    if min_w > max_w:
+        max_w = min_w
+        notes += f"⚠️ 警告: 修正后的 MIN 超过了 MAX，已强制设置 MAX={max_w}。\n"
+
+    if min_n > max_n:
+        min_n, max_n = max_n, min_n
+        notes += f"⚠️ 警告: 窗口数量_MIN > 窗口数量_MAX, 已互换。\n"
+
+    o = overlap
+    if o >= max_w:
+        o = max(max_w // 2, 1)
+        overlap_note = f"⚠️ 警告: 重叠帧数({overlap})过大, 已调整为 {o}。\n"
+
+    return FrameConfig(min_w, max_w, min_n, max_n, o, mode != "减少", cost), notes, overlap_note
+
+
+def _solve(T, cfg):
+    """T: int64 [M]（均 >= 1）-> (W, N, R, status)，逐行对应"""
+    o = cfg.overlap
+    t = T[:, None]
+    n = np.arange(cfg.min_n, cfg.max_n + 1, dtype=np.int64)[None, :]
+    rows = np.arange(len(T))
+    w_allow = (t + o * (n - 1)) // n
+
+    # --- R <= T：不超过 w_allow 的最大 4n+1 ---
+    w_dec = (w_allow - 1) // 4 * 4 + 1
+    ok_dec = w_dec >= cfg.min_w
+    w_dec = np.minimum(w_dec, cfg.max_w)
+    r_dec = w_dec * n - o * (n - 1)
+    d_dec = t - r_dec
+    ok_dec &= d_dec >= 0
+    k_dec = np.argmin(np.where(ok_dec, d_dec, np.iinfo(np.int64).max), axis=1)
+    has_dec = ok_dec[rows, k_dec]
+
+    # --- R > T：大于 w_allow 的最小 4n+1 ---
+    w_inc = np.maximum((w_allow + 3) // 4 * 4 + 1, cfg.min_w)
+    r_inc = w_inc * n - o * (n - 1)
+    ok_inc = (w_inc <= cfg.max_w) & (r_inc > t)
+    k_inc = np.argmin(np.where(ok_inc, r_inc - t, np.iinfo(np.int64).max), axis=1)
+    has_inc = ok_inc[rows, k_inc]
+
+    forced_r = cfg.min_w * cfg.min_n - o * (cfg.min_n - 1)
+    W = np.where(has_dec, w_dec[rows, k_dec], cfg.min_w)
+    N = np.where(has_dec, n[0, k_dec], cfg.min_n)
+    R = np.where(has_dec, r_dec[rows, k_dec], forced_r)
+    status = np.where(has_dec, PLAN_OK, PLAN_FORCED)
+    if cfg.increase:
+        status = np.where(has_dec, PLAN_FALLBACK, PLAN_FORCED)
+        W = np.where(has_inc, w_inc[rows, k_inc], W)
+        N = np.where(has_inc, n[0, k_inc], N)
+        R = np.where(has_inc, r_inc[rows, k_inc], R)
+        status = np.where(has_inc, PLAN_OK, status)
+    return W, N, R, status
+
+
+def _pick_cheapest(ok, err, cost, tolerance):
+    """每行在 ok 的组合中：误差不超过 最小误差 + tolerance 的组合里选耗时最低的（耗时相同取误差小的，再取靠前的）"""
+    big = np.iinfo(np.int64).max
+    best_err = np.where(ok, err, big).min(axis=1, keepdims=True)
+    allowed = ok & (err <= best_err + tolerance)
+    c = np.where(allowed, cost, np.inf)
+    tie = allowed & (c == c.min(axis=1, keepdims=True))
+    k = np.argmin(np.where(tie, err, big), axis=1)
+    return k, allowed.any(axis=1)
+
+
+def _solve_cost(T, cfg):
+    """成本模式：在全部 (W, N) 组合上求解（组合按 N、W 升序展开）"""
+    o, cost = cfg.overlap, cfg.cost
+    w = np.arange(cfg.min_w, cfg.max_w + 1, 4, dtype=np.int64)
+    n = np.arange(cfg.min_n, cfg.max_n + 1, dtype=np.int64)
+    pair_n = np.repeat(n, len(w))
+    pair_w = np.tile(w, len(n))
+    pair_r = pair_w * pair_n - o * (pair_n - 1)
+    pair_cost = estimate_cost(cost, pair_w.astype(np.float64), pair_n.astype(np.float64))
+
+    t = T[:, None]
+    k_dec, has_dec = _pick_cheapest(pair_r[None, :] <= t, t - pair_r[None, :], pair_cost[None, :], cost.tolerance)
+
+    W = np.where(has_dec, pair_w[k_dec], cfg.min_w)
+    N = np.where(has_dec, pair_n[k_dec], cfg.min_n)
+    R = np.where(has_dec, pair_r[k_dec], cfg.min_w * cfg.min_n - o * (cfg.min_n - 1))
+    status = np.where(has_dec, PLAN_OK, PLAN_FORCED)
+    if cfg.increase:
+        k_inc, has_inc = _pick_cheapest(pair_r[None, :] > t, pair_r[None, :] - t, pair_cost[None, :], cost.tolerance)
+        status = np.where(has_inc, PLAN_OK, np.where(has_dec, PLAN_FALLBACK, PLAN_FORCED))
+        W = np.where(has_inc, pair_w[k_inc], W)
+        N = np.where(has_inc, pair_n[k_inc], N)
+        R = np.where(has_inc, pair_r[k_inc], R)
+    return W, N, R, status
+
+
+def _solve_chunked(T, cfg):
+    if cfg.cost is not None:
+        pairs = len(range(cfg.min_w, cfg.max_w + 1, 4)) * (cfg.max_n - cfg.min_n + 1)
+        chunk = max(COST_GRID_CELLS // max(pairs, 1), 1)
+        parts = [_solve_cost(T[i:i + chunk], cfg) for i in range(0, len(T), chunk)]
+    else:
+        parts = [_solve(T[i:i + SOLVE_CHUNK], cfg) for i in range(0, len(T), SOLVE_CHUNK)]
+    if not parts:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    return tuple(np.concatenate(cols) for cols in zip(*parts))
+
+
+class _PlanTable:
+    """
+    某组窗口配置下 T = 1..size 的规划结果。只有直接求解的行数累计达到新增行数（建表的开销已经付过一遍）时
+    才建表或倍增扩展，且在全局锁之外进行；建好后整体替换快照，读取方无需加锁。
+    """
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.snapshot = (0, None)   # (size, (W, N, R, status))，下标 0 对应 T=1
+        self.solved = 0             # 上次建表以来直接求解的行数
+        self.max_seen = 0
+        self._build_lock = threading.Lock()
+
+    def record(self, rows, max_t):
+        """记录一次直接求解（rows 行，最大总帧数 max_t），开销足够时扩展查找表"""
+        self.solved += rows
+        self.max_seen = max(self.max_seen, min(int(max_t), TABLE_MAX_FRAMES))
+        size = self.snapshot[0]
+        if self.max_seen <= size:
+            return
+        target = min(max(1024, 1 << (self.max_seen - 1).bit_length()), TABLE_MAX_FRAMES)
+        if self.solved < target - size or not self._build_lock.acquire(blocking=False):
+            return
+        try:
+            size, columns = self.snapshot
+            new = _solve_chunked(np.arange(size + 1, target + 1, dtype=np.int64), self.cfg)
+            columns = new if columns is None else tuple(np.concatenate(p) for p in zip(columns, new))
+            self.snapshot = (target, columns)
+            self.solved = 0
+        finally:
+            self._build_lock.release()
+
+
+_TABLES = OrderedDict()
+_TABLES_LOCK = threading.Lock()
+# { (配置, T): (W, N, R, status) }，plan_frame 直接求解的结果
+_RESULTS = OrderedDict()
+
+
+def _table(cfg):
+    """取得（或新建）窗口配置对应的查找表；全局锁只保护字典操作"""
+    with _TABLES_LOCK:
+        table = _TABLES.get(cfg)
+        if table is None:
+            table = _TABLES[cfg] = _PlanTable(cfg)
+            while len(_TABLES) > TABLE_CACHE_SIZE:
+                _TABLES.popitem(last=False)
+        else:
+            _TABLES.move_to_end(cfg)
+        return table
+
+
+def plan_frames(totals, cfg, overlap_input=None):
+    """
+    批量规划：totals 为总帧数数组，返回 FramePlan（各字段为 int64 数组，与 totals 逐个对应）。
+    revised 为修订总帧数（“增加”方式下计算值超过 T 时锁定为 T），raw 为锁定前的计算值。
+    总帧数 <= 0 的片段状态为 PLAN_INVALID，重叠帧数按原输入 overlap_input 返回。
+    """
+    T = np.asarray(totals, dtype=np.int64).ravel()
+    valid = T > 0
+    W = np.zeros(len(T), dtype=np.int64)
+    N, R, status = np.zeros_like(W), np.zeros_like(W), np.full(len(T), PLAN_INVALID, dtype=np.int64)
+
+    table = _table(cfg)
+    size, columns = table.snapshot
+    in_table = valid & (T <= size)
+    if in_table.any():
+        idx = T[in_table] - 1
+        for out, col in zip((W, N, R, status), columns):
+            out[in_table] = col[idx]
+
+    rest = valid & ~in_table
+    if rest.any():
+        # 查找表未覆盖的总帧数：去重后直接求解
+        uniq, inverse = np.unique(T[rest], return_inverse=True)
+        for out, col in zip((W, N, R, status), _solve_chunked(uniq, cfg)):
+            out[rest] = col[inverse]
+        table.record(len(uniq), uniq[-1])
+
+    overlap = np.where(valid, cfg.overlap, cfg.overlap if overlap_input is None else overlap_input)
+    revised = np.where(valid & cfg.increase & (R > T), T, R)
+    return FramePlan(W, N, overlap, revised, R, status)
+
+
+def plan_frame(total, cfg, overlap_input=None):
+    """单个总帧数的规划（查表或直接求解一行，结果按 (配置, T) 缓存），返回各字段为 int 的 FramePlan"""
+    T = int(total)
+    if T <= 0:
+        return FramePlan(0, 0, cfg.overlap if overlap_input is None else overlap_input, 0, 0, PLAN_INVALID)
+    table = _table(cfg)
+    size, columns = table.snapshot
+    if T <= size:
+        W, N, R, status = (int(col[T - 1]) for col in columns)
+    else:
+        key = (cfg, T)
+        with _TABLES_LOCK:
+            result = _RESULTS.get(key)
+            if result is not None:
+                _RESULTS.move_to_end(key)
+        if result is None:
+            result = tuple(int(col[0]) for col in _solve_chunked(np.array([T], dtype=np.int64), cfg))
+            with _TABLES_LOCK:
+                _RESULTS[key] = result
+                while len(_RESULTS) > RESULT_CACHE_SIZE:
+                    _RESULTS.popitem(last=False)
+            table.record(1, T)
+        W, N, R, status = result
+    revised = T if cfg.increase and R > T else R
+    return FramePlan(W, N, cfg.overlap, revised, R, status)
+
+
+class WindowSchedule(namedtuple("WindowSchedule", "window count overlap frames")):
+    """
+    窗口计划（RecommendFrameSetter 的“窗口计划”输出，窗口切片节点使用）：
+    第 i 个窗口覆盖 [i*(W-O), i*(W-O)+W) 帧，相邻窗口重叠 O 帧；frames 为修订总帧数。
+    只保存四个整数，批量规划上万个片段时不必为每个窗口构造列表。
+    """
+    __slots__ = ()
+
+    @property
+    def windows(self):
+        """[(起始帧, 结束帧)]，结束帧不含"""
+        step = self.window - self.overlap
+        return [(i * step, i * step + self.window) for i in range(self.count)] if self.window > 0 else []
+
+    def as_dict(self):
+        return {"windows": [list(w) for w in self.windows], "window_frames": self.window, "overlap": self.overlap, "frames": self.frames}
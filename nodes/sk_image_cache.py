@@ -0,0 +1,127 @@
+# sk_image_cache.py - 解码图像的内存缓存（字节预算 LRU + mtime/size 校验 + 单飞解码）
+
+import os
+import threading
+from collections import OrderedDict
+
+# 默认缓存上限 (MB)，可通过环境变量 SKNODES_IMAGE_CACHE_MB 调整
+DEFAULT_BUDGET_MB = int(os.environ.get("SKNODES_IMAGE_CACHE_MB", "1024"))
+
+
+class _Flight:
+    """同一文件同一版本的一次解码，其余并发请求等待它的结果"""
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ImageCache:
+    """
+    线程安全的图像缓存：
+    - key 为文件路径，每次读取用 (mtime_ns, size) 校验，文件被覆盖后自动失效
+    - 按数组字节数计入预算，超出时淘汰最久未使用的条目
+    - 同一图像的并发请求只解码一次
+    缓存中的数组被设为只读，调用方需要修改时请先 copy()。
+    """
+
+    def __init__(self, max_bytes=DEFAULT_BUDGET_MB * 1024 * 1024):
+        self.max_bytes = int(max_bytes)
+        self._entries = OrderedDict()   # { path: (identity, array) }
+        self._inflight = {}             # { (path, identity): _Flight }
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def _identity(path):
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _remove(self, path):
+        _, value = self._entries.pop(path)
+        self.current_bytes -= value.nbytes
+
+    def _insert(self, path, identity, value):
+        if path in self._entries:
+            self._remove(path)
+        if value.nbytes > self.max_bytes:
+            return
+        self._entries[path] = (identity, value)
+        self.current_bytes += value.nbytes
+        while self.current_bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def get(self, path, loader):
+        """读取缓存，未命中或已过期时调用 loader(path) 解码"""
+        identity = self._identity(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                if entry[0] == identity:
+                    self._entries.move_to_end(path)
+                    self.hits += 1
+                    return entry[1]
+                self._remove(path)
+                self.invalidations += 1
+
+            key = (path, identity)
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = loader(path)
+            value.flags.writeable = False
+            flight.value = value
+            with self._lock:
+                self._insert(path, identity, value)
+            return value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def __contains__(self, path):
+        return path in self._entries
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self.current_bytes = 0
+            elif path in self._entries:
+                self._remove(path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "coalesced": self.coalesced,
+            }
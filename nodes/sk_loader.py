@@ -0,0 +1,235 @@
+# sk_loader.py - 节点模块加载器（支持延迟注册 + 加载耗时/内存报告）
+
+import ast
+import importlib
+import os
+import sys
+import threading
+import time
+
+NODES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 每个模块的加载报告：{ module_name: {...} }
+LOAD_REPORT = {}
+_report_lock = threading.Lock()
+
+
+def _rss_bytes():
+    """当前进程常驻内存 (RSS)，psutil 不可用时退回 resource"""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss
+    except Exception:
+        try:
+            import resource
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # Linux 单位是 KB，macOS 是 B
+            return rss if sys.platform == "darwin" else rss * 1024
+        except Exception:
+            return 0
+
+
+def _timed_import(full_name, package):
+    """导入模块并返回 (module, 耗时ms, 内存增量MB)"""
+    rss0 = _rss_bytes()
+    t0 = time.perf_counter()
+    module = importlib.import_module(full_name, package=package)
+    cost_ms = (time.perf_counter() - t0) * 1000.0
+    rss_mb = (_rss_bytes() - rss0) / (1024 ** 2)
+    return module, round(cost_ms, 2), round(rss_mb, 2)
+
+
+def _record(module_name, **fields):
+    with _report_lock:
+        LOAD_REPORT.setdefault(module_name, {"module": module_name}).update(fields)
+
+
+def get_load_report():
+    """返回按耗时降序排列的加载报告"""
+    with _report_lock:
+        rows = [dict(v) for v in LOAD_REPORT.values()]
+    rows.sort(key=lambda r: r.get("import_ms") or 0, reverse=True)
+    return {
+        "total_import_ms": round(sum(r.get("import_ms") or 0 for r in rows), 2),
+        "total_rss_mb": round(sum(r.get("rss_delta_mb") or 0 for r in rows), 2),
+        "modules": rows,
+    }
+
+
+def format_load_report():
+    report = get_load_report()
+    lines = [f"📊 [sknodes] 模块加载报告 | 合计 {report['total_import_ms']:.1f} ms / {report['total_rss_mb']:+.1f} MB"]
+    for r in report["modules"]:
+        if r["status"] == "pending":
+            lines.append(f"   ⏳ {r['module']:<28} {r['mode']:<6} (尚未导入)")
+        elif r["status"] == "error":
+            lines.append(f"   ❌ {r['module']:<28} {r['mode']:<6} {r.get('error', '')}")
+        else:
+            lines.append(f"   ✅ {r['module']:<28} {r['mode']:<6} {r['import_ms']:>9.1f} ms {r['rss_delta_mb']:>+8.1f} MB")
+    return "\n".join(lines)
+
+
+# =========================================================================
+# 静态扫描：不导入模块，直接从源码中读取节点类的元数据
+# =========================================================================
+class _ModuleSpec:
+    def __init__(self, module_name, package):
+        self.module_name = module_name
+        self.package = package
+        self.module = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        """首次使用时真正导入模块（线程安全，只导入一次）"""
+        if self.module is not None:
+            return self.module
+        with self._lock:
+            if self.module is None:
+                if self.error is not None:
+                    raise self.error
+                try:
+                    module, cost_ms, rss_mb = _timed_import(f".nodes.{self.module_name}", self.package)
+                except Exception as e:
+                    self.error = e
+                    _record(self.module_name, status="error", error=f"{type(e).__name__}: {e}")
+                    print(f"❌ [sknodes] {self.module_name} 延迟加载失败: {type(e).__name__} | {e}")
+                    raise
+                _record(self.module_name, status="ok", import_ms=cost_ms, rss_delta_mb=rss_mb)
+                print(f"✅ [sknodes] {self.module_name} 延迟加载完成 ({cost_ms:.1f} ms)")
+                self.module = module
+        return self.module
+
+
+def _literal(node):
+    try:
+        return True, ast.literal_eval(node)
+    except Exception:
+        return False, None
+
+
+def _has_routes(tree):
+    """模块顶层是否注册了 aiohttp 路由（此类模块必须在启动时导入）"""
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            for deco in node.decorator_list:
+                if "routes" in ast.unparse(deco):
+                    return True
+    return False
+
+
+def scan_module(module_name):
+    """
+    解析 nodes/<module_name>.py，返回 (class_specs, display_names)。
+    无法静态解析时返回 None，调用方应退回到立即导入。
+    class_specs: { node_key: (class_name, literal_attrs, member_names) }
+    """
+    path = os.path.join(NODES_DIR, f"{module_name}.py")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+    except Exception:
+        return None
+
+    if _has_routes(tree):
+        return None
+
+    classes = {n.name: n for n in tree.body if isinstance(n, ast.ClassDef)}
+    mappings, display_names = None, {}
+    for node in tree.body:
+        if not isinstance(node, ast.Assign) or len(node.targets) != 1:
+            continue
+        target = getattr(node.targets[0], "id", None)
+        if target == "NODE_CLASS_MAPPINGS" and isinstance(node.value, ast.Dict):
+            mappings = {}
+            for k, v in zip(node.value.keys, node.value.values):
+                ok, key = _literal(k)
+                if not ok or not isinstance(v, ast.Name) or v.id not in classes:
+                    return None
+                mappings[key] = v.id
+        elif target == "NODE_DISPLAY_NAME_MAPPINGS":
+            ok, display_names = _literal(node.value)
+            if not ok:
+                return None
+
+    if not mappings:
+        return None
+
+    class_specs = {}
+    for key, class_name in mappings.items():
+        cls_node = classes[class_name]
+        # 有基类时继承属性无法静态获知，放弃延迟注册
+        if cls_node.bases or cls_node.keywords:
+            return None
+        literal_attrs, members = {}, set()
+        for stmt in cls_node.body:
+            if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                members.add(stmt.name)
+            elif isinstance(stmt, ast.Assign):
+                for t in stmt.targets:
+                    if isinstance(t, ast.Name):
+                        members.add(t.id)
+                        ok, value = _literal(stmt.value)
+                        if ok:
+                            literal_attrs[t.id] = value
+        class_specs[key] = (class_name, literal_attrs, members)
+    return class_specs, display_names
+
+
+# =========================================================================
+# 代理节点类：字面量元数据直接可用，其余属性/实例化时才导入真实模块
+# =========================================================================
+class _LazyNodeMeta(type):
+    def __getattr__(cls, name):
+        # 仅在常规查找失败时调用
+        if name.startswith("__") or name not in type.__getattribute__(cls, "_sk_members"):
+            raise AttributeError(name)
+        return getattr(cls._sk_real_class(), name)
+
+    def __call__(cls, *args, **kwargs):
+        return cls._sk_real_class()(*args, **kwargs)
+
+
+def make_lazy_node(spec, class_name, literal_attrs, members):
+    def _sk_real_class():
+        return getattr(spec.resolve(), class_name)
+
+    namespace = dict(literal_attrs)
+    namespace["_sk_members"] = frozenset(members)
+    namespace["_sk_real_class"] = staticmethod(_sk_real_class)
+    namespace["__module__"] = f"{spec.package}.nodes.{spec.module_name}"
+    return _LazyNodeMeta(class_name, (), namespace)
+
+
+def load_modules(sub_modules, package, lazy=False):
+    """
+    加载所有节点模块，返回 (NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS)。
+    lazy=True 时，可静态解析且不注册路由的模块只登记代理类，首次使用时才导入。
+    """
+    class_mappings, display_mappings = {}, {}
+
+    for module_name in sub_modules:
+        scanned = scan_module(module_name) if lazy else None
+
+        if scanned is not None:
+            class_specs, display_names = scanned
+            spec = _ModuleSpec(module_name, package)
+            for key, (class_name, literal_attrs, members) in class_specs.items():
+                class_mappings[key] = make_lazy_node(spec, class_name, literal_attrs, members)
+            display_mappings.update(display_names)
+            _record(module_name, mode="lazy", status="pending", import_ms=None, rss_delta_mb=None, nodes=list(class_specs))
+            print(f"⏳ [sknodes] {module_name} 已延迟注册")
+            continue
+
+        try:
+            module, cost_ms, rss_mb = _timed_import(f".nodes.{module_name}", package)
+            nodes = getattr(module, "NODE_CLASS_MAPPINGS", {})
+            class_mappings.update(nodes)
+            display_mappings.update(getattr(module, "NODE_DISPLAY_NAME_MAPPINGS", {}))
+            _record(module_name, mode="eager", status="ok", import_ms=cost_ms, rss_delta_mb=rss_mb, nodes=list(nodes))
+            print(f"✅ [sknodes] {module_name} 加载成功 ({cost_ms:.1f} ms)")
+        except Exception as e:
+            _record(module_name, mode="eager", status="error", import_ms=None, rss_delta_mb=None, nodes=[], error=f"{type(e).__name__}: {e}")
+            print(f"❌ [sknodes] {module_name} 加载失败: {type(e).__name__} | {e}")
+
+    return class_mappings, display_mappings
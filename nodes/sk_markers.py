@@ -0,0 +1,396 @@
+# sk_markers.py - 序号标记渲染（字体缓存 + 预渲染贴图，逐点 Alpha 贴图）
+# PIL 样式只渲染一张与序号无关的圆圈贴图；序号文字由缓存的 0-9 字形拼接成单通道覆盖率贴图（只有文字大小），
+# 贴图时先贴圆圈再贴文字。数千个点时文字贴图总共只有十几 MB，缓存不会被反复淘汰；有 OpenCV 时贴图混合在 C++ 中完成。
+# OpenCV 样式直接绘制（本身已比贴图快）。
+
+import functools
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+DEFAULT_FONTS = ("arialbd.ttf", "arial.ttf", "DejaVuSans-Bold.ttf")
+SPRITE_CACHE_BYTES = 64 * 1024 * 1024
+
+
+@functools.lru_cache(maxsize=64)
+def resolve_font(size, names=DEFAULT_FONTS):
+    """按顺序尝试加载字体，结果按 (字号, 字体列表) 缓存"""
+    for name in names:
+        try:
+            return ImageFont.truetype(name, size)
+        except Exception:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except Exception:
+        return ImageFont.load_default()
+
+
+class Sprite:
+    """预乘颜色 + alpha 的标记贴图，(cx, cy) 为圆心在贴图中的位置"""
+    __slots__ = ("color", "alpha", "inv_alpha", "inv3", "cx", "cy", "nbytes")
+
+    def __init__(self, on_black, on_white, cx, cy):
+        # 分别在黑底和白底上绘制：alpha = 255 - (白底 - 黑底)，黑底结果即预乘颜色
+        diff = on_white.astype(np.int16) - on_black.astype(np.int16)
+        alpha = (255 - diff.max(axis=2)).clip(0, 255).astype(np.uint8)
+        # 裁掉完全透明的边缘
+        ys, xs = np.nonzero(alpha)
+        if ys.size == 0:
+            ys, xs = np.array([cy]), np.array([cx])
+        y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+        self.alpha = alpha[y0:y1, x0:x1, None]
+        # 预乘颜色不超过 alpha，保证贴图结果不会溢出 255
+        self.color = np.minimum(on_black[y0:y1, x0:x1], self.alpha)
+        self.inv3 = np.repeat(255 - self.alpha, 3, axis=2)
+        self.inv_alpha = self.inv3[:, :, :1].astype(np.uint16)
+        self.cx, self.cy = cx - x0, cy - y0
+        self.nbytes = self.color.nbytes + self.inv3.nbytes + self.inv_alpha.nbytes + self.alpha.nbytes
+
+    @property
+    def extent(self):
+        """贴图覆盖范围相对圆心的最大半径"""
+        h, w = self.alpha.shape[:2]
+        return max(self.cx, self.cy, w - self.cx, h - self.cy)
+
+    def blit(self, img, px, py, ox=0, oy=0):
+        """把贴图以 (px, py) 为圆心叠加到 img 上；img 为整图中 (ox, oy) 起始的区域视图"""
+        h, w = self.alpha.shape[:2]
+        x0, y0 = px - self.cx - ox, py - self.cy - oy
+        ih, iw = img.shape[:2]
+        sx0, sy0 = max(-x0, 0), max(-y0, 0)
+        sx1, sy1 = min(w, iw - x0), min(h, ih - y0)
+        if sx0 >= sx1 or sy0 >= sy1:
+            return
+        dst = img[y0 + sy0:y0 + sy1, x0 + sx0:x0 + sx1]
+        if cv2 is not None and img.dtype == np.uint8 and img.ndim == 3 and img.shape[2] == 3:
+            inv3, color = self._region_u8(sy0, sy1, sx0, sx1)
+            # 与下方 numpy 计算逐位一致：x * (255 - a) 在 16 位中计算，convertScaleAbs 的 (x - 127) / 255 四舍五入即 floor(x / 255)
+            acc = cv2.multiply(dst, inv3, dtype=cv2.CV_16U)
+            cv2.add(cv2.convertScaleAbs(acc, alpha=1 / 255, beta=-127 / 255), color, dst=dst)
+            return
+        inv_alpha, color = self._region(sy0, sy1, sx0, sx1)
+        acc = dst * inv_alpha
+        # floor(x / 255) 的整数近似，与 sk_composite 一致
+        acc += acc >> 8
+        acc += 1
+        acc >>= 8
+        acc += color
+        dst[...] = acc
+
+    def _region(self, sy0, sy1, sx0, sx1):
+        return self.inv_alpha[sy0:sy1, sx0:sx1], self.color[sy0:sy1, sx0:sx1]
+
+    def _region_u8(self, sy0, sy1, sx0, sx1):
+        return self.inv3[sy0:sy1, sx0:sx1], self.color[sy0:sy1, sx0:sx1]
+
+
+class GlyphSprite(Sprite):
+    """
+    单色文字贴图：只保存覆盖率（每像素 1 字节），预乘颜色在贴图时按查找表生成。
+    结果与用该颜色直接在图上绘制（按覆盖率混合）一致。
+    """
+    __slots__ = ("lut", "white")
+
+    def __init__(self, coverage, ink, cx, cy):
+        ys, xs = np.nonzero(coverage)
+        if ys.size == 0:
+            ys, xs = np.array([cy]), np.array([cx])
+        y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+        self.alpha = np.ascontiguousarray(coverage[y0:y1, x0:x1])
+        # lut[a] = 覆盖率 a 时的预乘颜色
+        a = np.arange(256, dtype=np.uint16)[:, None]
+        self.lut = ((a * np.array(ink, dtype=np.uint16) + 127) // 255).astype(np.uint8)
+        self.white = tuple(ink) == (255, 255, 255)
+        self.cx, self.cy = cx - x0, cy - y0
+        self.nbytes = self.alpha.nbytes
+
+    def _region(self, sy0, sy1, sx0, sx1):
+        a = self.alpha[sy0:sy1, sx0:sx1]
+        return (255 - a).astype(np.uint16)[:, :, None], self.lut[a]
+
+    def _region_u8(self, sy0, sy1, sx0, sx1):
+        a3 = cv2.cvtColor(self.alpha[sy0:sy1, sx0:sx1], cv2.COLOR_GRAY2BGR)
+        color = a3 if self.white else cv2.LUT(a3, self.lut[:, None, :])
+        return cv2.bitwise_not(a3), color
+
+
+class _MarkerStyle:
+    """标记样式基类（贴图绘制）：子类实现 key / half_size / paint_circle / text_coverage，ink 为文字颜色"""
+
+    ink = (255, 255, 255)
+
+    def circle_sprite(self):
+        """与序号无关的圆圈（填充 + 描边）贴图，每种样式只渲染一次"""
+        return _sprite_cache.get(self, "circle", self._render_circle)
+
+    def text_sprite(self, index):
+        """第 index 个标记的序号文字贴图"""
+        return _sprite_cache.get(self, index, self._render_text)
+
+    def _render_circle(self, _):
+        half = self.half_size("")
+        size = 2 * half + 1
+        canvases = [self.paint_circle(np.full((size, size, 3), bg, dtype=np.uint8), half, half) for bg in (0, 255)]
+        return Sprite(canvases[0], canvases[1], half, half)
+
+    def _render_text(self, index):
+        coverage, cx, cy = self.text_coverage(str(index + 1))
+        return GlyphSprite(coverage, self.ink, cx, cy)
+
+    def extent(self, index):
+        """第 index 个标记相对圆心的最大半径（包含文字）"""
+        return max(self.circle_sprite().extent, self.text_sprite(index).extent)
+
+    def extents(self, n):
+        """前 n 个标记的最大半径数组；与贴图分开缓存，贴图被 LRU 淘汰后做裁剪判断也无需重新渲染"""
+        return _extent_cache.get(self, n)
+
+    def draw(self, img, index, px, py, ox=0, oy=0):
+        """以 (px, py) 为圆心贴上第 index 个标记；img 为整图中 (ox, oy) 起始的区域视图"""
+        self.circle_sprite().blit(img, px, py, ox, oy)
+        self.text_sprite(index).blit(img, px, py, ox, oy)
+
+    def draw_points(self, img, points):
+        """points: 像素坐标的 PointSet，按顺序绘制有效点，序号为下标 + 1"""
+        for i, px, py in points.items():
+            self.draw(img, i, px, py)
+        return img
+
+    def render_layer(self, points, h, w):
+        """把全部标记渲染为 h x w 的预乘图层 (color, alpha)，供批量叠加使用"""
+        on_black = self.draw_points(np.zeros((h, w, 3), dtype=np.uint8), points)
+        on_white = self.draw_points(np.full((h, w, 3), 255, dtype=np.uint8), points)
+        diff = on_white.astype(np.int16) - on_black
+        alpha = (255 - diff.max(axis=2, keepdims=True)).clip(0, 255).astype(np.uint8)
+        return np.minimum(on_black, alpha), alpha
+
+
+class PilMarkerStyle(_MarkerStyle):
+    """PIL 绘制：实心圆 + 描边 + TrueType 序号（居中）"""
+
+    def __init__(self, r, outline_width, font_size, fonts=DEFAULT_FONTS, fill=(255, 0, 0), ink=(255, 255, 255)):
+        self.r, self.outline_width = r, outline_width
+        self.font = resolve_font(font_size, tuple(fonts))
+        self.fill, self.ink = fill, ink
+        self.key = ("pil", r, outline_width, font_size, tuple(fonts), fill, ink)
+
+    def half_size(self, text):
+        try:
+            l, t, rt, b = self.font.getbbox(text, anchor="mm")
+            text_half = int(max(-l, rt, -t, b)) + 1
+        except Exception:
+            text_half = self.r
+        return max(self.r + self.outline_width, text_half) + 2
+
+    def paint_circle(self, canvas, cx, cy):
+        img = Image.fromarray(canvas)
+        r = self.r
+        ImageDraw.Draw(img).ellipse([cx - r, cy - r, cx + r, cy + r], fill=self.fill, outline=self.ink, width=self.outline_width)
+        return np.array(img)
+
+    def text_coverage(self, text):
+        """
+        (覆盖率, cx, cy)：序号由缓存的单个数字字形按整数步进拼接（逐像素取最大值）；
+        字体不满足拼接条件时（非整数步进、有字偶距调整、位图字体）整串绘制。
+        """
+        glyphs = _digit_glyphs(self.font)
+        if glyphs is None or not text.isdigit():
+            return _render_text_coverage(self.font, text)
+        return _compose_digits(glyphs, text)
+
+
+def _render_text_coverage(font, text):
+    """
+    (覆盖率, cx, cy)：在只比文字包围盒大 1 像素的单通道图上用 255 绘制，结果即文字的抗锯齿覆盖率；
+    锚点落在整数像素 (cx, cy) 上，光栅化结果与在整图上绘制相同。
+    """
+    try:
+        l, t, r, b = font.getbbox(text, anchor="mm")
+        anchor = "mm"
+    except ValueError:
+        # 位图默认字体不支持 anchor
+        l, t, r, b = font.getbbox(text)
+        anchor = None
+    cx, cy = 1 - math.floor(l), 1 - math.floor(t)
+    img = Image.new("L", (cx + math.ceil(r) + 1, cy + math.ceil(b) + 1), 0)
+    ImageDraw.Draw(img).text((cx, cy), text, fill=255, font=font, anchor=anchor)
+    return np.asarray(img), cx, cy
+
+
+def _compose_digits(glyphs, text):
+    """按 anchor="mm" 的排版拼接数字字形：起点 floor(-总步进 / 2)，纵向以中线为基准"""
+    advances, cells = glyphs
+    pen = math.floor(-sum(advances[c] for c in text) / 2)
+    placed = []
+    for c in text:
+        coverage, ox, oy = cells[c]
+        placed.append((coverage, pen - ox, -oy))
+        pen += advances[c]
+    x0 = min(x for _, x, _ in placed)
+    y0 = min(y for _, _, y in placed)
+    x1 = max(x + g.shape[1] for g, x, _ in placed)
+    y1 = max(y + g.shape[0] for g, _, y in placed)
+    out = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+    for g, x, y in placed:
+        region = out[y - y0:y - y0 + g.shape[0], x - x0:x - x0 + g.shape[1]]
+        np.maximum(region, g, out=region)
+    return out, -x0, -y0
+
+
+@functools.lru_cache(maxsize=64)
+def _digit_glyphs(font):
+    """
+    (步进, 字形) 或 None：0-9 各自的整数步进与以 anchor="lm" 绘制的覆盖率 (coverage, ox, oy)。
+    只有步进全为整数且没有字偶距调整时拼接结果才与整串绘制一致；另用几个序号实测核对，不一致时返回 None。
+    """
+    digits = "0123456789"
+    try:
+        advances = {c: font.getlength(c) for c in digits}
+        if any(a != int(a) for a in advances.values()):
+            return None
+        advances = {c: int(a) for c, a in advances.items()}
+        if any(font.getlength(a + b) != advances[a] + advances[b] for a in digits for b in digits):
+            return None
+        cells = {}
+        for c in digits:
+            l, t, r, b = font.getbbox(c, anchor="lm")
+            ox, oy = 1 - math.floor(l), 1 - math.floor(t)
+            img = Image.new("L", (ox + math.ceil(r) + 1, oy + math.ceil(b) + 1), 0)
+            ImageDraw.Draw(img).text((ox, oy), c, fill=255, font=font, anchor="lm")
+            cells[c] = (np.asarray(img), ox, oy)
+        glyphs = (advances, cells)
+        for text in ("1", "10", "47", "123", "2048", "90817"):
+            if not _same_coverage(_compose_digits(glyphs, text), _render_text_coverage(font, text)):
+                return None
+        return glyphs
+    except Exception:
+        return None
+
+
+def _same_coverage(a, b):
+    """比较两个 (覆盖率, cx, cy) 在对齐锚点后的非零像素是否完全一致"""
+    ca, ax, ay = a
+    cb, bx, by = b
+    ya, xa = np.nonzero(ca)
+    yb, xb = np.nonzero(cb)
+    return (np.array_equal(ya - ay, yb - by) and np.array_equal(xa - ax, xb - bx)
+            and np.array_equal(ca[ya, xa], cb[yb, xb]))
+
+
+class CvMarkerStyle(_MarkerStyle):
+    """
+    OpenCV 绘制：实心圆 + 描边 + Hershey 序号；bgr=True 时颜色按 BGR 通道顺序。
+    OpenCV 的绘制本身就在 C++ 中逐点完成，比贴图更快，因此直接画在目标图上，不使用贴图缓存（需要安装 OpenCV）。
+    """
+
+    def __init__(self, r, font_scale, thickness, bgr=False):
+        self.r, self.font_scale, self.thickness = r, font_scale, thickness
+        self.fill = (0, 0, 255) if bgr else (255, 0, 0)
+        self.key = ("cv2", r, font_scale, thickness, bgr)
+
+    def half_size(self, text):
+        return self._layout(text)[0]
+
+    def _layout(self, text):
+        """(half_size, 文字宽, 文字高)"""
+        (fw, fh), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, self.font_scale, self.thickness)
+        return max(self.r + self.thickness, fw, fh + baseline) + 2, fw, fh
+
+    def extent(self, index):
+        """half_size 已包含文字宽度、上下高度和描边，作为裁剪用的保守半径"""
+        return self.half_size(str(index + 1))
+
+    def draw(self, img, index, px, py, ox=0, oy=0):
+        """
+        直接在 img（整图中 (ox, oy) 起始的区域视图）上绘制。OpenCV 在图像边缘裁剪时的抗锯齿结果与完整绘制不同，
+        标记跨越 img 边缘时先画在只包含该标记的小画布上再拷回，保证分块、局部重绘与整图绘制逐像素一致。
+        """
+        text = str(index + 1)
+        x, y = px - ox, py - oy
+        e, fw, fh = self._layout(text)
+        tx, ty = int(px - fw / 2) - px, int(py + fh / 2) - py
+        ih, iw = img.shape[:2]
+        if e <= x < iw - e and e <= y < ih - e:
+            self._paint(img, text, x, y, tx, ty)
+            return
+        x0, y0, x1, y1 = max(x - e, 0), max(y - e, 0), min(x + e + 1, iw), min(y + e + 1, ih)
+        if x0 >= x1 or y0 >= y1:
+            return
+        scratch = np.zeros((2 * e + 1, 2 * e + 1, img.shape[2]), dtype=img.dtype)
+        inner = scratch[y0 - y + e:y1 - y + e, x0 - x + e:x1 - x + e]
+        inner[...] = img[y0:y1, x0:x1]
+        self._paint(scratch, text, e, e, tx, ty)
+        img[y0:y1, x0:x1] = inner
+
+    def _paint(self, img, text, x, y, tx, ty):
+        """以 img 中的 (x, y) 为圆心绘制，文字起点为 (x + tx, y + ty)"""
+        cv2.circle(img, (x, y), self.r, self.fill, -1)
+        cv2.circle(img, (x, y), self.r, self.ink, self.thickness)
+        cv2.putText(img, text, (x + tx, y + ty), cv2.FONT_HERSHEY_SIMPLEX, self.font_scale, self.ink, self.thickness, cv2.LINE_AA)
+
+
+class _SpriteCache:
+    """按 (样式, 名称) 缓存贴图（名称为序号或 "circle"），超过字节上限时按 LRU 淘汰"""
+
+    def __init__(self, max_bytes=SPRITE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+
+    def get(self, style, name, render):
+        key = (style.key, name)
+        with self._lock:
+            sprite = self._entries.get(key)
+            if sprite is not None:
+                self._entries.move_to_end(key)
+                return sprite
+        sprite = render(name)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = sprite
+                self.current_bytes += sprite.nbytes
+                while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                    _, old = self._entries.popitem(last=False)
+                    self.current_bytes -= old.nbytes
+        return sprite
+
+
+class _ExtentCache:
+    """按样式缓存各序号标记的最大半径（int32 数组，按需增长），最多保留 max_styles 种样式"""
+
+    def __init__(self, max_styles=32):
+        self.max_styles = max_styles
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, style, n):
+        with self._lock:
+            extents = self._entries.get(style.key)
+            if extents is not None:
+                self._entries.move_to_end(style.key)
+        if extents is None or len(extents) < n:
+            start = 0 if extents is None else len(extents)
+            more = np.array([style.extent(i) for i in range(start, n)], dtype=np.int32)
+            extents = more if extents is None else np.concatenate([extents, more])
+            with self._lock:
+                current = self._entries.get(style.key)
+                if current is None or len(current) < len(extents):
+                    self._entries[style.key] = extents
+                self._entries.move_to_end(style.key)
+                while len(self._entries) > self.max_styles:
+                    self._entries.popitem(last=False)
+        return extents[:n]
+
+
+_sprite_cache = _SpriteCache()
+_extent_cache = _ExtentCache()
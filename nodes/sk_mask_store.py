@@ -0,0 +1,172 @@
+# sk_mask_store.py - 涂鸦掩码的内容寻址存储
+# mask_data widget 只保存 "sk-mask:<sha256>"，PNG 文件按哈希存放在磁盘上；
+# 旧工作流中的 base64 data URL 仍然兼容。
+# 每次编辑涂鸦都会上传一份新掩码，目录按总大小 / 最近使用时间清理（与缩略图缓存相同的方式）。
+
+import base64
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from aiohttp import web
+from server import PromptServer
+import folder_paths
+
+MASK_REF_PREFIX = "sk-mask:"
+_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# 掩码目录总大小上限 (MB)，超出后按最近使用时间删除最旧的掩码
+MASK_STORE_MAX_MB = int(os.environ.get("SKNODES_MASK_STORE_MB", "1024"))
+# 超过该天数未使用的掩码会被删除（0 为不按时间清理）
+MASK_MAX_AGE_DAYS = float(os.environ.get("SKNODES_MASK_MAX_AGE_DAYS", "0"))
+# 两次清理之间的最小间隔（秒），以及使用时刷新 mtime 的最小间隔（秒）
+PRUNE_INTERVAL = 60.0
+TOUCH_INTERVAL = 24 * 3600
+_prune_lock = threading.Lock()
+_last_prune = 0.0
+
+
+def get_mask_dir():
+    """掩码目录：环境变量 SKNODES_MASK_DIR > ComfyUI user 目录 > 插件 config 目录"""
+    mask_dir = os.environ.get("SKNODES_MASK_DIR")
+    if not mask_dir:
+        try:
+            mask_dir = os.path.join(folder_paths.get_user_directory(), "sk_masks")
+        except AttributeError:
+            mask_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config", "masks"))
+    os.makedirs(mask_dir, exist_ok=True)
+    return mask_dir
+
+
+# 目录只在导入时确定并创建一次
+MASK_DIR = get_mask_dir()
+
+
+def is_mask_ref(mask_data):
+    return isinstance(mask_data, str) and mask_data.startswith(MASK_REF_PREFIX)
+
+
+def mask_ref_hash(mask_data):
+    digest = mask_data[len(MASK_REF_PREFIX):].strip().lower()
+    if not _HASH_RE.match(digest):
+        raise ValueError(f"无效的掩码引用: {mask_data[:80]}")
+    return digest
+
+
+def mask_path(digest):
+    return os.path.join(MASK_DIR, f"{digest}.png")
+
+
+def _touch(path):
+    """记录最近使用时间，供清理时参考；mtime 足够新时不写入"""
+    try:
+        if time.time() - os.stat(path).st_mtime > TOUCH_INTERVAL:
+            os.utime(path)
+    except OSError:
+        pass
+
+
+def _prune(force=False):
+    """掩码总大小超过上限时按最近使用时间删除最旧的文件；设置了 MASK_MAX_AGE_DAYS 时同时删除过期的掩码"""
+    global _last_prune
+    now = time.time()
+    with _prune_lock:
+        if not force and now - _last_prune < PRUNE_INTERVAL:
+            return
+        _last_prune = now
+    entries = []
+    try:
+        with os.scandir(MASK_DIR) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".png"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+    except OSError:
+        return
+    entries.sort()
+    total = sum(e[1] for e in entries)
+    limit = MASK_STORE_MAX_MB * 1024 * 1024
+    # 超出上限时清理到上限的 80%，避免每次保存都触发清理
+    target = limit * 0.8 if total > limit else limit
+    expire = now - MASK_MAX_AGE_DAYS * 86400 if MASK_MAX_AGE_DAYS > 0 else None
+    for mtime, size, p in entries:
+        if total <= target and (expire is None or mtime >= expire):
+            break
+        try:
+            os.remove(p)
+            total -= size
+        except OSError:
+            pass
+
+
+def save_mask_bytes(png_bytes):
+    """保存 PNG 数据并返回掩码引用；相同内容只保存一份"""
+    if not png_bytes.startswith(_PNG_SIGNATURE):
+        raise ValueError("掩码必须是 PNG 格式")
+    digest = hashlib.sha256(png_bytes).hexdigest()
+    path = mask_path(digest)
+    if not os.path.exists(path):
+        # 先写临时文件再重命名，避免并发读取到不完整的文件
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(png_bytes)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        _prune()
+    else:
+        _touch(path)
+    return MASK_REF_PREFIX + digest
+
+
+def mask_source(mask_data):
+    """
+    解析 mask_data，返回:
+    - ("path", 文件路径)   内容寻址引用
+    - ("bytes", PNG 数据)  旧版 base64 data URL
+    - None                 无掩码
+    """
+    if not mask_data:
+        return None
+    if is_mask_ref(mask_data):
+        path = mask_path(mask_ref_hash(mask_data))
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"掩码文件不存在: {path}")
+        _touch(path)
+        return ("path", path)
+    if "," in mask_data:
+        return ("bytes", base64.b64decode(mask_data.split(",")[1]))
+    return None
+
+
+# =========================================================================
+# API：上传 / 读取掩码
+# =========================================================================
+@PromptServer.instance.routes.post("/api/sk-marks/upload_mask")
+async def upload_mask(request):
+    try:
+        body = await request.read()
+        return web.json_response({"status": "success", "mask_ref": save_mask_bytes(body)})
+    except Exception as e:
+        print(f"SK-Nodes Mask Upload Error: {e}")
+        return web.json_response({"status": "error", "message": str(e)}, status=400)
+
+
+@PromptServer.instance.routes.get("/api/sk-marks/mask/{digest}")
+async def get_mask(request):
+    digest = request.match_info["digest"].lower()
+    if not _HASH_RE.match(digest):
+        return web.Response(status=400, text="Invalid mask hash")
+    path = mask_path(digest)
+    if not os.path.exists(path):
+        return web.Response(status=404, text="Mask not found")
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "private, max-age=31536000, immutable"}
+    if request.headers.get("If-None-Match", "").strip('"') == digest:
+        return web.Response(status=304, headers=headers)
+    return web.FileResponse(path, headers=headers)
@@ -0,0 +1,37 @@
+# sk_outputs.py - 节点输出组装：相同内容的输出共享同一张量
+
+import numpy as np
+import torch
+
+
+def to_image_tensor(arr):
+    """
+    uint8 [H,W,C] 或 [H,W] 转为 float32 [1,H,W,C] / [1,H,W]（0~1）。
+    直接除法写入预分配的张量，不产生 astype/除法的整帧临时副本；结果与 astype(float32) / 255.0 一致。
+    """
+    out = torch.empty((1,) + arr.shape, dtype=torch.float32)
+    np.divide(arr, np.float32(255.0), out=out.numpy()[0])
+    return out
+
+
+class OutputAssembler:
+    """
+    组装输出：同一 key 的输出只构建、转换一次，多个输出共享同一张量。
+    outputs 为调用方实际使用的输出下标（None 为全部），其余输出返回 None。
+    注意：ComfyUI 的 IS_CHANGED 与输出缓存都不感知下游连接，节点不能按连线决定 outputs，
+    否则先不连接某个输出执行后再连上，会复用缓存中的 None。
+    """
+
+    def __init__(self, outputs=None):
+        self.outputs = outputs
+        self._tensors = {}
+
+    def wanted(self, index):
+        return self.outputs is None or index in self.outputs
+
+    def get(self, index, key, build):
+        if not self.wanted(index):
+            return None
+        if key not in self._tensors:
+            self._tensors[key] = build()
+        return self._tensors[key]
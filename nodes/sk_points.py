@@ -0,0 +1,241 @@
+# sk_points.py - 标注点位集合：一次解析为 NumPy 列数组，校验、换算、可见性裁剪全部向量化
+# 支持的 points_data 格式（序号始终为下标 + 1，无效/空位的点不绘制但保留序号）：
+#   [{"x": 10, "y": 20}, ...]            前端默认格式（null 为空位）
+#   [[10, 20], ...] / [10, 20, 30, 40]    点对数组 / 扁平数组
+#   {"x": [...], "y": [...]}              列数组（上游跟踪关键点等）
+#   {"points": <以上任一>, "normalized": true}   normalized 时坐标为 0~1，相对图像宽高
+#   "sk-points:<f32|f32n|u16>:<base64>"   紧凑二进制：小端、x/y 交替；f32 用 NaN、u16 用 65535 表示空位，f32n 为归一化坐标
+
+import base64
+import json
+
+import numpy as np
+
+POINTS_PREFIX = "sk-points:"
+# 超出该范围的坐标视为无效（避免取整溢出；任何图像都不会这么大）
+COORD_LIMIT = float(2 ** 30)
+
+_BINARY_FORMATS = {
+    "f32": (np.dtype("<f4"), False),
+    "f32n": (np.dtype("<f4"), True),
+    "u16": (np.dtype("<u2"), False),
+}
+
+
+class PointSet:
+    """
+    xy: float64 [N,2]（取整后为 int64）；valid: bool [N]
+    normalized 为 True 时坐标相对图像宽高（0~1），to_pixels 时换算
+    """
+    __slots__ = ("xy", "valid", "normalized", "raw", "malformed", "out_of_bounds")
+
+    def __init__(self, xy, valid=None, normalized=False, raw=None, malformed=0, out_of_bounds=0):
+        self.xy = xy
+        self.valid = np.ones(len(xy), dtype=bool) if valid is None else valid
+        self.normalized = normalized
+        self.raw = raw              # 前端默认格式的原始列表，json_points 原样输出
+        self.malformed = malformed  # 格式错误/越界的点数（不含空位）
+        self.out_of_bounds = out_of_bounds  # 圆心在图像 [0,w) x [0,h) 之外的有效点数（to_pixels / scaled 时统计）
+
+    def __len__(self):
+        return len(self.xy)
+
+    def any(self):
+        return bool(self.valid.any())
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 2), dtype=np.float64))
+
+    # ---------------------------------------------------------------------
+    # 换算
+    # ---------------------------------------------------------------------
+    def to_pixels(self, size=None):
+        """
+        取整为像素坐标 (int64)；归一化坐标按 size=(宽, 高) 换算，缺少 size 时全部视为无效。
+        给出 size 时统计圆心超出图像范围的点数（out_of_bounds），这些点仍然有效，标记只有图像内的部分可见
+        """
+        xy = self.xy
+        valid = self.valid
+        if self.normalized:
+            if size is None:
+                valid = np.zeros_like(valid)
+            else:
+                xy = xy * np.array(size, dtype=np.float64)
+        pixels = _round(xy, valid)
+        return PointSet(pixels, valid, False, self.raw, self.malformed, _out_of_bounds(pixels, valid, size))
+
+    def scaled(self, ref_size, size):
+        """把 ref_size 坐标系中的像素点位换算到 size；尺寸相同或未知时原样返回"""
+        if self.normalized:
+            return self.to_pixels(size)
+        if not ref_size or tuple(ref_size) == tuple(size):
+            return self
+        scale = np.array([size[0] / ref_size[0], size[1] / ref_size[1]], dtype=np.float64)
+        pixels = _round(self.xy * scale, self.valid)
+        return PointSet(pixels, self.valid, False, self.raw, self.malformed, _out_of_bounds(pixels, self.valid, size))
+
+    # ---------------------------------------------------------------------
+    # 查询
+    # ---------------------------------------------------------------------
+    def visible(self, extents, x0, y0, x1, y1):
+        """标记（半径 extents[i]）与区域 [x0,x1) x [y0,y1) 相交的点的下标（升序，即绘制顺序）"""
+        if not len(self):
+            return np.zeros(0, dtype=np.intp)
+        x, y = self.xy[:, 0], self.xy[:, 1]
+        e = extents[:len(self)]
+        hit = self.valid & (x + e > x0) & (x - e < x1) & (y + e > y0) & (y - e < y1)
+        return np.flatnonzero(hit)
+
+    def items(self, indices=None):
+        """[(下标, x, y)]，只包含有效点；indices 为 None 时为全部点"""
+        if indices is None:
+            indices = np.flatnonzero(self.valid)
+        return zip(indices.tolist(), self.xy[indices, 0].tolist(), self.xy[indices, 1].tolist())
+
+    def changed(self, other):
+        """与另一组像素点位相比发生变化（新增/删除/移动/有效性变化）的下标"""
+        n = max(len(self), len(other))
+        a_xy, a_valid = _padded(self, n)
+        b_xy, b_valid = _padded(other, n)
+        same_pos = (a_xy == b_xy).all(axis=1)
+        return np.flatnonzero((a_valid != b_valid) | (a_valid & ~same_pos))
+
+    def to_json(self):
+        """json_points 输出：前端默认格式原样返回，其它格式转为 [{"x", "y"} 或 null]"""
+        if self.raw is not None:
+            return json.dumps(self.raw)
+        xy = self.xy.tolist()
+        return json.dumps([{"x": p[0], "y": p[1]} if v else None for p, v in zip(xy, self.valid.tolist())])
+
+
+def _round(xy, valid):
+    # 与 int(round(float(v))) 一致（银行家舍入）；无效点置 0，避免 NaN 转换
+    return np.where(valid[:, None], np.round(xy), 0).astype(np.int64)
+
+
+def _out_of_bounds(pixels, valid, size):
+    if size is None or not len(pixels):
+        return 0
+    x, y = pixels[:, 0], pixels[:, 1]
+    return int((valid & ((x < 0) | (x >= size[0]) | (y < 0) | (y >= size[1]))).sum())
+
+
+def _padded(points, n):
+    xy = np.zeros((n, 2), dtype=points.xy.dtype)
+    valid = np.zeros(n, dtype=bool)
+    xy[:len(points)] = points.xy
+    valid[:len(points)] = points.valid
+    return xy, valid
+
+
+def _from_array(xy, normalized=False, raw=None, holes=None):
+    """float64 [N,2] -> PointSet：NaN 为空位，inf/超出范围记为格式错误"""
+    nan = np.isnan(xy).any(axis=1)
+    if holes is not None:
+        nan |= holes
+    ok = np.isfinite(xy).all(axis=1) & (np.abs(xy) <= COORD_LIMIT).all(axis=1) & ~nan
+    return PointSet(xy, ok, normalized, raw, int((~ok & ~nan).sum()))
+
+
+def _dict_points(items):
+    """前端默认格式 [{"x", "y"}]：先整体转换，失败时逐点转换（None 为空位，格式错误记为 inf）"""
+    try:
+        return np.array([(p["x"], p["y"]) for p in items], dtype=np.float64).reshape(-1, 2)
+    except Exception:
+        pass
+    xy = np.empty((len(items), 2), dtype=np.float64)
+    for i, p in enumerate(items):
+        if p is None:
+            xy[i] = np.nan
+            continue
+        try:
+            xy[i] = (float(p["x"]), float(p["y"]))
+        except Exception:
+            xy[i] = np.inf
+    return xy
+
+
+def _sequence_points(items, normalized):
+    if not items:
+        return PointSet(np.zeros((0, 2), dtype=np.float64), normalized=normalized, raw=[])
+    first = next((p for p in items if p is not None), None)
+    if isinstance(first, dict):
+        return _from_array(_dict_points(items), normalized, raw=items)
+    # 扁平数组 [x0, y0, x1, y1, ...] 或点对数组 [[x, y], ...]
+    try:
+        arr = np.asarray(items, dtype=np.float64)
+    except (TypeError, ValueError):
+        arr = None
+    if arr is not None and arr.ndim == 1:
+        if arr.size % 2:
+            raise ValueError("扁平坐标数组的长度必须为偶数")
+        return _from_array(arr.reshape(-1, 2), normalized)
+    if arr is not None and arr.ndim == 2 and arr.shape[1] == 2:
+        return _from_array(arr, normalized)
+    # 含空位或格式错误的点对，逐点转换
+    xy = np.full((len(items), 2), np.nan, dtype=np.float64)
+    for i, p in enumerate(items):
+        if p is None:
+            continue
+        try:
+            x, y = p
+            xy[i] = (float(x), float(y))
+        except Exception:
+            xy[i] = np.inf
+    return _from_array(xy, normalized)
+
+
+def _binary_points(text):
+    fmt, _, payload = text[len(POINTS_PREFIX):].partition(":")
+    if fmt not in _BINARY_FORMATS:
+        raise ValueError(f"未知的点位编码: {fmt}")
+    dtype, normalized = _BINARY_FORMATS[fmt]
+    arr = np.frombuffer(base64.b64decode(payload), dtype=dtype)
+    if arr.size % 2:
+        raise ValueError("点位数据长度必须为偶数")
+    arr = arr.reshape(-1, 2)
+    holes = (arr == np.iinfo(dtype).max).any(axis=1) if dtype.kind == "u" else None
+    return _from_array(arr.astype(np.float64), normalized, holes=holes)
+
+
+def parse_points(points_data):
+    """解析 points_data（字符串、列表或 [N,2] 数组）；无法解析时返回空集合并打印原因"""
+    try:
+        points = _parse(points_data)
+    except Exception as e:
+        print(f"SK-Nodes Error: Points parse failure: {e}")
+        return PointSet.empty()
+    if points.malformed:
+        print(f"SK-Nodes Warning: 忽略 {points.malformed} 个无效点位（格式错误或坐标越界）")
+    return points
+
+
+def _parse(data, normalized=False):
+    if data is None:
+        return PointSet.empty()
+    if isinstance(data, str):
+        text = data.strip()
+        if not text:
+            return PointSet.empty()
+        if text.startswith(POINTS_PREFIX):
+            return _binary_points(text)
+        data = json.loads(text)
+    if isinstance(data, dict):
+        normalized = bool(data.get("normalized", normalized))
+        if "points" in data:
+            return _parse(data["points"], normalized)
+        if "x" in data and "y" in data:
+            x = np.asarray(data["x"], dtype=np.float64).ravel()
+            y = np.asarray(data["y"], dtype=np.float64).ravel()
+            if x.shape != y.shape:
+                raise ValueError("x / y 列的长度不一致")
+            return _from_array(np.stack([x, y], axis=1), normalized)
+        raise ValueError("点位对象需要包含 points 或 x/y 列")
+    if isinstance(data, (list, tuple)):
+        return _sequence_points(list(data), normalized)
+    # NumPy 数组 / torch 张量等
+    arr = np.asarray(data, dtype=np.float64)
+    if arr.ndim != 2 or arr.shape[1] != 2:
+        raise ValueError(f"点位数组的形状应为 [N,2]，实际为 {list(arr.shape)}")
+    return _from_array(arr, normalized)
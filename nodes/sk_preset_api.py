@@ -0,0 +1,54 @@
+# sk_preset_api.py - 提示词预设 API（PresetPrompt 前端使用）
+# 路由必须在服务启动前注册，放在只依赖 aiohttp 与预设库的独立模块中，PresetPrompt 节点模块可以延迟加载。
+# 保留原有 API 名称，确保 JS 访问不中断。
+
+import asyncio
+import json
+from aiohttp import web
+from server import PromptServer
+
+from .sk_preset_store import get_preset_store
+
+
+def _cached_response(request, etag, body=None, payload=None):
+    """带 ETag 的 JSON 响应；浏览器重新验证且内容未变化时返回 304"""
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"}
+    if request.headers.get("If-None-Match", "").strip('"') == etag:
+        return web.Response(status=304, headers=headers)
+    if body is None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return web.Response(body=body, content_type="application/json", headers=headers)
+
+
+async def _in_executor(func, *args):
+    # 预设目录可能在网络盘上，校验与读取不放在事件循环中
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+@PromptServer.instance.routes.get("/sklibs/prompts")
+async def _get_names(request):
+    store = get_preset_store()
+    names = await _in_executor(store.names)
+    return _cached_response(request, store.version, payload=names)
+
+
+@PromptServer.instance.routes.get("/sklibs/get_prompt_content")
+async def _get_content(request):
+    text, digest = await _in_executor(get_preset_store().get, request.query.get("name"))
+    if digest is None:
+        return web.json_response({"prompt": text})
+    return _cached_response(request, digest, payload={"prompt": text})
+
+
+@PromptServer.instance.routes.get("/sklibs/prompts_all")
+async def _get_all(request):
+    """全部预设名称与内容：{"version", "names", "prompts": {名称: 内容}}"""
+    version, body = await _in_executor(get_preset_store().bulk)
+    return _cached_response(request, version, body=body)
+
+
+@PromptServer.instance.routes.post("/sklibs/reload_prompts")
+async def _reload(request):
+    store = get_preset_store()
+    await _in_executor(store.refresh, True)
+    return web.json_response({"status": "success", "names": store.names(), "version": store.version})
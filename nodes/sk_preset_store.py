@@ -0,0 +1,153 @@
+# sk_preset_store.py - 提示词预设库（PresetPrompt 使用）
+# 全部预设加载到内存，之后只重新读取 mtime / 大小变化的文件；两次校验之间至少间隔 CHECK_INTERVAL 秒，
+# 间隔内的查询（INPUT_TYPES、下拉框、预览）直接返回内存中的结果，网络盘上的大量预设也不会逐次访问磁盘。
+# 每次内容变化生成新的版本号，用作 HTTP ETag。
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 两次目录校验之间的最小间隔（秒）
+CHECK_INTERVAL = 1.0
+# 需要读取的文件较多时并行读取（网络盘上主要是等待时间）
+READ_WORKERS = 8
+EMPTY_NAME = "无可用预设"
+READ_ERROR = "读取预设失败"
+
+_CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def preset_dir():
+    """预设目录：环境变量 SKNODES_PRESET_DIR（例如共享的网络盘预设库）> 插件 config/prompts 目录"""
+    folder = os.environ.get("SKNODES_PRESET_DIR")
+    if folder:
+        return os.path.abspath(folder)
+    return os.path.normpath(os.path.join(_CURRENT_DIR, "..", "config", "prompts"))
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=12).hexdigest()
+
+
+def _version(presets):
+    return _digest(json.dumps([[name, presets[name][3]] for name in sorted(presets)], ensure_ascii=False).encode("utf-8"))
+
+
+def _read(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception as e:
+        print(f"[PresetPrompt] 读取预设失败 {path}: {e}")
+        return None
+
+
+class PresetStore:
+    """单个预设目录的内存副本（多线程安全：HTTP 请求在线程池中刷新）"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._lock = threading.Lock()
+        self._presets = {}     # { 名称: (mtime_ns, size, 内容, 内容哈希) }
+        self._names = [EMPTY_NAME]
+        self._last_check = 0.0
+        self._bulk = None      # (版本号, JSON 字节) 按版本缓存
+        self.version = _version({})
+
+    def _refresh(self):
+        """重新列目录，只读取新增或 mtime / 大小变化的文件（调用方持有锁）"""
+        os.makedirs(self.folder, exist_ok=True)
+        stats = {}
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if not entry.name.lower().endswith(".txt"):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                stats[entry.name[:-4]] = (st.st_mtime_ns, st.st_size)
+
+        changed = [name for name, key in stats.items()
+                   if self._presets.get(name, (None, None))[:2] != key]
+        removed = [name for name in self._presets if name not in stats]
+        if not changed and not removed:
+            return
+
+        paths = [os.path.join(self.folder, f"{name}.txt") for name in changed]
+        if len(paths) > READ_WORKERS:
+            with ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="sk-preset-read") as pool:
+                texts = list(pool.map(_read, paths))
+        else:
+            texts = [_read(p) for p in paths]
+
+        presets = dict(self._presets)
+        for name in removed:
+            del presets[name]
+        for name, text in zip(changed, texts):
+            if text is None:
+                # 读取失败不记录 mtime，下次校验时重试
+                presets[name] = (None, None, READ_ERROR, _digest(READ_ERROR.encode("utf-8")))
+            else:
+                presets[name] = (*stats[name], text, _digest(text.encode("utf-8")))
+        self._presets = presets
+        self._names = sorted(presets) or [EMPTY_NAME]
+        self.version = _version(presets)
+
+    def refresh(self, force=False):
+        if not force and time.monotonic() - self._last_check < CHECK_INTERVAL:
+            return
+        with self._lock:
+            if not force and time.monotonic() - self._last_check < CHECK_INTERVAL:
+                return
+            try:
+                self._refresh()
+            except OSError as e:
+                print(f"[PresetPrompt] 预设目录读取失败: {e}")
+            self._last_check = time.monotonic()
+
+    # ---------------------------------------------------------------------
+    def names(self):
+        """有序的预设名称列表；没有预设时为 ["无可用预设"]（调用方不要修改）"""
+        self.refresh()
+        return self._names
+
+    def get(self, name):
+        """(内容, 内容哈希)；不存在时为 ("", None)"""
+        self.refresh()
+        entry = self._presets.get(name)
+        if entry is None and name and os.path.basename(name) == name \
+                and os.path.isfile(os.path.join(self.folder, f"{name}.txt")):
+            # 校验间隔内刚新建的预设
+            self.refresh(force=True)
+            entry = self._presets.get(name)
+        return (entry[2], entry[3]) if entry is not None else ("", None)
+
+    def bulk(self):
+        """(版本号, JSON 字节)：一次取得全部名称与内容，同一版本只序列化一次"""
+        self.refresh()
+        bulk = self._bulk
+        if bulk is None or bulk[0] != self.version:
+            presets = self._presets
+            data = {"version": self.version, "names": self._names,
+                    "prompts": {name: presets[name][2] for name in self._names if name in presets}}
+            bulk = self._bulk = (self.version, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        return bulk
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_preset_store():
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = PresetStore(preset_dir())
+    return _STORE
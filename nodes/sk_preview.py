@@ -0,0 +1,139 @@
+# sk_preview.py - V3 标注编辑器的预览渲染（在 sk_preview_api 的线程池中执行，首次请求时才导入）
+
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from . import sk_render
+from .sk_composite import composite_over
+from .sk_points import PointSet, parse_points
+from .sk_render import decode_cached, load_doodle, resize_doodle
+
+
+class Superseded(Exception):
+    """同一节点有更新的预览请求，当前渲染作废"""
+
+# 每个节点的渲染状态：缓存 原图+涂鸦 合成层 和上一次的点位结果，只重绘变化区域
+# 每个会话持有合成层 + 画布两张整图（8K 约 200 MB），按字节预算 (MB) 淘汰最久未使用的会话
+PREVIEW_SESSIONS_BYTES = int(os.environ.get("SKNODES_PREVIEW_SESSIONS_MB", "512")) * 1024 * 1024
+_PREVIEW_SESSIONS = OrderedDict()  # { node_key: _RenderSession }
+_PREVIEW_SESSIONS_LOCK = threading.Lock()
+
+class _RenderSession:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.base = None        # 图像缓存中的原图数组（同一对象即未变化）
+        self.mask_data = None
+        self.composite = None   # 原图 + 涂鸦
+        self.canvas = None      # 原图 + 涂鸦 + 点位
+        self.points = PointSet.empty()  # 像素坐标，只在画布绘制成功后更新
+        self.nbytes = 0
+
+def _get_session(node_key):
+    with _PREVIEW_SESSIONS_LOCK:
+        session = _PREVIEW_SESSIONS.get(node_key)
+        if session is None:
+            session = _PREVIEW_SESSIONS[node_key] = _RenderSession()
+        _PREVIEW_SESSIONS.move_to_end(node_key)
+        return session
+
+def _account_session(node_key, session):
+    """渲染完成后更新会话占用的字节数，超出预算时淘汰最久未使用的会话（单个会话超出预算时不保留）"""
+    nbytes = sum(a.nbytes for a in (session.composite, session.canvas) if a is not None)
+    with _PREVIEW_SESSIONS_LOCK:
+        if _PREVIEW_SESSIONS.get(node_key) is not session:
+            return
+        session.nbytes = nbytes
+        total = sum(s.nbytes for s in _PREVIEW_SESSIONS.values())
+        while total > PREVIEW_SESSIONS_BYTES and _PREVIEW_SESSIONS:
+            _, old = _PREVIEW_SESSIONS.popitem(last=False)
+            total -= old.nbytes
+
+def _marker_style(w, h):
+    # 与节点输出使用同一套标记外观，预览画布为 BGR
+    return sk_render.PRESETS["v3"].style(w, h, bgr=True)
+
+def _draw_points_region(session, style, points, rect=None):
+    """在 rect 区域内（None 为整图）从合成层恢复像素，并按顺序贴上 points 中与之相交的标记"""
+    if rect is None:
+        session.canvas[...] = session.composite
+        style.draw_points(session.canvas, points)
+        return
+
+    # 贴图逐像素独立混合，区域内重绘与整图绘制逐像素一致
+    x0, y0, x1, y1 = rect
+    view = session.canvas[y0:y1, x0:x1]
+    view[...] = session.composite[y0:y1, x0:x1]
+    for i, px, py in points.items(points.visible(style.extents(len(points)), x0, y0, x1, y1)):
+        style.draw(view, i, px, py, x0, y0)
+
+def render_preview(image_path, points, mask_data, is_current=lambda: True, node_key=None):
+    session = _get_session(node_key) if node_key is not None else _RenderSession()
+    with session.lock:
+        # 1. 优先使用缓存（渲染引擎的解码缓存）
+        base = decode_cached(image_path)
+        if not is_current(): raise Superseded()
+
+        h, w = base.shape[:2]
+
+        # 2. 涂鸦合成 (Alpha Blend) - 原图和涂鸦都未变化时复用缓存的合成层
+        if session.base is not base or session.mask_data != mask_data:
+            composite = base.copy() if sk_render.NATIVE_BGR else cv2.cvtColor(base, cv2.COLOR_RGB2BGR)
+
+            if mask_data:
+                m_arr = load_doodle(mask_data)
+
+                if m_arr is not None:
+                    m_arr = cv2.cvtColor(resize_doodle(m_arr, w, h), cv2.COLOR_RGBA2BGRA)
+                    # 整数定点 Alpha 混合 (BGR 空间，原地写入 composite)
+                    composite_over(composite, m_arr, out=composite)
+            if not is_current(): raise Superseded()
+
+            session.base, session.mask_data, session.composite = base, mask_data, composite
+            session.canvas = None
+
+        # 3. 绘制点位：只重绘新增/移动/删除的点附近的区域
+        style = _marker_style(w, h)
+        new_points = parse_points(points).to_pixels((w, h))
+        old_points = session.points
+        try:
+            _update_canvas(session, style, old_points, new_points, w, h)
+        except BaseException:
+            # 画布可能只画了一部分：下次整图重绘，点位保持上一次成功的结果
+            session.canvas = None
+            raise
+        session.points = new_points
+
+        # 4. 内存中编码为 JPG (压缩质量 85)，不再写临时文件
+        ok, buf = cv2.imencode(".jpg", session.canvas, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
+    if node_key is not None:
+        _account_session(node_key, session)
+    if not ok:
+        raise Exception("JPEG encode failed")
+    return buf.tobytes()
+
+def _update_canvas(session, style, old_points, new_points, w, h):
+    """把画布从 old_points 的结果更新为 new_points：只重绘新增/移动/删除的点附近的区域"""
+    if session.canvas is None:
+        session.canvas = np.empty_like(session.composite)
+        _draw_points_region(session, style, new_points)
+    else:
+        changed = new_points.changed(old_points)
+        extents = style.extents(max(len(old_points), len(new_points)))
+        dirty = []
+        for pts in (old_points, new_points):
+            idx = changed[changed < len(pts)]
+            idx = idx[pts.valid[idx]]
+            x, y, e = pts.xy[idx, 0], pts.xy[idx, 1], extents[idx]
+            rects = np.stack([np.maximum(x - e, 0), np.maximum(y - e, 0), np.minimum(x + e + 1, w), np.minimum(y + e + 1, h)], axis=1)
+            rects = rects[(rects[:, 0] < rects[:, 2]) & (rects[:, 1] < rects[:, 3])]
+            dirty.extend(map(tuple, rects.tolist()))
+        if len(dirty) > max(len(new_points) // 2, 8):
+            # 变化过多（例如删除靠前的点导致序号整体变化），直接整图重绘
+            _draw_points_region(session, style, new_points)
+        else:
+            for rect in dirty:
+                _draw_points_region(session, style, new_points, rect)
@@ -0,0 +1,100 @@
+# sk_preview_api.py - V3 标注编辑器的预览 API
+# 路由必须在服务启动前注册，因此本模块只依赖 aiohttp / folder_paths；
+# 渲染代码（sk_preview → sk_render、cv2、torch）在首次预览请求时才导入，节点模块可以延迟加载。
+
+import asyncio
+import hashlib
+import itertools
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from aiohttp import web
+from server import PromptServer
+import folder_paths
+
+# 预览渲染在线程池中执行，不阻塞 aiohttp 事件循环；结果保存在内存中
+_RENDER_POOL = ThreadPoolExecutor(max_workers=int(os.environ.get("SKNODES_RENDER_WORKERS", "2")), thread_name_prefix="sk-v3-preview")
+# { node_key: [最新请求序号, (etag, jpeg_bytes) 或 None] }：请求序号与预览结果一起按 LRU 淘汰，仅在事件循环线程中写入
+_PREVIEWS = OrderedDict()
+PREVIEW_STORE_MAX = 32
+# 全局递增的请求序号：条目被淘汰后重新出现也不会与仍在进行的旧请求序号重复
+_SEQ = itertools.count(1)
+
+
+def _preview_key(data):
+    """
+    预览条目的 key：客户端 (浏览器标签页) + 工作流 + 节点。
+    不同标签页/工作流中的同一节点 id 互不覆盖、互不作废；旧版前端没有 client_id 时退回节点 id 或图片名
+    """
+    node = data.get("node_id") or data.get("image")
+    return "/".join(str(part) for part in (data.get("client_id"), data.get("workflow_id"), node) if part)
+
+
+@PromptServer.instance.routes.post("/api/sk-marks/save_v3")
+async def save_v3_marks(request):
+    try:
+        data = await request.json()
+        image_name = data.get("image")
+        points = data.get("points", [])
+        mask_data = data.get("mask_data", "")
+        node_key = _preview_key(data)
+
+        image_path = folder_paths.get_annotated_filepath(image_name)
+        if not os.path.exists(image_path):
+            return web.Response(status=404, text="Image not found")
+
+        from . import sk_preview
+
+        # 同一节点的新请求会让尚未完成的旧请求作废；条目被淘汰时进行中的请求同样作废
+        seq = next(_SEQ)
+        slot = _PREVIEWS.get(node_key)
+        if slot is None:
+            slot = _PREVIEWS[node_key] = [seq, None]
+        slot[0] = seq
+        _PREVIEWS.move_to_end(node_key)
+        while len(_PREVIEWS) > PREVIEW_STORE_MAX:
+            _PREVIEWS.popitem(last=False)
+        is_current = lambda: _PREVIEWS.get(node_key, (None,))[0] == seq
+
+        loop = asyncio.get_running_loop()
+        try:
+            jpeg = await loop.run_in_executor(_RENDER_POOL, sk_preview.render_preview, image_path, points, mask_data, is_current, node_key)
+        except sk_preview.Superseded:
+            return web.json_response({"status": "superseded"})
+        if not is_current():
+            return web.json_response({"status": "superseded"})
+
+        etag = hashlib.blake2b(jpeg, digest_size=12).hexdigest()
+        _PREVIEWS[node_key][1] = (etag, jpeg)
+
+        return web.json_response({
+            "status": "success",
+            "preview_url": f"/sk-marks/preview_v3?node={quote(node_key)}&v={etag}",
+        })
+    except Exception as e:
+        print(f"SK-Nodes-V3 API Error: {e}")
+        return web.json_response({"status": "error", "message": str(e)}, status=500)
+
+
+@PromptServer.instance.routes.get("/api/sk-marks/preview_v3")
+async def get_v3_preview(request):
+    slot = _PREVIEWS.get(request.query.get("node", ""))
+    entry = slot[1] if slot is not None else None
+    if entry is None:
+        return web.Response(status=404, text="Preview not found")
+    etag, jpeg = entry
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "private, max-age=0, must-revalidate"}
+    if request.query.get("v") == etag:
+        # URL 中带有内容版本号，可以长期缓存
+        headers["Cache-Control"] = "private, max-age=31536000, immutable"
+    if request.headers.get("If-None-Match", "").strip('"') == etag:
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=jpeg, content_type="image/jpeg", headers=headers)
+
+
+@PromptServer.instance.routes.get("/api/sk-marks/cache_stats")
+async def v3_cache_stats(request):
+    from . import sk_render
+    return web.json_response(sk_render.IMAGE_CACHE.stats())
@@ -0,0 +1,112 @@
+# sk_prompt_merge.py - 提示词合并引擎（MergePrompt 使用）
+# 每个输入值只切分一次：先得到片段列表，再预先连接成一段，合并时只做一次 join；
+# 列表模式下同一个值参与多个组合时不会重复切分。
+
+import itertools
+from collections import namedtuple
+
+SEPARATORS = {
+    "逗号": ",",
+    "句号": ".",
+    "竖线": "|",
+    "换行": "\n",
+}
+
+# 笛卡尔积模式下最多生成的提示词数量
+MAX_COMBINATIONS = 100000
+
+MergeOptions = namedtuple("MergeOptions", "sep remove_newlines remove_empty independent")
+
+
+def make_options(preset, custom, remove_newlines, remove_empty, independent):
+    sep = custom if custom else SEPARATORS.get(preset, "|")
+    return MergeOptions(sep or "", bool(remove_newlines), bool(remove_empty), bool(independent))
+
+
+def joiner(opts):
+    """合并时的连接符：分隔符独立成段时为 换行 + 分隔符 + 换行（分隔符是换行时为双换行）"""
+    if opts.independent:
+        return "\n\n" if opts.sep == "\n" else "\n" + opts.sep + "\n"
+    return opts.sep or " "
+
+
+def _tokens_of(s, opts, out):
+    """把单个字符串的片段追加到 out"""
+    if "\r" in s:
+        # 统一换行符 (跨平台兼容性)
+        s = s.replace("\r\n", "\n").replace("\r", "\n")
+    if "\n" in s:
+        # 先移除空行（仅删除纯空白行，保留非空行），再根据需求把换行转换为空格
+        if opts.remove_empty:
+            s = "\n".join([ln for ln in s.split("\n") if ln.strip()])
+        if opts.remove_newlines:
+            s = s.replace("\n", " ")
+
+    if opts.independent:
+        # 整个输入视为一个片段，只清理首尾空白
+        s = s.strip()
+        if s or not opts.remove_empty:
+            out.append(s)
+        return
+    parts = s.split(opts.sep) if opts.sep else s.split()
+    if opts.remove_empty:
+        out.extend(p for p in map(str.strip, parts) if p)
+    else:
+        out.extend(map(str.strip, parts))
+
+
+def tokenize(value, opts, leading=False):
+    """
+    一个输入值（字符串或字符串列表，列表中的各项依次展开）的片段列表。
+    leading 为 True 表示提示词_1/提示词_2：移除换行符时先删除 \\r 再把换行替换为空格（与其它输入略有不同）。
+    """
+    value = value or ""
+    items = value if isinstance(value, (list, tuple)) else [value]
+    out = []
+    for item in items:
+        s = "" if item is None else str(item)
+        if leading and opts.remove_newlines and not isinstance(value, (list, tuple)):
+            s = s.replace("\r", "").replace("\n", " ")
+        _tokens_of(s, opts, out)
+    return out
+
+
+def segment(value, opts, leading=False):
+    """一个输入值预先连接好的片段；没有任何片段时为 None（合并时跳过）"""
+    tokens = tokenize(value, opts, leading)
+    return joiner(opts).join(tokens) if tokens else None
+
+
+def merge_values(values, opts):
+    """values: [(输入值, 是否为提示词_1/2)]，按顺序合并为一个提示词"""
+    return join_segments([segment(v, opts, leading) for v, leading in values], opts)
+
+
+def join_segments(segments, opts):
+    return joiner(opts).join([s for s in segments if s is not None])
+
+
+def combine(columns, opts, mode):
+    """
+    列表模式：columns 为各输入的值列表 [[(值, 是否为提示词_1/2), ...], ...]。
+    zip：按位置逐项合并，较短的列表重复最后一项；product：全部组合（第一个输入变化最慢）。
+    每个值只切分一次，组合时只连接预先连接好的片段。
+    """
+    segs = [[segment(value, opts, leading) for value, leading in col] for col in columns if col]
+    if not segs:
+        return []
+    if mode == "product":
+        total = 1
+        for col in segs:
+            total *= len(col)
+        if total > MAX_COMBINATIONS:
+            raise ValueError(f"笛卡尔积共 {total} 种组合，超过上限 {MAX_COMBINATIONS}")
+        combos = itertools.product(*segs)
+    else:
+        length = max(len(col) for col in segs)
+        combos = zip(*[col + [col[-1]] * (length - len(col)) for col in segs])
+
+    j = joiner(opts)
+    if any(s is None for col in segs for s in col):
+        return [join_segments(combo, opts) for combo in combos]
+    return list(map(j.join, combos))
@@ -0,0 +1,352 @@
+# sk_render.py - 标注渲染引擎：解码 → 涂鸦合成 → 序号标记 → 输出张量
+# SerialNumberMarks / InteractiveAnnotationTool / InteractiveAnnotationToolV3 共用同一条流水线，
+# 各节点只通过预设 (preset) 区分标记的半径、线宽与字体；解码/缩放后端按可用性自动选择。
+
+import io
+import os
+
+import numpy as np
+import torch
+from PIL import Image, ImageOps
+
+from .sk_image_cache import ImageCache
+from .sk_composite import composite_over
+from .sk_mask_store import mask_source
+from .sk_markers import CvMarkerStyle, PilMarkerStyle
+from .sk_batch import annotate_batch, reference_size
+from .sk_points import parse_points
+from .sk_outputs import OutputAssembler, to_image_tensor
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+
+def _pick_backend():
+    """环境变量 SKNODES_RENDER_BACKEND=cv2/pil 可强制指定；默认 OpenCV 可用时优先（解码与缩放更快）"""
+    forced = os.environ.get("SKNODES_RENDER_BACKEND", "").lower()
+    if forced == "pil" or cv2 is None:
+        if forced == "cv2":
+            print("⚠️ [sknodes] 未安装 OpenCV，渲染后端退回 PIL")
+        return "pil"
+    return "cv2"
+
+
+BACKEND = _pick_backend()
+# 解码缓存中数组的通道顺序：cv2 后端为 BGR，PIL 后端为 RGB
+NATIVE_BGR = BACKEND == "cv2"
+
+# 分块模式：整图处理的工作内存估算超过上限 (MB) 时自动按块合成/绘制
+MEMORY_LIMIT_MB = int(os.environ.get("SKNODES_RENDER_MEMORY_MB", "2048"))
+TILE_SIZE = max(int(os.environ.get("SKNODES_RENDER_TILE_SIZE", "2048")), 256)
+
+# 全局解码缓存：{ image_path: 原图数组 }，按字节预算 LRU 淘汰，文件变化后自动失效
+IMAGE_CACHE = ImageCache()
+# 涂鸦掩码缓存：{ mask_path: RGBA 数组 }，掩码文件按内容寻址，内容不会变化
+MASK_CACHE = ImageCache(max_bytes=256 * 1024 * 1024)
+
+
+# =========================================================================
+# 标记预设：保持各节点原有的外观
+# =========================================================================
+class MarkerPreset:
+    def __init__(self, ratio, min_radius, factory):
+        self.ratio, self.min_radius, self.factory = ratio, min_radius, factory
+
+    def radius(self, w, h):
+        return max(int(min(w, h) * self.ratio), self.min_radius)
+
+    def style(self, w, h, bgr=False):
+        return self.factory(self.radius(w, h), bgr)
+
+
+def _pil_fill(bgr):
+    return (0, 0, 255) if bgr else (255, 0, 0)
+
+
+def _hershey_style(r, bgr):
+    if cv2 is None:
+        # 没有 OpenCV 时用 TrueType 字体绘制同样大小的标记
+        return PilMarkerStyle(r, max(int(r * 0.15), 1), int(r * 1.3), fill=_pil_fill(bgr))
+    return CvMarkerStyle(r, r * 0.04, max(int(r * 0.15), 1), bgr=bgr)
+
+
+PRESETS = {
+    "serial": MarkerPreset(0.025, 15, lambda r, bgr: PilMarkerStyle(r, int(r * 0.1), int(r * 1.3), fill=_pil_fill(bgr))),
+    "v2": MarkerPreset(0.015, 10, lambda r, bgr: PilMarkerStyle(r, 2, int(r * 1.3), fonts=("arial.ttf",), fill=_pil_fill(bgr))),
+    "v3": MarkerPreset(0.015, 10, _hershey_style),
+}
+
+
+# =========================================================================
+# 解码
+# =========================================================================
+def _decode_pil(path):
+    # 与浏览器显示和 OpenCV 一致：按 EXIF 方向旋转
+    with Image.open(path) as im:
+        return np.array(ImageOps.exif_transpose(im).convert("RGB"))
+
+
+def _decode_cv2(path):
+    # np.fromfile + imdecode 兼容非 ASCII 路径
+    arr = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if arr is None:
+        # OpenCV 不支持的格式降级到 PIL
+        arr = cv2.cvtColor(_decode_pil(path), cv2.COLOR_RGB2BGR)
+    return arr
+
+
+def decode_cached(path):
+    """带缓存的解码结果（只读，通道顺序见 NATIVE_BGR）"""
+    return IMAGE_CACHE.get(path, _decode_cv2 if NATIVE_BGR else _decode_pil)
+
+
+def load_image(path):
+    """RGB uint8 原图；PIL 后端直接返回缓存中的只读数组，调用方不要原地修改"""
+    arr = decode_cached(path)
+    return cv2.cvtColor(arr, cv2.COLOR_BGR2RGB) if NATIVE_BGR else arr
+
+
+def _decode_uncached(path):
+    """分块模式读取原图：不进入缓存；cv2 后端直接按路径流式解码，不在内存中保留文件数据"""
+    if NATIVE_BGR:
+        arr = cv2.imread(path, cv2.IMREAD_COLOR)
+        return arr if arr is not None else _decode_cv2(path)
+    return _decode_pil(path)
+
+
+def _decode_mask_bytes(data):
+    if cv2 is None:
+        return np.array(Image.open(io.BytesIO(data)).convert("RGBA"))
+    m = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+    if m is None:
+        raise ValueError("无法解码涂鸦掩码")
+    if m.dtype != np.uint8:
+        m = (m >> 8).astype(np.uint8)
+    if m.ndim == 2:
+        return cv2.cvtColor(m, cv2.COLOR_GRAY2RGBA)
+    if m.shape[2] == 3:
+        return cv2.cvtColor(m, cv2.COLOR_BGR2RGBA)
+    return cv2.cvtColor(m, cv2.COLOR_BGRA2RGBA)
+
+
+def load_doodle(mask_data):
+    """读取涂鸦掩码为 RGBA uint8（掩码原始尺寸），无掩码时返回 None"""
+    source = mask_source(mask_data)
+    if source is None:
+        return None
+    kind, value = source
+    if kind == "path":
+        return MASK_CACHE.get(value, lambda p: _decode_mask_bytes(np.fromfile(p, dtype=np.uint8).tobytes()))
+    return _decode_mask_bytes(value)
+
+
+def resize_doodle(doodle, w, h):
+    """双线性缩放到 (w, h)；两个后端使用相同的像素中心对齐方式"""
+    if doodle.shape[:2] == (h, w):
+        return doodle
+    if cv2 is not None:
+        return cv2.resize(doodle, (w, h), interpolation=cv2.INTER_LINEAR)
+    return np.array(Image.fromarray(doodle, "RGBA").resize((w, h), Image.Resampling.BILINEAR))
+
+
+def _doodle_tile(doodle, w, h, x0, y0, x1, y1):
+    """涂鸦层在 [x0,x1) x [y0,y1) 区域的像素，按与 resize_doodle 相同的坐标映射逐块重采样"""
+    mh, mw = doodle.shape[:2]
+    if (mh, mw) == (h, w):
+        return doodle[y0:y1, x0:x1]
+    sx, sy = mw / w, mh / h
+    if cv2 is None:
+        return np.array(Image.fromarray(doodle, "RGBA").resize(
+            (x1 - x0, y1 - y0), Image.Resampling.BILINEAR, box=(x0 * sx, y0 * sy, x1 * sx, y1 * sy)))
+    map_x = (np.arange(x0, x1, dtype=np.float32) + 0.5) * sx - 0.5
+    map_y = (np.arange(y0, y1, dtype=np.float32) + 0.5) * sy - 0.5
+    map_x, map_y = np.meshgrid(map_x, map_y)
+    return cv2.remap(doodle, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def output_bytes_per_pixel(out):
+    """float32 输出张量每像素的字节数上限：每个图像输出 12、mask 4（相同内容的输出共享张量时实际更少）"""
+    return sum(12 for i in (0, 2, 3) if out.wanted(i)) + (4 if out.wanted(1) else 0)
+
+
+def needs_tiling(w, h, out_bpp=40):
+    # 整图模式同时持有: 缓存原图(3) + RGB(3) + 涂鸦 RGBA(4) + 合成(3) + 绘制(3) 字节/像素，另加 float32 输出张量
+    return w * h * (16 + out_bpp) > MEMORY_LIMIT_MB * 1024 * 1024
+
+
+# =========================================================================
+# 点位
+# =========================================================================
+def draw_points(canvas, style, points, ox=0, oy=0):
+    """按顺序贴上标记；canvas 为整图中 (ox, oy) 起始的区域，不修改 canvas，没有相交的标记时原样返回"""
+    h, w = canvas.shape[:2]
+    indices = points.visible(style.extents(len(points)), ox, oy, ox + w, oy + h)
+    if not indices.size:
+        return canvas
+    result = canvas.copy()
+    for i, px, py in points.items(indices):
+        style.draw(result, i, px, py, ox, oy)
+    return result
+
+
+# =========================================================================
+# 渲染入口
+# =========================================================================
+def render(preset, image, points_data, mask_data="", images=None, outputs=None):
+    """
+    标注节点的统一渲染入口，返回 (images, mask, image_doodle, image_points, json_points)：
+    - images 为 [B,H,W,C] 张量时对整个批次叠加（image 仅作为点位坐标参考）
+    - 否则读取输入目录中的 image；超过内存上限时自动分块
+    - 相同内容的输出共享同一张量；outputs 为调用方实际使用的输出下标（None 为全部），其余输出返回 None
+    """
+    preset = PRESETS[preset]
+    points = parse_points(points_data)
+    out = OutputAssembler(outputs)
+
+    if images is not None:
+        _, h, w = images.shape[:3]
+        # 像素坐标按输入目录中原图 -> 帧尺寸换算，归一化坐标直接按帧尺寸换算
+        ref_size = reference_size(_image_path(image)) if image and not points.normalized else None
+        pixels = _report_bounds(points.to_pixels((w, h)).scaled(ref_size, (w, h)), w, h)
+        doodle = _load_doodle_checked(mask_data)
+        doodle = np.zeros((h, w, 4), dtype=np.uint8) if doodle is None else resize_doodle(doodle, w, h)
+        return annotate_batch(images, preset.style(w, h), pixels, doodle, out) + (points.to_json(),)
+
+    if not image:
+        empty_img = torch.zeros((1, 512, 512, 3))
+        empty_mask = torch.zeros((1, 512, 512))
+        return (empty_img, empty_mask, empty_img, empty_img, "[]")
+
+    path = _image_path(image)
+    size = reference_size(path)
+    if size and needs_tiling(*size, output_bytes_per_pixel(out)):
+        return _render_tiled(preset, path, points, mask_data, out) + (points.to_json(),)
+
+    base = load_image(path)
+    h, w = base.shape[:2]
+    doodle = _load_doodle_checked(mask_data)
+    if doodle is not None:
+        doodle = resize_doodle(doodle, w, h)
+    style = preset.style(w, h)
+    pixels = _report_bounds(points.to_pixels((w, h)), w, h)
+
+    # key = (是否含涂鸦, 是否含点位)；无涂鸦/无点位时多个输出自然落到同一个 key 上
+    has_doodle = doodle is not None and bool(doodle[:, :, 3].any())
+    has_points = pixels.any()
+    frames = {(False, False): base}
+
+    def frame(key):
+        if key not in frames:
+            if key[1]:
+                frames[key] = draw_points(frame((key[0], False)), style, pixels)
+            else:
+                # 整数定点 Alpha 合成，仅处理涂鸦包围盒内的像素
+                frames[key] = composite_over(base, doodle)
+        return frames[key]
+
+    def image_output(index, key):
+        return out.get(index, key, lambda: to_image_tensor(frame(key)))
+
+    def mask_output():
+        if doodle is None:
+            return torch.zeros((1, h, w), dtype=torch.float32)
+        return to_image_tensor(doodle[:, :, 3])
+
+    return (
+        image_output(0, (has_doodle, has_points)),      # images: 原图 + 涂鸦 + 标注点
+        out.get(1, "mask", mask_output),                # mask: 涂鸦 alpha
+        image_output(2, (has_doodle, False)),           # image_doodle: 原图 + 涂鸦
+        image_output(3, (False, has_points)),           # image_points: 原图 + 标注点
+        points.to_json(),
+    )
+
+
+def _image_path(image):
+    import folder_paths
+    return folder_paths.get_annotated_filepath(image)
+
+
+def _report_bounds(pixels, w, h):
+    """圆心超出图像范围的点在终端提示数量（与格式错误的点位提示一致），原样返回 pixels"""
+    if pixels.out_of_bounds:
+        print(f"SK-Nodes Warning: {pixels.out_of_bounds} 个点位超出图像范围 ({w}x{h})，只绘制图像内可见的部分（序号保持不变）")
+    return pixels
+
+
+def _load_doodle_checked(mask_data):
+    """
+    读取涂鸦掩码；引用的掩码文件不存在或无法解码时抛出异常让节点报错，
+    不当作“没有涂鸦”继续输出（否则下游拿到的是缺少涂鸦的结果而没有任何提示）
+    """
+    try:
+        return load_doodle(mask_data)
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"SK-Nodes Error: {e}（涂鸦掩码已被删除或清理，请重新绘制或清空涂鸦）") from e
+    except Exception as e:
+        raise ValueError(f"SK-Nodes Error: 涂鸦掩码解码失败: {e}") from e
+
+
+def _render_tiled(preset, path, points, mask_data, out):
+    """
+    超大图分块处理：原图只解码一次（不缓存、不做整图颜色转换），涂鸦合成和点位贴图逐块进行，
+    结果直接写入预分配的输出张量。除涂鸦需要非整数倍缩放的情况外，结果与整图模式逐像素一致。
+    分块只限制合成/绘制的临时内存：整帧原图 (3 字节/像素) 与 float32 输出张量仍然完整存在，
+    两者之和超过 SKNODES_RENDER_MEMORY_MB 时在终端提示。
+    """
+    native = _decode_uncached(path)
+    h, w = native.shape[:2]
+    fixed = w * h * (native.shape[2] + output_bytes_per_pixel(out))
+    if fixed + min(w, TILE_SIZE) * min(h, TILE_SIZE) * 16 > MEMORY_LIMIT_MB * 1024 * 1024:
+        print(f"SK-Nodes Warning: 原图与输出张量共需约 {fixed / 1024 ** 2:.0f} MB，超过 SKNODES_RENDER_MEMORY_MB={MEMORY_LIMIT_MB}；"
+              f"分块模式只能限制合成/绘制的临时内存")
+    doodle = _load_doodle_checked(mask_data)
+    style = preset.style(w, h)
+    points = _report_bounds(points.to_pixels((w, h)), w, h)
+
+    has_doodle = doodle is not None and bool(doodle[:, :, 3].any())
+    has_points = points.any()
+
+    # 先确定需要哪些输出并预分配，再逐块填充
+    buffers = {}
+
+    def alloc(key, shape):
+        buffers[key] = torch.empty(shape, dtype=torch.float32)
+        return buffers[key]
+
+    keys = ((has_doodle, has_points), "mask", (has_doodle, False), (False, has_points))
+    result = tuple(
+        out.get(i, key, lambda key=key: alloc(key, (1, h, w) if key == "mask" else (1, h, w, 3)))
+        for i, key in enumerate(keys)
+    )
+
+    for y0 in range(0, h, TILE_SIZE):
+        y1 = min(y0 + TILE_SIZE, h)
+        for x0 in range(0, w, TILE_SIZE):
+            x1 = min(x0 + TILE_SIZE, w)
+            base = native[y0:y1, x0:x1]
+            if NATIVE_BGR:
+                base = cv2.cvtColor(base, cv2.COLOR_BGR2RGB)
+            doodle_tile = _doodle_tile(doodle, w, h, x0, y0, x1, y1) if doodle is not None else None
+
+            frames = {(False, False): base}
+
+            def frame(key):
+                if key not in frames:
+                    if key[1]:
+                        frames[key] = draw_points(frame((key[0], False)), style, points, x0, y0)
+                    else:
+                        frames[key] = composite_over(base, doodle_tile)
+                return frames[key]
+
+            for key, buf in buffers.items():
+                dst = buf.numpy()[0, y0:y1, x0:x1]
+                if key != "mask":
+                    np.divide(frame(key), np.float32(255.0), out=dst)
+                elif doodle_tile is None:
+                    dst[...] = 0
+                else:
+                    np.divide(doodle_tile[:, :, 3], np.float32(255.0), out=dst)
+    return result
+
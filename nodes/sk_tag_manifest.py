@@ -0,0 +1,153 @@
+# sk_tag_manifest.py - 打标进度清单：记录每张图片已写入的打标内容，支持重启后续打和只处理剩余图片
+# 清单按目录保存为追加式 JSONL（与目录列表放在同一位置），每行一条记录，后出现的覆盖先出现的：
+#   {"n": 图片文件名, "img": 图片指纹, "cap": 打标内容哈希, "cfg": 触发词/追加标签设置哈希, "txt": 写入后的打标文件身份}
+#   {"cursor": 循环模式的下一个序号}
+# 记录数远少于行数时整体重写一次（临时文件 + 重命名）。
+
+import hashlib
+import json
+import os
+import threading
+
+from .sk_file_index import get_listing_dir
+from .sk_fingerprint import file_fingerprint, file_identity
+
+# 行数超过 有效记录数 * 2 + 该值 时压缩清单
+COMPACT_SLACK = 1024
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def settings_hash(trigger, suffix):
+    """触发词（未启用时传空字符串）与追加标签的哈希；设置变化后已有的打标视为未完成"""
+    return text_hash(json.dumps([trigger, suffix], ensure_ascii=False))
+
+
+def caption_name(image_name):
+    return os.path.splitext(image_name)[0] + ".txt"
+
+
+class TagManifest:
+    """单个打标目录的进度清单（多线程安全：后台写入线程在文件写入成功后调用 record）"""
+
+    def __init__(self, folder):
+        self.folder = os.path.abspath(folder)
+        key = hashlib.sha1(self.folder.encode("utf-8")).hexdigest()[:20]
+        self._path = os.path.join(get_listing_dir(), f"{key}.manifest.jsonl")
+        self._lock = threading.Lock()
+        self._entries = {}   # { 图片文件名: {"img", "cap", "cfg", "txt"} }
+        self._lines = 0
+        self._file = None
+        self.cursor = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self._path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        for line in lines:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # 进程中断时最后一行可能不完整
+            if "n" in row:
+                self._entries[row["n"]] = {"img": row.get("img"), "cap": row.get("cap"), "cfg": row.get("cfg"),
+                                           "txt": row.get("txt")}
+            elif "cursor" in row:
+                self.cursor = int(row["cursor"])
+        self._lines = len(lines)
+
+    def _append(self, row):
+        """追加一行（调用方持有锁）"""
+        try:
+            if self._lines > len(self._entries) * 2 + COMPACT_SLACK:
+                self._compact()
+            if self._file is None:
+                os.makedirs(os.path.dirname(self._path), exist_ok=True)
+                self._file = open(self._path, "a", encoding="utf-8")
+            self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self._file.flush()
+            self._lines += 1
+        except OSError as e:
+            print(f"[SK-Tagger] 打标清单保存失败: {e}")
+
+    def _compact(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        tmp_path = f"{self._path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for name, entry in self._entries.items():
+                f.write(json.dumps(dict(n=name, **entry), ensure_ascii=False) + "\n")
+            f.write(json.dumps({"cursor": self.cursor}) + "\n")
+        os.replace(tmp_path, self._path)
+        self._lines = len(self._entries) + 1
+
+    # ---------------------------------------------------------------------
+    @staticmethod
+    def _caption_identity(path):
+        identity = file_identity(path)
+        return list(identity) if identity is not None else None
+
+    def record(self, image_name, content, settings):
+        """image_name 的打标文件已写入 content（同时记录打标文件的身份，之后被手动修改时能发现）"""
+        entry = {"img": file_fingerprint(os.path.join(self.folder, image_name)), "cap": text_hash(content), "cfg": settings,
+                 "txt": self._caption_identity(os.path.join(self.folder, caption_name(image_name)))}
+        with self._lock:
+            if self._entries.get(image_name) == entry:
+                return
+            self._entries[image_name] = entry
+            self._append(dict(n=image_name, **entry))
+
+    def set_cursor(self, cursor):
+        with self._lock:
+            if cursor != self.cursor:
+                self.cursor = cursor
+                self._append({"cursor": cursor})
+
+    def is_current(self, image_name, settings, content=None, captions=None):
+        """
+        image_name 已按当前设置打标、图片未变化且打标文件仍然存在；
+        给出 content 时（决定是否跳过写入）还要求内容相同、打标文件自写入后未被修改（手动编辑过的会被重新覆盖）。
+        captions 为目录中已有的文件名集合（批量判断时避免逐个 stat）。
+        """
+        entry = self._entries.get(image_name)
+        if entry is None or entry["cfg"] != settings:
+            return False
+        txt = caption_name(image_name)
+        if content is not None:
+            if entry["cap"] != text_hash(content):
+                return False
+            if entry["txt"] is None or entry["txt"] != self._caption_identity(os.path.join(self.folder, txt)):
+                return False
+        elif not (txt in captions if captions is not None else os.path.isfile(os.path.join(self.folder, txt))):
+            return False
+        return entry["img"] == file_fingerprint(os.path.join(self.folder, image_name))
+
+    def pending(self, img_files, settings):
+        """img_files 中尚未按当前设置完成打标的序号"""
+        try:
+            captions = set(os.listdir(self.folder))
+        except OSError:
+            captions = set()
+        return [i for i, name in enumerate(img_files) if not self.is_current(name, settings, captions=captions)]
+
+
+_MANIFESTS = {}
+_MANIFESTS_LOCK = threading.Lock()
+
+
+def get_tag_manifest(folder):
+    """按目录获取共享的清单实例"""
+    folder = os.path.abspath(folder)
+    manifest = _MANIFESTS.get(folder)
+    if manifest is None:
+        with _MANIFESTS_LOCK:
+            manifest = _MANIFESTS.get(folder)
+            if manifest is None:
+                manifest = _MANIFESTS[folder] = TagManifest(folder)
+    return manifest
@@ -0,0 +1,198 @@
+# sk_thumbnails.py - 输入图片的缩略图金字塔（标注编辑器按显示尺寸加载，避免下载原图）
+# 启动时导入以注册路由，PIL 在首次生成缩略图时才导入
+
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
+from server import PromptServer
+import folder_paths
+
+THUMB_LEVELS = (512, 1024, 2048)
+THUMB_CACHE_MAX_MB = int(os.environ.get("SKNODES_THUMB_CACHE_MB", "2048"))
+
+_THUMB_POOL = ThreadPoolExecutor(max_workers=int(os.environ.get("SKNODES_THUMB_WORKERS", "2")), thread_name_prefix="sk-thumb")
+_LOCK = threading.Lock()
+_HASHES = {}      # { path: ((mtime_ns, size), sha256, (width, height)) }
+_INFLIGHT = {}    # { (sha256, level): Future }
+
+
+def get_thumb_dir():
+    """缩略图目录：环境变量 SKNODES_THUMB_DIR > ComfyUI user 目录 > 插件 config 目录"""
+    thumb_dir = os.environ.get("SKNODES_THUMB_DIR")
+    if not thumb_dir:
+        try:
+            thumb_dir = os.path.join(folder_paths.get_user_directory(), "sk_thumbs")
+        except AttributeError:
+            thumb_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config", "thumbs"))
+    os.makedirs(thumb_dir, exist_ok=True)
+    return thumb_dir
+
+
+def resolve_input_image(name):
+    """输入目录中的图片路径，拒绝越出输入目录的文件名"""
+    if not name:
+        raise FileNotFoundError("empty filename")
+    input_dir = os.path.abspath(folder_paths.get_input_directory())
+    path = os.path.abspath(folder_paths.get_annotated_filepath(name))
+    if os.path.commonpath([input_dir, path]) != input_dir or not os.path.isfile(path):
+        raise FileNotFoundError(name)
+    return path
+
+
+def image_info(path):
+    """返回 (sha256, (宽, 高))，按 (mtime, size) 缓存，文件未变化时不重复读取"""
+    st = os.stat(path)
+    identity = (st.st_mtime_ns, st.st_size)
+    cached = _HASHES.get(path)
+    if cached is not None and cached[0] == identity:
+        return cached[1], cached[2]
+
+    from PIL import Image
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    with Image.open(path) as im:
+        # 与浏览器显示一致：EXIF 方向为 5~8 时宽高互换
+        size = im.size[::-1] if im.getexif().get(0x0112, 1) in (5, 6, 7, 8) else im.size
+    digest = h.hexdigest()
+    with _LOCK:
+        _HASHES[path] = (identity, digest, size)
+    return digest, size
+
+
+def _thumb_path(digest, level, ext):
+    return os.path.join(get_thumb_dir(), f"{digest}_{level}.{ext}")
+
+
+def _existing_thumb(digest, level):
+    for ext in ("jpg", "png"):
+        path = _thumb_path(digest, level, ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _generate(path, digest, level):
+    existing = _existing_thumb(digest, level)
+    if existing:
+        os.utime(existing)  # 记录最近使用时间，供清理时参考
+        return existing
+
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as im:
+        # JPEG 可直接按 1/2^n 解码，大幅降低解码开销
+        im.draft("RGB", (level, level))
+        im = ImageOps.exif_transpose(im)
+        has_alpha = im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info)
+        im = im.convert("RGBA" if has_alpha else "RGB")
+        im.thumbnail((level, level), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+        out = _thumb_path(digest, level, "png" if has_alpha else "jpg")
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(out), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if has_alpha:
+                    im.save(f, "PNG", compress_level=1)
+                else:
+                    im.save(f, "JPEG", quality=90)
+            os.replace(tmp_path, out)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    _prune()
+    return out
+
+
+def _prune():
+    """缩略图总大小超过上限时，按最近使用时间删除最旧的文件"""
+    thumb_dir = get_thumb_dir()
+    entries = []
+    for entry in os.scandir(thumb_dir):
+        if entry.is_file() and not entry.name.endswith(".tmp"):
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(e[1] for e in entries)
+    limit = THUMB_CACHE_MAX_MB * 1024 * 1024
+    if total <= limit:
+        return
+    for _, size, p in sorted(entries):
+        try:
+            os.remove(p)
+            total -= size
+        except OSError:
+            pass
+        if total <= limit * 0.8:
+            break
+
+
+def request_thumb(path, digest, level):
+    """提交（或复用进行中的）缩略图生成任务，返回 Future"""
+    key = (digest, level)
+    with _LOCK:
+        future = _INFLIGHT.get(key)
+        if future is None:
+            future = _THUMB_POOL.submit(_generate, path, digest, level)
+            _INFLIGHT[key] = future
+            future.add_done_callback(lambda _f: _INFLIGHT.pop(key, None))
+    return future
+
+
+def pick_level(size, full_size):
+    """不小于请求尺寸的最小层级；原图本身更小时返回 None（直接使用原图）"""
+    if max(full_size) <= size:
+        return None
+    for level in THUMB_LEVELS:
+        if level >= size:
+            return level if level < max(full_size) else None
+    return None
+
+
+# =========================================================================
+# API
+# =========================================================================
+@PromptServer.instance.routes.get("/api/sk-marks/thumb_info")
+async def thumb_info(request):
+    """返回原图尺寸与哈希，并在后台预生成所有层级"""
+    try:
+        path = resolve_input_image(request.query.get("filename"))
+    except FileNotFoundError:
+        return web.Response(status=404, text="Image not found")
+    loop = asyncio.get_running_loop()
+    digest, (w, h) = await loop.run_in_executor(_THUMB_POOL, image_info, path)
+    levels = [lv for lv in THUMB_LEVELS if lv < max(w, h)]
+    for level in levels:
+        request_thumb(path, digest, level)
+    return web.json_response({"width": w, "height": h, "hash": digest, "levels": levels})
+
+
+@PromptServer.instance.routes.get("/api/sk-marks/thumb")
+async def get_thumb(request):
+    try:
+        path = resolve_input_image(request.query.get("filename"))
+        size = int(request.query.get("size", "1024"))
+    except (FileNotFoundError, ValueError):
+        return web.Response(status=404, text="Image not found")
+
+    loop = asyncio.get_running_loop()
+    digest, full_size = await loop.run_in_executor(_THUMB_POOL, image_info, path)
+    level = pick_level(size, full_size)
+    etag = f"{digest[:32]}-{level or 'full'}"
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "private, max-age=0, must-revalidate"}
+    if request.query.get("v") == digest:
+        # URL 中带有原图哈希，内容不会变化，可以长期缓存
+        headers["Cache-Control"] = "private, max-age=31536000, immutable"
+    if request.headers.get("If-None-Match", "").strip('"') == etag:
+        return web.Response(status=304, headers=headers)
+
+    if level is None:
+        return web.FileResponse(path, headers=headers)
+    thumb_path = await asyncio.wrap_future(request_thumb(path, digest, level))
+    return web.FileResponse(thumb_path, headers=headers)
@@ -0,0 +1,101 @@
+# conftest.py - 测试环境：不启动 ComfyUI，复用 benchmarks/stubs 中的 folder_paths / server 替身，
+# 所有输入目录指向本次测试的临时目录；节点库以 sknodes_test 包名导入（不执行包根目录的 __init__.py）。
+
+import base64
+import importlib
+import io
+import json
+import os
+import sys
+import tempfile
+import types
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUBS = os.path.join(ROOT, "benchmarks", "stubs")
+PACKAGE = "sknodes_test"
+
+# folder_paths 替身在导入时读取工作目录
+WORKDIR = tempfile.mkdtemp(prefix="sknodes-test-")
+os.environ["SKNODES_BENCH_DIR"] = WORKDIR
+
+W, H = 320, 180
+POINTS = [(40, 30), (100, 90), (160, 40), (300, 170), (5, 175), (250, 100),
+          (200, 150), (60, 120), (130, 20), (315, 5), (180, 95), (90, 60)]
+
+
+def import_module(name):
+    if STUBS not in sys.path:
+        sys.path.insert(0, STUBS)
+    if PACKAGE not in sys.modules:
+        pkg = types.ModuleType(PACKAGE)
+        pkg.__path__ = [ROOT]
+        sys.modules[PACKAGE] = pkg
+    return importlib.import_module(f"{PACKAGE}.nodes.{name}")
+
+
+def base_image():
+    """RGB 渐变 + 异或纹理（与基准测试的测试图相同），每个像素各不相同，便于发现错位"""
+    xs = (np.arange(W, dtype=np.uint32) * 255 // (W - 1)).astype(np.uint8)
+    ys = (np.arange(H, dtype=np.uint32) * 255 // (H - 1)).astype(np.uint8)
+    arr = np.empty((H, W, 3), dtype=np.uint8)
+    arr[:, :, 0] = xs
+    arr[:, :, 1] = ys[:, None]
+    np.bitwise_xor(xs[None, :], ys[:, None], out=arr[:, :, 2])
+    return arr
+
+
+def doodle_data_url():
+    """半透明绿色折线涂鸦，前端提交的 data URL 格式"""
+    img = Image.new("RGBA", (W, H), (0, 0, 0, 0))
+    ImageDraw.Draw(img).line([(10, 10), (150, 160), (310, 20)], fill=(0, 255, 0, 200), width=6)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode()
+
+
+@pytest.fixture(scope="session")
+def sk_render():
+    return import_module("sk_render")
+
+
+@pytest.fixture(scope="session")
+def input_image():
+    """输入目录中的测试图，返回文件名"""
+    folder = os.path.join(WORKDIR, "input")
+    os.makedirs(folder, exist_ok=True)
+    Image.fromarray(base_image()).save(os.path.join(folder, "golden.png"))
+    return "golden.png"
+
+
+@pytest.fixture(scope="session")
+def points_data():
+    return json.dumps([{"x": x, "y": y} for x, y in POINTS])
+
+
+@pytest.fixture(scope="session")
+def mask_data():
+    return doodle_data_url()
+
+
+@pytest.fixture
+def backend(sk_render, monkeypatch):
+    """切换解码后端（cv2 / pil）；切换时清空解码缓存，缓存中的数组通道顺序随后端不同"""
+    def use(name):
+        monkeypatch.setattr(sk_render, "BACKEND", name)
+        monkeypatch.setattr(sk_render, "NATIVE_BGR", name == "cv2")
+        sk_render.IMAGE_CACHE.invalidate()
+    yield use
+    sk_render.IMAGE_CACHE.invalidate()
+
+
+@pytest.fixture
+def tiled(sk_render, monkeypatch):
+    """强制分块模式，块大小 64 使标记跨越块边缘"""
+    def use():
+        monkeypatch.setattr(sk_render, "MEMORY_LIMIT_MB", 0)
+        monkeypatch.setattr(sk_render, "TILE_SIZE", 64)
+    return use
@@ -0,0 +1,200 @@
+"""
+标注渲染（sk_render）的黄金图像测试：serial / v2 / v3 三种预设 × cv2 / PIL 后端 × 整图 / 分块 × 批量模式。
+
+与重构前的逐点绘制相比，已知且有意的差异（在下方测试中固定）：
+- 解码按 EXIF 方向旋转（两个后端一致，与浏览器显示相同）；原 SerialNumberMarks 直接 Image.open，不旋转
+- 贴图与直接绘制的混合取整不同，标记像素最多相差 2 个色阶
+- 批量模式在浮点张量上叠加图层，含涂鸦的输出与整图模式最多相差 1 个色阶
+
+黄金图像依赖字体和 FreeType 版本，环境与 golden/golden.json 记录的不一致时跳过；
+设置 SKNODES_UPDATE_GOLDEN=1 运行可重新生成。
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image, features
+
+from conftest import POINTS, H, W, base_image
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+GOLDEN_META = os.path.join(GOLDEN_DIR, "golden.json")
+UPDATE = os.environ.get("SKNODES_UPDATE_GOLDEN") == "1"
+
+PRESETS = ("serial", "v2", "v3")
+# 输出下标：0 = 原图 + 涂鸦 + 标注点，2 = 原图 + 涂鸦，3 = 原图 + 标注点
+IMAGE_OUTPUTS = (0, 2, 3)
+# 批量模式与整图模式的允许差异（色阶），贴图与直接绘制的允许差异（色阶）
+BATCH_TOLERANCE = 1
+SPRITE_TOLERANCE = 2
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+BACKENDS = ("cv2", "pil") if cv2 is not None else ("pil",)
+
+
+def to_uint8(tensor):
+    return (tensor.numpy() * 255.0).round().astype(np.uint8)
+
+
+def render_outputs(sk_render, preset, image, points_data, mask_data, images=None):
+    result = sk_render.render(preset, image, points_data, mask_data, images=images)
+    return {i: to_uint8(result[i]) for i in IMAGE_OUTPUTS}
+
+
+def max_diff(a, b):
+    assert a.shape == b.shape
+    return int(np.abs(a.astype(np.int16) - b).max())
+
+
+def style_signature(sk_render, preset):
+    """黄金图像依赖的渲染环境：PIL 样式为字体与 FreeType 版本，OpenCV 样式为 Hershey 字体（与版本无关）"""
+    style = sk_render.PRESETS[preset].style(W, H)
+    if hasattr(style, "font"):
+        return {"font": list(style.font.getname()), "size": style.font.size, "freetype": features.version("freetype2")}
+    return {"font": "hershey"}
+
+
+@pytest.mark.parametrize("preset", PRESETS)
+def test_golden(sk_render, backend, input_image, points_data, mask_data, preset):
+    backend(BACKENDS[0])
+    outputs = render_outputs(sk_render, preset, input_image, points_data, mask_data)
+    signature = style_signature(sk_render, preset)
+    meta = {}
+    if os.path.exists(GOLDEN_META):
+        with open(GOLDEN_META, encoding="utf-8") as f:
+            meta = json.load(f)
+
+    if UPDATE:
+        for i in (0, 3):
+            Image.fromarray(outputs[i][0]).save(os.path.join(GOLDEN_DIR, f"{preset}_{i}.png"), optimize=True)
+        meta[preset] = signature
+        with open(GOLDEN_META, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2, sort_keys=True)
+        return
+
+    if preset not in meta:
+        pytest.skip(f"缺少 {preset} 的黄金图像，运行 SKNODES_UPDATE_GOLDEN=1 pytest tests 生成")
+    if meta[preset] != signature:
+        pytest.skip(f"渲染环境与黄金图像不同: {signature} != {meta[preset]}")
+    for i in (0, 3):
+        golden = np.array(Image.open(os.path.join(GOLDEN_DIR, f"{preset}_{i}.png")).convert("RGB"))
+        assert max_diff(outputs[i][0], golden) == 0, f"{preset} 输出 {i} 与黄金图像不一致"
+
+
+@pytest.mark.skipif(cv2 is None, reason="未安装 OpenCV")
+@pytest.mark.parametrize("preset", PRESETS)
+def test_backends_match(sk_render, backend, input_image, points_data, mask_data, preset):
+    backend("cv2")
+    native = render_outputs(sk_render, preset, input_image, points_data, mask_data)
+    backend("pil")
+    fallback = render_outputs(sk_render, preset, input_image, points_data, mask_data)
+    for i in IMAGE_OUTPUTS:
+        assert max_diff(native[i], fallback[i]) == 0, f"{preset} 输出 {i}: cv2 与 PIL 后端不一致"
+
+
+@pytest.mark.parametrize("backend_name", BACKENDS)
+@pytest.mark.parametrize("preset", PRESETS)
+def test_tiled_matches_full(sk_render, backend, tiled, input_image, points_data, mask_data, preset, backend_name):
+    backend(backend_name)
+    full = render_outputs(sk_render, preset, input_image, points_data, mask_data)
+    tiled()
+    parts = render_outputs(sk_render, preset, input_image, points_data, mask_data)
+    for i in IMAGE_OUTPUTS:
+        assert max_diff(full[i], parts[i]) == 0, f"{preset} 输出 {i}: 分块与整图结果不一致"
+
+
+@pytest.mark.parametrize("preset", PRESETS)
+def test_batch_matches_full(sk_render, backend, input_image, points_data, mask_data, preset):
+    backend(BACKENDS[0])
+    full = render_outputs(sk_render, preset, input_image, points_data, mask_data)
+    frames = torch.from_numpy(base_image().astype(np.float32) / 255.0)[None].repeat(3, 1, 1, 1)
+    batch = render_outputs(sk_render, preset, input_image, points_data, mask_data, images=frames)
+    for i in IMAGE_OUTPUTS:
+        assert batch[i].shape == (3, H, W, 3)
+        assert all(max_diff(batch[i][0], frame) == 0 for frame in batch[i][1:]), f"{preset} 输出 {i}: 批量各帧不一致"
+        tolerance = 0 if i == 3 else BATCH_TOLERANCE
+        assert max_diff(full[i], batch[i][:1]) <= tolerance, f"{preset} 输出 {i}: 批量与整图差异超过 {tolerance}"
+    mask = sk_render.render(preset, input_image, points_data, mask_data, images=frames)[1]
+    assert mask.shape == (3, H, W) and mask.stride(0) == 0, "批量 mask 应为共享数据的 expand 视图"
+    assert max_diff(to_uint8(mask[2]), to_uint8(sk_render.render(preset, input_image, points_data, mask_data)[1][0])) == 0
+
+
+def direct_draw(style, img):
+    """重构前各节点的逐点绘制：PIL ellipse + text(anchor="mm") / cv2 circle + putText"""
+    if hasattr(style, "font"):
+        from PIL import ImageDraw
+        im = Image.fromarray(img)
+        draw = ImageDraw.Draw(im)
+        r = style.r
+        for i, (px, py) in enumerate(POINTS):
+            draw.ellipse([px - r, py - r, px + r, py + r], fill=style.fill, outline=style.ink, width=style.outline_width)
+            draw.text((px, py), str(i + 1), fill=style.ink, font=style.font, anchor="mm")
+        return np.array(im)
+    for i, (px, py) in enumerate(POINTS):
+        text = str(i + 1)
+        cv2.circle(img, (px, py), style.r, style.fill, -1)
+        cv2.circle(img, (px, py), style.r, style.ink, style.thickness)
+        (fw, fh), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, style.font_scale, style.thickness)
+        cv2.putText(img, text, (int(px - fw / 2), int(py + fh / 2)), cv2.FONT_HERSHEY_SIMPLEX,
+                    style.font_scale, style.ink, style.thickness, cv2.LINE_AA)
+    return img
+
+
+@pytest.mark.parametrize("preset", PRESETS)
+def test_markers_match_direct_drawing(sk_render, backend, input_image, points_data, preset):
+    backend(BACKENDS[0])
+    outputs = render_outputs(sk_render, preset, input_image, points_data, "")
+    expected = direct_draw(sk_render.PRESETS[preset].style(W, H), base_image())
+    assert max_diff(outputs[3][0], expected) <= SPRITE_TOLERANCE
+
+
+@pytest.mark.parametrize("backend_name", BACKENDS)
+def test_exif_orientation_applied(sk_render, backend, points_data, backend_name):
+    """EXIF Orientation=6（顺时针旋转 90°）：两个后端都输出旋转后的 H x W 图像"""
+    import folder_paths
+    img = Image.fromarray(base_image())
+    exif = img.getexif()
+    exif[0x0112] = 6
+    img.save(os.path.join(folder_paths.get_input_directory(), "rotated.png"), exif=exif.tobytes())
+    backend(backend_name)
+    outputs = render_outputs(sk_render, "serial", "rotated.png", points_data, "")
+    assert outputs[3].shape == (1, W, H, 3)
+    assert max_diff(outputs[2][0], np.rot90(base_image(), k=-1)) == 0
+
+
+@pytest.mark.parametrize("mode", ("full", "tiled", "batch"))
+def test_missing_mask_reference_raises(sk_render, tiled, input_image, points_data, mode):
+    """掩码引用指向的文件不存在时节点报错，而不是输出没有涂鸦的结果"""
+    missing = "sk-mask:" + "0" * 64
+    images = None
+    if mode == "tiled":
+        tiled()
+    elif mode == "batch":
+        images = torch.from_numpy(base_image().astype(np.float32) / 255.0)[None]
+    with pytest.raises(FileNotFoundError, match="涂鸦掩码"):
+        sk_render.render("v3", input_image, points_data, missing, images=images)
+
+
+@pytest.mark.parametrize("mode", ("full", "tiled", "batch"))
+def test_out_of_bounds_points_reported(sk_render, tiled, input_image, capsys, mode):
+    """圆心超出图像范围的点计入 out_of_bounds 并在终端提示数量；格式错误的点单独计数"""
+    points = sk_render.parse_points(json.dumps([{"x": -3, "y": 10}, {"x": 10, "y": 10}, {"x": W, "y": 0}, None,
+                                                {"x": 5, "y": H + 40}, {"x": "?", "y": 1}]))
+    assert points.malformed == 1
+    assert points.to_pixels((W, H)).out_of_bounds == 3
+    assert points.to_pixels((W, H)).scaled((W * 2, H * 2), (W, H)).out_of_bounds == 1
+    images = None
+    if mode == "tiled":
+        tiled()
+    elif mode == "batch":
+        images = torch.from_numpy(base_image().astype(np.float32) / 255.0)[None]
+    capsys.readouterr()
+    sk_render.render("serial", input_image, json.dumps([[-3, 10], [10, 10], [W, 0], [5, H + 40]]), "", images=images)
+    assert f"3 个点位超出图像范围 ({W}x{H})" in capsys.readouterr().out
@@ -1,6 +1,50 @@
 import { app } from "../../../scripts/app.js";
 import { api } from "../../../scripts/api.js";
 
+// --- 缩略图：按显示尺寸加载服务端生成的缩略图，坐标换算始终使用原图尺寸 ---
+const fullW = (img) => img.skFullWidth || img.naturalWidth;
+const fullH = (img) => img.skFullHeight || img.naturalHeight;
+async function resolveThumb(name, size) {
+    try {
+        const res = await api.fetchApi(`/sk-marks/thumb_info?filename=${encodeURIComponent(name)}`);
+        if (res.ok) {
+            const info = await res.json();
+            return {
+                url: api.apiURL(`/sk-marks/thumb?filename=${encodeURIComponent(name)}&size=${size}&v=${info.hash}`),
+                width: info.width,
+                height: info.height,
+            };
+        }
+    } catch (e) {
+        console.error("SK-Nodes: thumb_info failed", e);
+    }
+    return { url: api.apiURL(`/view?filename=${encodeURIComponent(name)}&type=input&t=${Date.now()}`) };
+}
+function loadThumb(img, name, size) {
+    resolveThumb(name, size).then(t => {
+        if (t.width) { img.skFullWidth = t.width; img.skFullHeight = t.height; }
+        img.src = t.url;
+    });
+}
+
+// --- 掩码存储：widget 中只保存 "sk-mask:<hash>"，PNG 内容上传到服务端按哈希保存 ---
+const MASK_REF_PREFIX = "sk-mask:";
+const isMaskValue = (v) => !!v && (v.startsWith("data:image") || v.startsWith(MASK_REF_PREFIX));
+const maskSrc = (v) => v.startsWith(MASK_REF_PREFIX) ? api.apiURL(`/sk-marks/mask/${v.slice(MASK_REF_PREFIX.length)}`) : v;
+async function uploadMask(canvas) {
+    try {
+        const blob = await new Promise(resolve => canvas.toBlob(resolve, "image/png"));
+        const res = await api.fetchApi("/sk-marks/upload_mask", { method: "POST", body: blob, headers: { "Content-Type": "image/png" } });
+        const json = await res.json();
+        if (json.status === "success") return json.mask_ref;
+        console.error("SK-Nodes: mask upload failed", json.message);
+    } catch (e) {
+        console.error("SK-Nodes: mask upload failed", e);
+    }
+    // 上传失败时退回到内嵌 base64
+    return canvas.toDataURL("image/png");
+}
+
 // --- 样式定义 ---
 const style = document.createElement('style');
 style.innerHTML = `
@@ -140,18 +184,17 @@ app.registerExtension({
             // 深度刷新逻辑 (兼容 Nodes 2.0)
             nodeType.prototype.loadNodeImage = function(name) {
                 if (!name) return;
-                const url = api.apiURL(`/view?filename=${encodeURIComponent(name)}&type=input&t=${Date.now()}`);
                 const img = new Image();
-                img.src = url;
+                loadThumb(img, name, 1024);
                 img.onload = () => { 
                     this.img = img; 
                     this.imgs = [img]; 
                     
                     // 处理待定的像素坐标转换
-                    if (this._pending_pixel_points && img.naturalWidth > 0) {
+                    if (this._pending_pixel_points && fullW(img) > 0) {
                         this.points = this._pending_pixel_points.map(p => ({
-                            x: p.x / img.naturalWidth,
-                            y: p.y / img.naturalHeight
+                            x: p.x / fullW(img),
+                            y: p.y / fullH(img)
                         }));
                         delete this._pending_pixel_points;
                     }
@@ -169,10 +212,10 @@ app.registerExtension({
                 
                 // 1. 准备要同步的点位数据 (转换为整数像素坐标)
                 let pixelPoints = this.points || [];
-                if (this.img && this.img.naturalWidth > 0) {
+                if (this.img && fullW(this.img) > 0) {
                     pixelPoints = pixelPoints.map(p => ({
-                        x: Math.round(p.x * this.img.naturalWidth),
-                        y: Math.round(p.y * this.img.naturalHeight)
+                        x: Math.round(p.x * fullW(this.img)),
+                        y: Math.round(p.y * fullH(this.img))
                     }));
                 }
                 const pointsJson = JSON.stringify(pixelPoints);
@@ -209,7 +252,7 @@ app.registerExtension({
                 if (app.canvas && app.canvas.setDirty) app.canvas.setDirty(true, true);
 
                 // 4. 更新缓存的涂鸦图片对象
-                if (maskData && maskData.startsWith("data:image")) {
+                if (isMaskValue(maskData)) {
                     if (!this.mask_img || this.mask_img._base64 !== maskData) {
                         const mImg = new Image();
                         mImg.onload = () => {
@@ -217,7 +260,7 @@ app.registerExtension({
                             this.mask_img._base64 = maskData;
                             this.setDirtyCanvas(true);
                         };
-                        mImg.src = maskData;
+                        mImg.src = maskSrc(maskData);
                     }
                 } else {
                     this.mask_img = null;
@@ -271,8 +314,8 @@ app.registerExtension({
                 });
                 
                 // 绘制图片尺寸 (预览区域右下角，非图片上)
-                 if (this.img && this.img.naturalWidth > 0) {
-                     const sizeText = `${this.img.naturalWidth} × ${this.img.naturalHeight}`;
+                 if (this.img && fullW(this.img) > 0) {
+                     const sizeText = `${fullW(this.img)} × ${fullH(this.img)}`;
                      ctx.font = "12px Arial";
                      ctx.fillStyle = "rgba(255, 255, 255, 0.4)";
                      ctx.textAlign = "right";
@@ -468,7 +511,7 @@ app.registerExtension({
                     // 理想方案是在节点里记一个 base_image 属性
                 }
                 
-                editImg.src = api.apiURL(`/view?filename=${encodeURIComponent(baseImage)}&type=input&t=${Date.now()}`);
+                loadThumb(editImg, baseImage, 2048);
                 editImg.onload = () => {
                     const editor = mask.querySelector(".sk-v2-editor");
                     const toolbar = mask.querySelector(".sk-v2-toolbar");
@@ -482,8 +525,8 @@ app.registerExtension({
                     const H_minus_h = maxEditorH - toolbarH; 
                     
                     // 3. 图片高度设为 H-h，宽度按比例
-                    const r = H_minus_h / editImg.naturalHeight;
-                    let W = editImg.naturalWidth * r;
+                    const r = H_minus_h / fullH(editImg);
+                    let W = fullW(editImg) * r;
                     let H = H_minus_h;
 
                     // 4. 只有当宽度超过屏幕 90% 时才缩小
@@ -509,17 +552,17 @@ app.registerExtension({
                     }
                     
                     if (status) {
-                        status.innerText = `Ready size: ${editImg.naturalWidth} × ${editImg.naturalHeight}`;
+                        status.innerText = `Ready size: ${fullW(editImg)} × ${fullH(editImg)}`;
                     }
                     
                     bgCtx.drawImage(editImg, 0, 0, W, H);
                     
                     // 还原已有涂鸦 (如果有)
                     const existingMask = this.widgets.find(w => w.name === "mask_data")?.value;
-                    if (existingMask && existingMask.startsWith("data:image")) {
+                    if (isMaskValue(existingMask)) {
                         const mImg = new Image();
                         mImg.onload = () => ddCtx.drawImage(mImg, 0, 0, W, H);
-                        mImg.src = existingMask;
+                        mImg.src = maskSrc(existingMask);
                     }
                     
                     const drawPoints = () => {
@@ -533,8 +576,8 @@ app.registerExtension({
                             } else {
                                 coordsList.style.display = "block";
                                 coordsList.innerHTML = tempPoints.map((p, i) => {
-                                    const rx = Math.round(p.x * editImg.naturalWidth);
-                                    const ry = Math.round(p.y * editImg.naturalHeight);
+                                    const rx = Math.round(p.x * fullW(editImg));
+                                    const ry = Math.round(p.y * fullH(editImg));
                                     return `<div>标记${i+1}：(${rx}, ${ry})</div>`;
                                 }).join("");
                             }
@@ -649,13 +692,13 @@ app.registerExtension({
                     document.getElementById("v2_close_btn").onclick = () => mask.style.display = "none";
                     
                     // 保存按钮点击
-                    document.getElementById("v2_save_btn").onclick = () => {
-                        const maskData = ddC.toDataURL("image/png");
+                    document.getElementById("v2_save_btn").onclick = async () => {
+                        const maskData = await uploadMask(ddC);
                         
                         // 1. 将归一化坐标转换为整数像素坐标进行保存
                         const pixelPoints = tempPoints.map(p => ({
-                            x: Math.round(p.x * editImg.naturalWidth),
-                            y: Math.round(p.y * editImg.naturalHeight)
+                            x: Math.round(p.x * fullW(editImg)),
+                            y: Math.round(p.y * fullH(editImg))
                         }));
                         const pointsJson = JSON.stringify(pixelPoints);
                         
@@ -1,6 +1,50 @@
 import { app } from "../../../scripts/app.js";
 import { api } from "../../../scripts/api.js";
 
+// --- 缩略图：按显示尺寸加载服务端生成的缩略图，坐标换算始终使用原图尺寸 ---
+const fullW = (img) => img.skFullWidth || img.naturalWidth;
+const fullH = (img) => img.skFullHeight || img.naturalHeight;
+async function resolveThumb(name, size) {
+    try {
+        const res = await api.fetchApi(`/sk-marks/thumb_info?filename=${encodeURIComponent(name)}`);
+        if (res.ok) {
+            const info = await res.json();
+            return {
+                url: api.apiURL(`/sk-marks/thumb?filename=${encodeURIComponent(name)}&size=${size}&v=${info.hash}`),
+                width: info.width,
+                height: info.height,
+            };
+        }
+    } catch (e) {
+        console.error("SK-Nodes: thumb_info failed", e);
+    }
+    return { url: api.apiURL(`/view?filename=${encodeURIComponent(name)}&type=input&t=${Date.now()}`) };
+}
+function loadThumb(img, name, size) {
+    resolveThumb(name, size).then(t => {
+        if (t.width) { img.skFullWidth = t.width; img.skFullHeight = t.height; }
+        img.src = t.url;
+    });
+}
+
+// --- 掩码存储：widget 中只保存 "sk-mask:<hash>"，PNG 内容上传到服务端按哈希保存 ---
+const MASK_REF_PREFIX = "sk-mask:";
+const isMaskValue = (v) => !!v && (v.startsWith("data:image") || v.startsWith(MASK_REF_PREFIX));
+const maskSrc = (v) => v.startsWith(MASK_REF_PREFIX) ? api.apiURL(`/sk-marks/mask/${v.slice(MASK_REF_PREFIX.length)}`) : v;
+async function uploadMask(canvas) {
+    try {
+        const blob = await new Promise(resolve => canvas.toBlob(resolve, "image/png"));
+        const res = await api.fetchApi("/sk-marks/upload_mask", { method: "POST", body: blob, headers: { "Content-Type": "image/png" } });
+        const json = await res.json();
+        if (json.status === "success") return json.mask_ref;
+        console.error("SK-Nodes: mask upload failed", json.message);
+    } catch (e) {
+        console.error("SK-Nodes: mask upload failed", e);
+    }
+    // 上传失败时退回到内嵌 base64
+    return canvas.toDataURL("image/png");
+}
+
 // --- 样式定义 ---
 const style = document.createElement('style');
 style.innerHTML = `
@@ -132,16 +176,20 @@ app.registerExtension({
 
             nodeType.prototype.loadNodeImage = function(name) {
                 if (!name) return;
-                const url = api.apiURL(`/view?filename=${encodeURIComponent(name)}&type=input&t=${Date.now()}`);
+                resolveThumb(name, 1024).then(t => this.loadImageURL(t.url, t));
+            };
+
+            nodeType.prototype.loadImageURL = function(url, full) {
                 const img = new Image();
+                if (full && full.width) { img.skFullWidth = full.width; img.skFullHeight = full.height; }
                 img.src = url;
                 img.onload = () => { 
                     this.img = img; 
                     this.imgs = [img]; 
-                    if (this._pending_pixel_points && img.naturalWidth > 0) {
+                    if (this._pending_pixel_points && fullW(img) > 0) {
                         this.points = this._pending_pixel_points.map(p => ({
-                            x: p.x / img.naturalWidth,
-                            y: p.y / img.naturalHeight
+                            x: p.x / fullW(img),
+                            y: p.y / fullH(img)
                         }));
                         delete this._pending_pixel_points;
                     }
@@ -156,10 +204,10 @@ app.registerExtension({
                 
                 let pixelPoints = [];
                 if (this.points && this.points.length > 0) {
-                    if (this.img && this.img.naturalWidth > 0) {
+                    if (this.img && fullW(this.img) > 0) {
                         pixelPoints = this.points.map(p => ({
-                            x: Math.round(p.x * this.img.naturalWidth),
-                            y: Math.round(p.y * this.img.naturalHeight)
+                            x: Math.round(p.x * fullW(this.img)),
+                            y: Math.round(p.y * fullH(this.img))
                         }));
                     } else {
                         // 如果图片还没加载好，但已有归一化坐标，暂时维持现状
@@ -197,7 +245,7 @@ app.registerExtension({
                 }
                 if (app.canvas && app.canvas.setDirty) app.canvas.setDirty(true, true);
 
-                if (maskData && maskData.startsWith("data:image")) {
+                if (isMaskValue(maskData)) {
                     if (!this.mask_img || this.mask_img._base64 !== maskData) {
                         const mImg = new Image();
                         mImg.onload = () => {
@@ -205,7 +253,7 @@ app.registerExtension({
                             this.mask_img._base64 = maskData;
                             this.setDirtyCanvas(true);
                         };
-                        mImg.src = maskData;
+                        mImg.src = maskSrc(maskData);
                     }
                 } else {
                     this.mask_img = null;
@@ -282,8 +330,8 @@ app.registerExtension({
                 });
                 
                 // 3. 绘制分辨率信息
-                if (this.img && this.img.naturalWidth > 0) {
-                    const sizeText = `${this.img.naturalWidth} × ${this.img.naturalHeight}`;
+                if (this.img && fullW(this.img) > 0) {
+                    const sizeText = `${fullW(this.img)} × ${fullH(this.img)}`;
                     ctx.font = "12px Arial";
                     ctx.fillStyle = "rgba(255, 255, 255, 0.4)";
                     ctx.textAlign = "right";
@@ -476,8 +524,8 @@ app.registerExtension({
                     const maxEditorH = window.innerHeight * 0.9;
                     const H_minus_h = maxEditorH - toolbarH; 
                     
-                    const imgRatio = editImg.naturalWidth / editImg.naturalHeight;
-                    const canvasH = Math.min(H_minus_h, editImg.naturalHeight);
+                    const imgRatio = fullW(editImg) / fullH(editImg);
+                    const canvasH = Math.min(H_minus_h, fullH(editImg));
                     const canvasW = canvasH * imgRatio;
 
                     [bgC, maskC, ptC].forEach(c => { c.width = canvasW; c.height = canvasH; });
@@ -489,16 +537,16 @@ app.registerExtension({
                     
                     const mw = this.widgets.find(w => w.name === "mask_data");
                     const maskData = (mw ? mw.value : null) || this.properties["mask_data"];
-                    if (maskData && maskData.startsWith("data:image")) {
+                    if (isMaskValue(maskData)) {
                         const m = new Image();
                         m.onload = () => maskCtx.drawImage(m, 0, 0, canvasW, canvasH);
-                        m.src = maskData;
+                        m.src = maskSrc(maskData);
                     }
                     
-                    if (status) status.innerText = `Ready size: ${editImg.naturalWidth} × ${editImg.naturalHeight}`;
+                    if (status) status.innerText = `Ready size: ${fullW(editImg)} × ${fullH(editImg)}`;
                     renderPoints();
                 };
-                editImg.src = api.apiURL(`/view?filename=${encodeURIComponent(imgW.value)}&type=input&t=${Date.now()}`);
+                loadThumb(editImg, imgW.value, 2048);
 
                 const renderPoints = () => {
                     ptCtx.clearRect(0, 0, ptC.width, ptC.height);
@@ -530,7 +578,7 @@ app.registerExtension({
                         ptCtx.fillText("x", x + x_off, y + y_off);
 
                         const div = document.createElement("div");
-                        div.innerText = `标记${i+1}: (${Math.round(p.x * editImg.naturalWidth)}, ${Math.round(p.y * editImg.naturalHeight)})`;
+                        div.innerText = `标记${i+1}: (${Math.round(p.x * fullW(editImg))}, ${Math.round(p.y * fullH(editImg))})`;
                         coordsList.appendChild(div);
                     });
                 };
@@ -579,7 +627,7 @@ app.registerExtension({
                                 saveHistory(); // 操作前保存
                                 isDrawing = true; lastPos = pos;
                                 maskCtx.beginPath(); maskCtx.lineCap = "round"; maskCtx.lineJoin = "round";
-                                maskCtx.strokeStyle = brushColor; maskCtx.lineWidth = (brushSize / editImg.naturalWidth) * ptC.width;
+                                maskCtx.strokeStyle = brushColor; maskCtx.lineWidth = (brushSize / fullW(editImg)) * ptC.width;
                                 maskCtx.moveTo(pos.x * ptC.width, pos.y * ptC.height);
                             }
                         }
@@ -655,22 +703,27 @@ app.registerExtension({
                 };
 
                 document.getElementById("v3_save_btn").onclick = async () => {
-                    const maskData = maskC.toDataURL("image/png");
+                    const maskData = await uploadMask(maskC);
                     const pixelPoints = tempPoints.map(p => ({
-                        x: Math.round(p.x * editImg.naturalWidth),
-                        y: Math.round(p.y * editImg.naturalHeight)
+                        x: Math.round(p.x * fullW(editImg)),
+                        y: Math.round(p.y * fullH(editImg))
                     }));
                     
                     const res = await api.fetchApi("/sk-marks/save_v3", {
                         method: "POST",
-                        body: JSON.stringify({ image: imgW.value, points: pixelPoints, mask_data: maskData })
+                        // client_id（每个标签页不同）+ 工作流 id + 节点 id 区分预览，不同标签页/工作流的同 id 节点互不覆盖
+                        body: JSON.stringify({
+                            client_id: api.clientId ?? api.initialClientId ?? "",
+                            workflow_id: this.graph?.id ?? "",
+                            node_id: this.id, image: imgW.value, points: pixelPoints, mask_data: maskData
+                        })
                     });
                     const json = await res.json();
                     if (json.status === "success") {
                         this.points = tempPoints;
                         const mw = this.widgets.find(w => w.name === "mask_data");
                         if (mw) mw.value = maskData;
-                        this.loadNodeImage(json.preview_name);
+                        this.loadImageURL(api.apiURL(json.preview_url));
                         this.syncAll();
                         mask.style.display = "none";
                     }
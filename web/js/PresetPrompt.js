@@ -3,6 +3,22 @@ import { app } from "../../../scripts/app.js";
 // 模式检测 (不变)
 const isVueMode = () => !!(window.comfyAPI?.nodeMountService?.isVueNodesMode?.() || app.vueApp);
 
+// 全部预设（名称 + 内容）：每次使用都向服务器重新验证（cache: "no-cache"，未变化时服务器返回 304，
+// 浏览器直接复用缓存的响应体），预设文件被修改后不会拿到旧内容；
+// 只合并同时发出的请求，工作流加载时多个预设节点共用一次请求
+let presetsRequest = null;
+const loadAllPresets = () => {
+    if (!presetsRequest) {
+        presetsRequest = fetch("/sklibs/prompts_all", { cache: "no-cache" })
+            .then(r => {
+                if (!r.ok) throw new Error(`HTTP ${r.status}`);
+                return r.json();
+            })
+            .finally(() => { presetsRequest = null; });
+    }
+    return presetsRequest;
+};
+
 app.registerExtension({
     name: "sklibs.PresetPrompt",
     async beforeRegisterNodeDef(nodeType, nodeData) {
@@ -53,15 +69,30 @@ app.registerExtension({
             const combo = node.widgets.find(w => w.name === "prompt_type");
             const text = node.widgets.find(w => w.name === "caption");
 
+            const applyContent = (prompt) => {
+                if (text && prompt !== undefined) {
+                    text.value = prompt;
+                    if (text.callback) text.callback(prompt);
+                    app.graph.setDirtyCanvas(true);
+                }
+            };
+
+            // 切换预设：单个预设按 ETag 重新验证（未变化时 304），保证拿到最新内容
             const loadContent = async (val) => {
                 if (!val || val === "无可用预设") return;
-                const r = await fetch(`/sklibs/get_prompt_content?name=${encodeURIComponent(val)}&t=${Date.now()}`);
+                const r = await fetch(`/sklibs/get_prompt_content?name=${encodeURIComponent(val)}`, { cache: "no-cache" });
                 const data = await r.json();
-                if (text && data.prompt !== undefined) {
-                    text.value = data.prompt;
-                    if (text.callback) text.callback(data.prompt);
-                    app.graph.setDirtyCanvas(true);
-                }
+                applyContent(data.prompt);
+            };
+
+            // 节点创建时：从共享的全部预设缓存中取内容，失败时退回单个请求
+            const loadInitial = async (val) => {
+                if (!val || val === "无可用预设") return;
+                try {
+                    const all = await loadAllPresets();
+                    if (all.prompts && val in all.prompts) return applyContent(all.prompts[val]);
+                } catch (e) {}
+                await loadContent(val);
             };
 
             if (combo) {
@@ -72,7 +103,7 @@ app.registerExtension({
                 };
                 
                 setTimeout(() => {
-                    if (combo.value) loadContent(combo.value);
+                    if (combo.value) loadInitial(combo.value);
                 }, 10);
             }
 
@@ -1,6 +1,32 @@
 import { app } from "../../../scripts/app.js";
 import { api } from "../../../scripts/api.js";
 
+// --- 缩略图：按显示尺寸加载服务端生成的缩略图，坐标换算始终使用原图尺寸 ---
+const fullW = (img) => img.skFullWidth || img.naturalWidth;
+const fullH = (img) => img.skFullHeight || img.naturalHeight;
+async function resolveThumb(name, size) {
+    try {
+        const res = await api.fetchApi(`/sk-marks/thumb_info?filename=${encodeURIComponent(name)}`);
+        if (res.ok) {
+            const info = await res.json();
+            return {
+                url: api.apiURL(`/sk-marks/thumb?filename=${encodeURIComponent(name)}&size=${size}&v=${info.hash}`),
+                width: info.width,
+                height: info.height,
+            };
+        }
+    } catch (e) {
+        console.error("SK-Nodes: thumb_info failed", e);
+    }
+    return { url: api.apiURL(`/view?filename=${encodeURIComponent(name)}&type=input&t=${Date.now()}`) };
+}
+function loadThumb(img, name, size) {
+    resolveThumb(name, size).then(t => {
+        if (t.width) { img.skFullWidth = t.width; img.skFullHeight = t.height; }
+        img.src = t.url;
+    });
+}
+
 const style = document.createElement('style');
 style.innerHTML = `
     .sk-marks-mask {
@@ -61,9 +87,8 @@ app.registerExtension({
             // 核心修复：加载图片后强制触发布局和预览刷新
             nodeType.prototype.loadNodeImage = function(name) {
                 if (!name) return;
-                const url = api.apiURL(`/view?filename=${encodeURIComponent(name)}&type=input&t=${Date.now()}`);
                 const img = new Image();
-                img.src = url;
+                loadThumb(img, name, 1024);
                 img.onload = () => { 
                     this.img = img; 
                     //  Nodes 2.0 
@@ -79,8 +104,8 @@ app.registerExtension({
                 const w = this.widgets.find(w => w.name === "points_data");
                 if (w && this.img) {
                     const raw = this.points.map(p => ({
-                        x: Math.round(p.x * this.img.naturalWidth),
-                        y: Math.round(p.y * this.img.naturalHeight)
+                        x: Math.round(p.x * fullW(this.img)),
+                        y: Math.round(p.y * fullH(this.img))
                     }));
                     const val = JSON.stringify(raw);
                     w.value = val;
@@ -235,7 +260,7 @@ app.registerExtension({
                 const canvas = document.getElementById("sk_marks_canvas"), ctx = canvas.getContext("2d");
                 const editImg = new Image();
                 let tempPoints = JSON.parse(JSON.stringify(this.points)), dIdx = null;
-                editImg.src = api.apiURL(`/view?filename=${encodeURIComponent(imgW.value)}&type=input&t=${Date.now()}`);
+                loadThumb(editImg, imgW.value, 2048);
                 editImg.onload = () => {
                     const r = Math.min((window.innerWidth*0.85)/editImg.width, (window.innerHeight*0.75)/editImg.height);
                     canvas.width = editImg.width * r; canvas.height = editImg.height * r;